@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+Sound Deluxe - Benchmark del generador de vídeos promocionals
+=============================================================
+Renderitza un clip fix i amb llavor (portades sintètiques, sense logotip) i
+mesura la latència per frame: percentils per fase (gir, assentament,
+revelació) i per tram (fons, portades, glow, text, logotip, desat/codificació),
+a més del pic de memòria (RSS). El resultat es desa en JSON i es pot comparar
+amb una línia base per detectar regressions.
+
+Ús:
+    python scripts/benchmark_promo_video.py --output base.json
+    python scripts/benchmark_promo_video.py --baseline base.json --threshold 0.15
+"""
+
+import argparse
+import contextlib
+import json
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import PIL
+from PIL import Image, ImageDraw
+
+import generate_promo_video as gpv
+from promo_catalog import ALBUMS_DATA
+
+PHASES = ("spin", "settle", "reveal")
+STAGES = gpv.RENDER_STAGES + ("encode",)
+PERCENTILES = (50, 90, 95, 99)
+
+FEATURED_ALBUM = "NJZLoMez4714Sf01dGtBMx"
+SESSION = {"date": "Divendres 17 Gener 2025", "time": "19:30h"}
+
+# Mètriques que poden fer fallar el benchmark (la resta són informatives)
+GATED_METRICS = ("frame.p50", "frame.p95", "spin.p50", "settle.p50", "reveal.p50")
+
+
+# ============================================================================
+# MESURA
+# ============================================================================
+
+class _Span:
+    """Context manager que acumula el temps d'un tram al frame en curs."""
+
+    __slots__ = ("timer", "name", "start")
+
+    def __init__(self, timer: "StageTimer", name: str):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        current = self.timer.current
+        current[self.name] = current.get(self.name, 0.0) + elapsed
+        return False
+
+
+class StageTimer:
+    """
+    Tracer mínim per a gpv.set_tracer(): suma la durada de cada tram de primer
+    nivell per frame i ignora els subtrams (slot, cover.*, text.*).
+    """
+
+    _IGNORED = contextlib.nullcontext()
+
+    def __init__(self):
+        self.current = {}
+
+    def span(self, name: str, **args):
+        if name not in STAGES:
+            return self._IGNORED
+        return _Span(self, name)
+
+    def take(self) -> dict:
+        """Temps per tram del frame acabat (en segons) i reinicia el comptador."""
+        stages, self.current = self.current, {}
+        return stages
+
+
+def peak_rss_mb() -> float:
+    """Pic de memòria resident del procés (ru_maxrss és KB a Linux i bytes a macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def summarize(samples: list) -> dict:
+    """Percentils, mitjana i màxim d'una llista de durades (en ms)."""
+    if not samples:
+        return {"count": 0}
+    values = np.asarray(samples, dtype=np.float64) * 1000.0
+    summary = {"count": len(samples), "mean": float(values.mean()), "max": float(values.max())}
+    for p in PERCENTILES:
+        summary[f"p{p}"] = float(np.percentile(values, p))
+    return summary
+
+
+# ============================================================================
+# CLIP SINTÈTIC
+# ============================================================================
+
+def make_synthetic_covers(covers_dir: Path, seed: int, size: int = 640) -> list:
+    """
+    Una portada JPEG per àlbum de ALBUMS_DATA: degradat i formes amb llavor,
+    perquè el benchmark no depengui de album-covers/. Retorna els ids.
+    """
+    rng = random.Random(seed)
+    yy, xx = np.mgrid[0:size, 0:size].astype(np.float32) / size
+    album_ids = list(ALBUMS_DATA.keys())
+    for album_id in album_ids:
+        c0 = np.array([rng.randrange(256) for _ in range(3)], dtype=np.float32)
+        c1 = np.array([rng.randrange(256) for _ in range(3)], dtype=np.float32)
+        t = (xx * rng.random() + yy * rng.random())[..., None] / 2
+        pixels = (c0 * (1 - t) + c1 * t).astype(np.uint8)
+        img = Image.fromarray(pixels, 'RGB')
+
+        draw = ImageDraw.Draw(img)
+        for _ in range(6):
+            x0, y0 = rng.randrange(size), rng.randrange(size)
+            r = rng.randrange(size // 16, size // 3)
+            color = tuple(rng.randrange(256) for _ in range(3))
+            draw.ellipse([x0 - r, y0 - r, x0 + r, y0 + r], fill=color)
+
+        img.save(covers_dir / f"{album_id}.jpg", quality=90)
+    return album_ids
+
+
+def build_job(album_ids: list, seed: int, duration: float, compositor: str, incremental: bool = True) -> dict:
+    """Job de render equivalent a prepare_render_job(), amb la seqüència fixada per la llavor."""
+    others = [aid for aid in album_ids if aid != FEATURED_ALBUM]
+    random.Random(seed).shuffle(others)
+    cover_size = 850
+    return {
+        "featured_album_id": FEATURED_ALBUM,
+        "session_info": SESSION,
+        "album_sequence": others[:14] + [FEATURED_ALBUM] + others[14:],
+        "total_frames": int(duration * gpv.FPS),
+        "cover_size": cover_size,
+        "slot_height": cover_size + 60,
+        "compositor": compositor,
+        "incremental": incremental,
+    }
+
+
+class _Encoder:
+    """Tram de desat/codificació del benchmark (none, raw, png o ffmpeg)."""
+
+    def __init__(self, mode: str, work_dir: Path):
+        self.mode = mode
+        self.work_dir = work_dir
+        self.ffmpeg = None
+        if mode == "ffmpeg":
+            self.ffmpeg = gpv.FFmpegStreamEncoder(work_dir / "benchmark.mp4", gpv.VIDEO_WIDTH,
+                                                  gpv.VIDEO_HEIGHT, gpv.FPS)
+
+    def write(self, frame: Image.Image, frame_num: int):
+        if self.mode == "raw":
+            frame.tobytes()
+        elif self.mode == "png":
+            gpv.save_frame(frame, self.work_dir, frame_num)
+        elif self.mode == "ffmpeg":
+            self.ffmpeg.write(frame)
+
+    def close(self) -> float:
+        """Tanca el codificador; retorna els segons d'espera al final."""
+        if self.ffmpeg is None:
+            return 0.0
+        started = time.perf_counter()
+        if not self.ffmpeg.close():
+            raise RuntimeError(f"ffmpeg ha fallat:\n{self.ffmpeg.stderr[-2000:]}")
+        return time.perf_counter() - started
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def run_benchmark(
+    duration: float = 3.0,
+    seed: int = 1234,
+    compositor: str = "pil",
+    encode: str = "raw",
+    warmup: int = 5,
+    repeat: int = 1,
+    incremental: bool = True
+) -> dict:
+    """Renderitza el clip sintètic i retorna els resultats (serialitzables en JSON)."""
+    with tempfile.TemporaryDirectory(prefix="promo_bench_") as tmp:
+        tmp = Path(tmp)
+        covers_dir = tmp / "covers"
+        covers_dir.mkdir()
+        album_ids = make_synthetic_covers(covers_dir, seed)
+
+        job = build_job(album_ids, seed, duration, compositor, incremental)
+        total_frames = job["total_frames"]
+        logo = Image.new('RGBA', (660, 660), (0, 0, 0, 0))
+        ctx = gpv.RenderContext(covers=gpv.CoverCache(covers_dir=covers_dir), logo=logo)
+
+        phases = [gpv.plan_job_frame(ctx, n, job)["phase"] for n in range(total_frames)]
+
+        # Escalfament: omple les caches (portades, sprites) sense mesurar; les etiquetes
+        # del vinil es pre-roten com al render real
+        gpv.prewarm_vinyl_labels(ctx, job)
+        for n in np.linspace(0, total_frames - 1, num=max(0, warmup), dtype=int):
+            gpv.render_frame(ctx, int(n), job)
+
+        timer = StageTimer()
+        frame_times = []
+        phase_times = {phase: [] for phase in PHASES}
+        stage_times = {stage: [] for stage in STAGES}
+        encoder = _Encoder(encode, tmp)
+        previous = gpv.set_tracer(timer)
+        started = time.perf_counter()
+        try:
+            for _ in range(repeat):
+                renderer = gpv.FrameRenderer(ctx, job)
+                for n in range(total_frames):
+                    t0 = time.perf_counter()
+                    frame = renderer.render(n)
+                    with timer.span("encode"):
+                        encoder.write(frame, n)
+                    elapsed = time.perf_counter() - t0
+
+                    frame_times.append(elapsed)
+                    phase_times[phases[n]].append(elapsed)
+                    for stage, seconds in timer.take().items():
+                        stage_times.setdefault(stage, []).append(seconds)
+            flush = encoder.close()
+        finally:
+            gpv.set_tracer(previous)
+        wall = time.perf_counter() - started
+
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "duration": duration,
+            "frames": total_frames,
+            "seed": seed,
+            "compositor": compositor,
+            "encode": encode,
+            "warmup": warmup,
+            "repeat": repeat,
+            "incremental": incremental,
+            "size": [gpv.VIDEO_WIDTH, gpv.VIDEO_HEIGHT],
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "pillow": PIL.__version__,
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+        },
+        "wall_seconds": wall,
+        "encode_flush_seconds": flush,
+        "fps": len(frame_times) / wall if wall else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+        "frame": summarize(frame_times),
+        "phases": {phase: summarize(times) for phase, times in phase_times.items()},
+        "stages": {stage: summarize(times) for stage, times in stage_times.items() if times},
+        "incremental": renderer.stats(),
+        "covers": ctx.covers.stats(),
+        "sprites": ctx.sprites.stats(),
+    }
+
+
+# ============================================================================
+# COMPARACIÓ AMB LA LÍNIA BASE
+# ============================================================================
+
+def _metric(results: dict, name: str) -> float:
+    """Valor d'una mètrica 'grup.percentil' (frame, fase o tram) o None."""
+    group, stat = name.split(".")
+    if group == "frame":
+        section = results.get("frame", {})
+    elif group in PHASES:
+        section = results.get("phases", {}).get(group, {})
+    else:
+        section = results.get("stages", {}).get(group, {})
+    return section.get(stat)
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Compara amb la línia base. Retorna una fila per mètrica:
+    (nom, base, actual, canvi relatiu, regressió?). Només GATED_METRICS
+    i el pic de RSS poden ser regressions; els trams són informatius.
+    """
+    names = list(GATED_METRICS) + [f"{stage}.p50" for stage in STAGES]
+    rows = []
+    for name in names:
+        base, current = _metric(baseline, name), _metric(results, name)
+        if base is None or current is None or base <= 0:
+            continue
+        change = current / base - 1
+        rows.append((name, base, current, change, name in GATED_METRICS and change > threshold))
+
+    base_rss, rss = baseline.get("peak_rss_mb"), results.get("peak_rss_mb")
+    if base_rss and rss:
+        change = rss / base_rss - 1
+        rows.append(("peak_rss_mb", base_rss, rss, change, change > threshold))
+    return rows
+
+
+def print_results(results: dict):
+    """Taula de percentils per fase i per tram."""
+    config = results["config"]
+    print(f"\n📊 {config['frames']} frames × {config['repeat']} "
+          f"(compositor {config['compositor']}, codificació {config['encode']})")
+    print(f"   {results['fps']:.2f} fps · pic RSS {results['peak_rss_mb']:.0f} MB")
+    incremental = results.get("incremental")
+    if config.get("incremental") and incremental:
+        print(f"   Incremental: {incremental['duplicates']} duplicats, {incremental['partial']} parcials, "
+              f"{incremental['full']} sencers")
+
+    header = f"   {'':<12}{'n':>6}" + "".join(f"{'p' + str(p):>9}" for p in PERCENTILES) + f"{'max':>9}"
+    print(header + "   (ms)")
+    rows = [("frame", results["frame"])]
+    rows += [(phase, results["phases"][phase]) for phase in PHASES]
+    rows += [(stage, summary) for stage, summary in results["stages"].items()]
+    for name, summary in rows:
+        if not summary.get("count"):
+            continue
+        cells = "".join(f"{summary[f'p{p}']:>9.1f}" for p in PERCENTILES)
+        print(f"   {name:<12}{summary['count']:>6}{cells}{summary['max']:>9.1f}")
+
+
+def print_comparison(rows: list, threshold: float):
+    """Taula de comparació amb la línia base."""
+    print(f"\n📏 Comparació amb la línia base (llindar +{threshold:.0%})")
+    for name, base, current, change, regressed in rows:
+        mark = "❌" if regressed else "  "
+        print(f"   {mark} {name:<16}{base:>10.1f} → {current:>8.1f}  ({change:+.1%})")
+
+
+def parse_args(argv: list = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark del generador de vídeos promocionals")
+    parser.add_argument("--duration", type=float, default=3.0,
+                        help="Durada del clip en segons; conserva les tres fases (per defecte: 3)")
+    parser.add_argument("--seed", type=int, default=1234,
+                        help="Llavor de les portades sintètiques i de la seqüència")
+    parser.add_argument("--compositor", choices=gpv.COMPOSITORS, default="pil",
+                        help="Backend de composició a mesurar")
+    parser.add_argument("--encode", choices=("none", "raw", "png", "ffmpeg"), default="raw",
+                        help="Tram de desat: res, bytes RGB24, PNG o ffmpeg (per defecte: raw)")
+    parser.add_argument("--warmup", type=int, default=5,
+                        help="Frames renderitzats abans de mesurar (per defecte: 5)")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="Passades mesurades sobre el clip (per defecte: 1)")
+    parser.add_argument("--full-frames", action="store_true",
+                        help="Mesura el render sencer de cada frame (sense render incremental)")
+    parser.add_argument("--output", type=Path,
+                        help="Fitxer JSON on desar els resultats")
+    parser.add_argument("--baseline", type=Path,
+                        help="Resultats JSON d'una execució anterior per comparar")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="Regressió màxima tolerada respecte la base (per defecte: 0.15 = 15%%)")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+
+    print("=" * 60)
+    print("⏱️  SOUND DELUXE - Benchmark del generador de vídeos")
+    print("=" * 60)
+
+    results = run_benchmark(duration=args.duration, seed=args.seed, compositor=args.compositor,
+                            encode=args.encode, warmup=args.warmup, repeat=args.repeat,
+                            incremental=not args.full_frames)
+    print_results(results)
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Resultats: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("config", {}) != results["config"]:
+            print("⚠️  La configuració de la línia base és diferent; la comparació pot no ser justa")
+
+        rows = compare(results, baseline, args.threshold)
+        print_comparison(rows, args.threshold)
+        regressions = [row[0] for row in rows if row[4]]
+        if regressions:
+            print(f"\n❌ Regressió en: {', '.join(regressions)}")
+            sys.exit(1)
+        print("\n✅ Sense regressions")
+
+
+if __name__ == "__main__":
+    main()
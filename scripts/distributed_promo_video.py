@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+Sound Deluxe - Render distribuït dels vídeos promocionals
+=========================================================
+Cua de treball en un directori compartit (p. ex. NFS): el coordinador publica
+un job de generate_promo_video.py en chunks de frames, els nodes els reclamen
+amb leases i en codifiquen segments, i el coordinador els uneix sense recodificar.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import generate_promo_video as gpv
+from promo_catalog import use_catalog
+
+LEASE_SECONDS = 120.0       # un chunk sense renovar durant aquest temps es torna a repartir
+LEASE_MAX_ATTEMPTS = 5      # intents per chunk abans de donar el job per fallit
+JOB_STALE_LEASES = 2        # un job sense senyals de vida durant 2 leases té el coordinador mort
+DISTRIBUTED_POLL_SECONDS = 1.0
+
+
+def _node_id() -> str:
+    return f"{os.uname().nodename}-{os.getpid()}"
+
+
+def _chunk_name(start: int, end: int) -> str:
+    return f"{start:06d}-{end:06d}"
+
+
+def publish_distributed_job(queue_dir: Path, job: dict, chunk_frames: int,
+                            lease_seconds: float = LEASE_SECONDS) -> Path:
+    """
+    Publica un job a la cua compartida: job.json (el job sencer i els chunks
+    de frames) i els directoris de leases i de chunks acabats.
+    """
+    total_frames = job["total_frames"]
+    job_dir = Path(queue_dir) / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{_node_id()}"
+    (job_dir / "leases").mkdir(parents=True)
+    (job_dir / "done").mkdir()
+    spec = {
+        "job": job,
+        "chunk_frames": chunk_frames,
+        "chunks": [[start, min(start + chunk_frames, total_frames)]
+                   for start in range(0, total_frames, chunk_frames)],
+        "lease_seconds": lease_seconds,
+    }
+    # job.json apareix sencer o no apareix: és el que fa visible el job als workers
+    gpv.write_atomic(job_dir / "job.json", json.dumps(spec).encode())
+    return job_dir
+
+
+def _read_job_spec(job_dir: Path) -> Optional[dict]:
+    try:
+        return json.loads((job_dir / "job.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def _lease_expired(lease: Path, lease_seconds: float) -> bool:
+    try:
+        return time.time() - lease.stat().st_mtime > lease_seconds
+    except FileNotFoundError:
+        return False
+
+
+def claim_chunk(job_dir: Path, name: str, owner: str, lease_seconds: float) -> Optional[Path]:
+    """
+    Reclama un chunk. Cada intent és un fitxer <chunk>.<n> creat amb O_EXCL,
+    atòmic també en NFS: si l'intent n ha caducat (el worker no l'ha renovat),
+    els workers competeixen per crear el n+1 i només un ho aconsegueix.
+    Retorna el lease obtingut o None.
+    """
+    leases = job_dir / "leases"
+    for attempt in range(1, LEASE_MAX_ATTEMPTS + 1):
+        lease = leases / f"{name}.{attempt}"
+        try:
+            fd = os.open(lease, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            if (leases / f"{name}.{attempt + 1}").exists() or _lease_expired(lease, lease_seconds):
+                continue
+            return None
+        with os.fdopen(fd, "w") as f:
+            json.dump({"owner": owner, "claimed": time.time()}, f)
+        if attempt > 1:
+            print(f"   🔁 Chunk {name}: intent {attempt} (l'anterior ha caducat o ha fallat)")
+        return lease
+    return None
+
+
+def fail_lease(lease: Path, error: str):
+    """
+    Marca un intent com a fallit: hi deixa l'error i el fa caducar (mtime a
+    l'època), de manera que el següent worker reclami l'intent n+1 i, després
+    de LEASE_MAX_ATTEMPTS, el chunk es doni per perdut en lloc de repetir-se.
+    """
+    try:
+        info = json.loads(lease.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        info = {}
+    info.update(failed=time.time(), error=error)
+    with contextlib.suppress(OSError):
+        lease.write_text(json.dumps(info), encoding="utf-8")
+    with contextlib.suppress(OSError):
+        os.utime(lease, (0, 0))
+
+
+def _chunk_exhausted(job_dir: Path, name: str, lease_seconds: float) -> bool:
+    """Tots els intents del chunk han caducat sense resultat."""
+    return _lease_expired(job_dir / "leases" / f"{name}.{LEASE_MAX_ATTEMPTS}", lease_seconds)
+
+
+def _lease_error(lease: Path) -> Optional[str]:
+    try:
+        return json.loads(lease.read_text(encoding="utf-8")).get("error")
+    except (OSError, ValueError):
+        return None
+
+
+def _job_heartbeat(job_dir: Path) -> Optional[float]:
+    """
+    Últim senyal de vida d'un job: el coordinador toca job.json a cada passada
+    i els nodes renoven els seus leases. None si el directori ja no hi és.
+    """
+    mtimes = []
+    for path in [job_dir, job_dir / "job.json", *(job_dir / "leases").glob("*")]:
+        with contextlib.suppress(OSError):
+            mtimes.append(path.stat().st_mtime)
+    return max(mtimes) if mtimes else None
+
+
+def sweep_stale_jobs(queue_dir: Path) -> list:
+    """
+    Esborra els jobs abandonats de la cua (coordinador mort sense netejar):
+    els que no han donat senyals de vida durant JOB_STALE_LEASES leases.
+    Retorna els directoris esborrats.
+    """
+    swept = []
+    for job_dir in _job_dirs(queue_dir):
+        spec = _read_job_spec(job_dir)
+        lease_seconds = spec["lease_seconds"] if spec else LEASE_SECONDS
+        heartbeat = _job_heartbeat(job_dir)
+        if heartbeat is None or time.time() - heartbeat <= JOB_STALE_LEASES * lease_seconds:
+            continue
+        print(f"🧹 Job abandonat, s'esborra: {job_dir.name}")
+        shutil.rmtree(job_dir, ignore_errors=True)
+        swept.append(job_dir)
+    return swept
+
+
+def _job_dirs(queue_dir: Path) -> list:
+    try:
+        return sorted(path for path in Path(queue_dir).iterdir() if path.is_dir())
+    except FileNotFoundError:
+        return []
+
+
+def render_chunk(job: dict, start: int, end: int, job_dir: Path, name: str,
+                 lease: Path, chunk_frames: int, lease_seconds: float):
+    """
+    Renderitza els frames [start, end) amb el renderer del procés i els
+    codifica en un segment de GOP tancat, que es publica a done/ amb un
+    rename atòmic. Renova el lease mentre treballa. Llença una excepció si
+    el render o ffmpeg fallen.
+    """
+    started = time.perf_counter()
+    ctx = gpv.job_render_context(job)
+    renderer = gpv.get_frame_renderer(ctx, job)
+    gpv.prewarm_render_caches(ctx, job, start, end)
+    os.utime(lease)     # l'escalfament de les caches pot trigar
+
+    tmp_path = job_dir / f".{name}.{_node_id()}.mp4"
+    encoder = gpv.FFmpegStreamEncoder(tmp_path, ctx.width, ctx.height, job.get("fps", gpv.FPS),
+                                      encode_args=gpv.segment_encode_args(job.get("encode_args"), chunk_frames))
+    renewed = time.time()
+    try:
+        for i in range(start, end):
+            encoder.write(renderer.render(i))
+            if time.time() - renewed > lease_seconds / 4:
+                os.utime(lease)
+                renewed = time.time()
+    except BaseException:
+        encoder.close()
+        tmp_path.unlink(missing_ok=True)
+        raise
+    if not encoder.close():
+        tmp_path.unlink(missing_ok=True)
+        raise RuntimeError(f"error ffmpeg: {encoder.stderr}")
+
+    # Si el lease ha caducat i un altre worker també l'ha fet, el resultat és el mateix
+    os.replace(tmp_path, job_dir / "done" / f"{name}.mp4")
+    gpv.write_atomic(job_dir / "done" / f"{name}.json", json.dumps({
+        "owner": _node_id(), "frames": end - start, "seconds": time.perf_counter() - started,
+        "attempt": int(lease.suffix[1:]),
+    }).encode())
+
+
+def work_on_job(job_dir: Path, owner: str) -> int:
+    """Una passada pels chunks d'un job: reclama i renderitza els lliures. Retorna quants n'ha fet."""
+    spec = _read_job_spec(job_dir)
+    if spec is None:
+        return 0
+    rendered = 0
+    for start, end in spec["chunks"]:
+        name = _chunk_name(start, end)
+        try:
+            if (job_dir / "done" / f"{name}.mp4").exists():
+                continue
+            lease = claim_chunk(job_dir, name, owner, spec["lease_seconds"])
+        except FileNotFoundError:
+            break   # el coordinador ha acabat el job (i n'ha esborrat el directori)
+        if lease is None:
+            continue
+        print(f"🧩 Chunk {name} ({job_dir.name})")
+        try:
+            render_chunk(spec["job"], start, end, job_dir, name, lease,
+                         spec["chunk_frames"], spec["lease_seconds"])
+            rendered += 1
+        except Exception as e:
+            if not job_dir.exists():
+                break
+            error = str(e) or type(e).__name__
+            print(f"❌ Chunk {name}: {error}")
+            fail_lease(lease, error)
+    return rendered
+
+
+def run_render_node(queue_dir: Path, idle_seconds: float = None) -> int:
+    """
+    Worker d'un node: recorre els jobs de la cua compartida i en renderitza
+    chunks fins que no n'hi ha cap de lliure durant `idle_seconds` (per
+    defecte, indefinidament). Retorna els chunks renderitzats.
+    """
+    queue_dir = Path(queue_dir)
+    owner = _node_id()
+    print(f"🖥️  Node {owner} a {queue_dir}")
+    total, idle_since = 0, time.time()
+    while True:
+        sweep_stale_jobs(queue_dir)
+        rendered = sum(work_on_job(job_dir, owner) for job_dir in _job_dirs(queue_dir))
+        total += rendered
+        if rendered:
+            idle_since = time.time()
+        elif idle_seconds is not None and time.time() - idle_since > idle_seconds:
+            print(f"   {total} chunks renderitzats")
+            return total
+        else:
+            time.sleep(DISTRIBUTED_POLL_SECONDS)
+
+
+def _print_node_stats(job_dir: Path, chunks: list):
+    nodes = {}
+    for start, end in chunks:
+        try:
+            info = json.loads((job_dir / "done" / f"{_chunk_name(start, end)}.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        node = nodes.setdefault(info["owner"], {"chunks": 0, "frames": 0, "seconds": 0.0, "retries": 0})
+        node["chunks"] += 1
+        node["frames"] += info["frames"]
+        node["seconds"] += info["seconds"]
+        node["retries"] += info["attempt"] > 1
+    print("   Nodes:")
+    for owner, node in sorted(nodes.items()):
+        print(f"      {owner:<30} {node['chunks']:>3} chunks  {node['frames']:>5} frames  "
+              f"{node['seconds']:7.1f}s  {node['frames'] / max(node['seconds'], 1e-9):5.1f} fps"
+              + (f"  ({node['retries']} reintents)" if node["retries"] else ""))
+
+
+def render_distributed(
+    featured_album_id: str,
+    session_info: dict,
+    output_name: str,
+    queue_dir: Path,
+    duration: float = 10.0,
+    options: dict = None,
+    lease_seconds: float = LEASE_SECONDS
+) -> Optional[Path]:
+    """
+    Coordinador: publica el job a la cua compartida, en renderitza chunks com
+    un node més mentre els altres nodes fan la resta i, quan tots hi són, els
+    uneix en ordre sense recodificar. El directori del job s'esborra en acabar,
+    també si falla o s'interromp.
+    """
+    job = gpv.prepare_render_job(featured_album_id, session_info, duration=duration, options=options)
+    chunk_frames = job.get("segment_frames") or int(round(gpv.SEGMENT_SECONDS * job.get("fps", gpv.FPS)))
+    sweep_stale_jobs(queue_dir)
+    job_dir = publish_distributed_job(queue_dir, job, chunk_frames, lease_seconds)
+    try:
+        return _coordinate_job(job_dir, output_name, lease_seconds)
+    finally:
+        shutil.rmtree(job_dir, ignore_errors=True)
+
+
+def _coordinate_job(job_dir: Path, output_name: str, lease_seconds: float) -> Optional[Path]:
+    spec = _read_job_spec(job_dir)
+    chunks = spec["chunks"]
+    print(f"🌐 Job publicat a {job_dir}: {len(chunks)} chunks de {spec['chunk_frames']} frames")
+
+    owner = _node_id()
+    reported = -1
+    while True:
+        try:
+            os.utime(job_dir / "job.json")    # senyal de vida per a sweep_stale_jobs()
+        except FileNotFoundError:
+            print(f"❌ El job ha desaparegut de la cua: {job_dir}")
+            return None
+        rendered = work_on_job(job_dir, owner)
+        pending = [_chunk_name(s, e) for s, e in chunks
+                   if not (job_dir / "done" / f"{_chunk_name(s, e)}.mp4").exists()]
+        if len(pending) != reported:
+            reported = len(pending)
+            print(f"   Chunks: {len(chunks) - len(pending)}/{len(chunks)}")
+        if not pending:
+            break
+        exhausted = [name for name in pending if _chunk_exhausted(job_dir, name, lease_seconds)]
+        if exhausted:
+            print(f"❌ Chunks sense resultat després de {LEASE_MAX_ATTEMPTS} intents: {', '.join(exhausted)}")
+            for name in exhausted:
+                error = _lease_error(job_dir / "leases" / f"{name}.{LEASE_MAX_ATTEMPTS}")
+                if error:
+                    print(f"   {name}: {error}")
+            return None
+        if not rendered:
+            time.sleep(DISTRIBUTED_POLL_SECONDS)
+
+    output_path = gpv.OUTPUT_DIR / output_name
+    ok, stderr = gpv.concat_segments([job_dir / "done" / f"{_chunk_name(s, e)}.mp4" for s, e in chunks],
+                                 output_path, job_dir)
+    _print_node_stats(job_dir, chunks)
+    if not ok:
+        print(f"❌ Error ffmpeg: {stderr}")
+        return None
+
+    print(f"✅ Vídeo creat: {output_path}")
+    print(f"   Mida: {output_path.stat().st_size / (1024 * 1024):.1f} MB")
+    return output_path
+
+
+def parse_args(argv: list = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Render distribuït de vídeos promocionals")
+    parser.add_argument("queue_dir", type=Path, metavar="DIR",
+                        help="Directori compartit de la cua (p. ex. en NFS)")
+    parser.add_argument("--node", action="store_true",
+                        help="Només worker: renderitza chunks dels jobs de la cua (sense publicar-ne cap)")
+    parser.add_argument("--idle", type=float, metavar="SEGONS",
+                        help="Amb --node: surt després d'aquest temps sense chunks lliures")
+    parser.add_argument("--lease-seconds", type=float, default=LEASE_SECONDS,
+                        help=f"Segons sense renovar després dels quals un chunk es torna a repartir "
+                             f"(per defecte: {LEASE_SECONDS:g})")
+    parser.add_argument("--album", default=gpv.FEATURED_ALBUM,
+                        help=f"Àlbum destacat (per defecte: {gpv.FEATURED_ALBUM})")
+    parser.add_argument("--date", default=gpv.FEATURED_SESSION["date"], help="Data de la sessió")
+    parser.add_argument("--time", default=gpv.FEATURED_SESSION["time"], help="Hora de la sessió")
+    gpv.add_render_args(parser)
+    args = parser.parse_args(argv)
+    gpv.check_render_args(parser, args)
+
+    if args.lease_seconds <= 0:
+        parser.error("--lease-seconds ha de ser positiu")
+    if args.idle is not None and not args.node:
+        parser.error("--idle només funciona amb --node")
+    if args.output:
+        parser.error("--output no funciona amb el render distribuït")
+    if args.deadline is not None:
+        parser.error("--deadline només funciona en streaming amb un sol procés")
+    return args
+
+
+def main():
+    args = parse_args()
+
+    print("=" * 60)
+    print("🌐 SOUND DELUXE - Render distribuït de vídeos")
+    print("=" * 60)
+
+    if args.catalog:
+        try:
+            use_catalog(args.catalog)
+        except (OSError, ValueError) as e:
+            print(f"❌ Catàleg il·legible: {e}")
+            sys.exit(1)
+
+    if args.node:
+        run_render_node(args.queue_dir, args.idle)
+        return
+
+    gpv.OUTPUT_DIR.mkdir(exist_ok=True)
+    options = gpv.render_options(args)
+    output_name = gpv.default_output_name(args.album, args.date)
+    if options.get("draft"):
+        output_name = gpv.draft_output_name(output_name)
+    session = {"date": args.date, "time": args.time}
+    video_path = render_distributed(args.album, session, output_name, args.queue_dir,
+                                    duration=args.duration, options=options,
+                                    lease_seconds=args.lease_seconds)
+    if video_path is None:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
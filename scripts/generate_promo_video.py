@@ -7,27 +7,81 @@ Efecte RULETA VERTICAL - Transició fluida sense talls
 
 import os
 import math
-import random
+import argparse
+import contextlib
+import csv
+import hashlib
+import json
+import queue
+import shutil
 import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime
+from typing import Optional
 from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageEnhance
 import numpy as np
 
+from promo_catalog import (SEQUENCE_SEED, ROULETTE_ALBUMS, available_covers, build_album_sequence,
+                           get_catalog, parse_sequence_filter, use_catalog)
+from promo_paths import BASE_DIR, COVERS_DIR, write_atomic
+
 # ============================================================================
 # CONFIGURACIÓ
 # ============================================================================
 
-BASE_DIR = Path(__file__).parent.parent
-COVERS_DIR = BASE_DIR / "album-covers"
 OUTPUT_DIR = BASE_DIR / "promo-videos"
 FRAMES_DIR = OUTPUT_DIR / "frames"
 LOGO_PATH = Path("/Users/josepmarimon/Documents/Deluxe/imatge corporativa/imatge_generica.png")
 
+# Vídeo per defecte (sense --manifest)
+FEATURED_ALBUM = "NJZLoMez4714Sf01dGtBMx"
+FEATURED_SESSION = {
+    "date": "Divendres 17 Gener 2025",
+    "time": "19:30h"
+}
+
 VIDEO_WIDTH = 1080
 VIDEO_HEIGHT = 1920
 FPS = 30
 
+# Fonts candidates per estil: (ruta, índex dins del .ttc). macOS primer, després Linux
+FONT_CANDIDATES = {
+    "regular": [
+        ("/System/Library/Fonts/Helvetica.ttc", 0),
+        ("/System/Library/Fonts/SFNSDisplay.ttf", 0),
+        ("/Library/Fonts/Arial.ttf", 0),
+        ("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 0),
+        ("/usr/share/fonts/TTF/DejaVuSans.ttf", 0),
+        ("/usr/share/fonts/dejavu-sans-fonts/DejaVuSans.ttf", 0),
+        ("/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf", 0),
+        ("/usr/share/fonts/liberation-sans/LiberationSans-Regular.ttf", 0),
+        ("/usr/share/fonts/truetype/freefont/FreeSans.ttf", 0),
+    ],
+    "bold": [
+        ("/System/Library/Fonts/Helvetica.ttc", 1),
+        ("/Library/Fonts/Arial Bold.ttf", 0),
+        ("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 0),
+        ("/usr/share/fonts/TTF/DejaVuSans-Bold.ttf", 0),
+        ("/usr/share/fonts/dejavu-sans-fonts/DejaVuSans-Bold.ttf", 0),
+        ("/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf", 0),
+        ("/usr/share/fonts/liberation-sans/LiberationSans-Bold.ttf", 0),
+        ("/usr/share/fonts/truetype/freefont/FreeSansBold.ttf", 0),
+    ],
+}
+
+# Cache de portades: les mides s'arrodoneixen a múltiples d'aquest pas (px). Amb 1 (per
+# defecte) les portades es dibuixen a la mida exacta. Un pas de 4 px reaprofita més
+# variants però desplaça 1-2 px les vores dels discos en moviment (~33 dB de PSNR de
+# mediana durant el gir, ~26 dB el pitjor frame) i trenca la identitat amb el render original
+COVER_SIZE_STEP = 1
+COVER_CACHE_MAX_BYTES = 512 * 1024 * 1024     # portades descodificades i variants emmarcades
+
 COLORS = {
     "primary": (15, 15, 30),
     "secondary": (25, 25, 50),
@@ -37,47 +91,168 @@ COLORS = {
     "light_gray": (180, 180, 180),
 }
 
-ALBUMS_DATA = {
-    "GZA8SAwsKh0Q7JjyWiSjNC": {"artist": "Pink Floyd", "title": "The Dark Side of the Moon", "year": 1973},
-    "GZA8SAwsKh0Q7JjyWiSjtK": {"artist": "Miles Davis", "title": "Kind of Blue", "year": 1959},
-    "GZA8SAwsKh0Q7JjyWiSkPS": {"artist": "Marvin Gaye", "title": "What's Going On", "year": 1971},
-    "GZA8SAwsKh0Q7JjyWiSlNh": {"artist": "The Velvet Underground", "title": "The Velvet Underground & Nico", "year": 1967},
-    "GZA8SAwsKh0Q7JjyWiSldl": {"artist": "Led Zeppelin", "title": "Led Zeppelin IV", "year": 1971},
-    "GZA8SAwsKh0Q7JjyWiSniH": {"artist": "Miles Davis", "title": "Bitches Brew", "year": 1970},
-    "GZA8SAwsKh0Q7JjyWiSp0b": {"artist": "Guns N' Roses", "title": "Appetite for Destruction", "year": 1987},
-    "GZA8SAwsKh0Q7JjyWiSpup": {"artist": "The Smiths", "title": "The Queen is Dead", "year": 1986},
-    "NJZLoMez4714Sf01dGtBMx": {"artist": "Michael Jackson", "title": "Thriller", "year": 1982},
-    "NJZLoMez4714Sf01dGtDAF": {"artist": "John Coltrane", "title": "A Love Supreme", "year": 1965},
-    "NJZLoMez4714Sf01dGtDwd": {"artist": "Amy Winehouse", "title": "Back to Black", "year": 2006},
-    "NJZLoMez4714Sf01dGtEFz": {"artist": "Lauryn Hill", "title": "The Miseducation of Lauryn Hill", "year": 1998},
-    "NJZLoMez4714Sf01dGtFC3": {"artist": "Daft Punk", "title": "Random Access Memories", "year": 2013},
-    "NJZLoMez4714Sf01dGtFyR": {"artist": "The Clash", "title": "London Calling", "year": 1979},
-    "NJZLoMez4714Sf01dGtGHn": {"artist": "Bruce Springsteen", "title": "Born to Run", "year": 1975},
-    "g1ucGbtbcNDpm5pEnR5nd1": {"artist": "The Beatles", "title": "Abbey Road", "year": 1969},
-    "g1ucGbtbcNDpm5pEnR5ov1": {"artist": "The Beach Boys", "title": "Pet Sounds", "year": 1966},
-    "g1ucGbtbcNDpm5pEnR5pF1": {"artist": "Radiohead", "title": "OK Computer", "year": 1997},
-    "g1ucGbtbcNDpm5pEnR5pP1": {"artist": "U2", "title": "The Joshua Tree", "year": 1987},
-    "g1ucGbtbcNDpm5pEnR5po1": {"artist": "Joni Mitchell", "title": "Blue", "year": 1971},
-    "g1ucGbtbcNDpm5pEnR5qm1": {"artist": "Fleetwood Mac", "title": "Rumours", "year": 1977},
-}
+
+# ============================================================================
+# INSTRUMENTACIÓ
+# ============================================================================
+
+# Trams de primer nivell dins d'un frame (els subtrams porten un prefix, p. ex. cover.paste)
+RENDER_STAGES = ("plan", "background", "covers", "glow", "indicators", "vinyl", "text", "logo")
+
+_tracer = None
+_NO_SPAN = contextlib.nullcontext()
+
+
+def set_tracer(tracer) -> object:
+    """
+    Activa un tracer (qualsevol objecte amb un mètode span(name, **args) que
+    retorni un context manager) per mesurar els trams del render. None el
+    desactiva. Retorna el tracer anterior.
+    """
+    global _tracer
+    previous, _tracer = _tracer, tracer
+    return previous
+
+
+def get_tracer():
+    """Tracer actiu del procés (None si el traçat està desactivat)."""
+    return _tracer
+
+
+def span(name: str, **args):
+    """Tram mesurable del render; sense tracer actiu no fa res."""
+    if _tracer is None:
+        return _NO_SPAN
+    return _tracer.span(name, **args)
+
+
+class _TraceSpan:
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer: "Tracer", name: str, args: dict):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        self.tracer.events.append((self.name, self.start, end, self.tracer.pid,
+                                   threading.get_native_id(), self.args or None))
+        return False
+
+
+class Tracer:
+    """
+    Recull trams (nom, inici, fi, pid, fil, args) amb el rellotge monòton del
+    sistema, comparable entre processos. S'exporta com a JSON de Chrome
+    (chrome://tracing, Perfetto) o com a taula agregada per nom de tram.
+    """
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.events = []
+
+    def span(self, name: str, **args) -> _TraceSpan:
+        return _TraceSpan(self, name, args)
+
+    def drain(self) -> list:
+        """Treu i retorna els trams recollits (per enviar-los des d'un worker)."""
+        events, self.events = self.events, []
+        return events
+
+    def extend(self, events: list):
+        """Afegeix trams recollits en un altre procés."""
+        self.events.extend(events)
+
+    def chrome_trace(self) -> dict:
+        """Trams en format Trace Event de Chrome (esdeveniments complets 'X', en µs)."""
+        trace_events = []
+        for name, start, end, pid, tid, args in self.events:
+            event = {"name": name, "cat": "render", "ph": "X", "ts": start / 1000,
+                     "dur": (end - start) / 1000, "pid": pid, "tid": tid}
+            if args:
+                event["args"] = args
+            trace_events.append(event)
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+    def write_chrome_trace(self, path: Path) -> Path:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f)
+        return path
+
+    def summary(self) -> list:
+        """Agregat per nom de tram: (nom, crides, total ms, mitjana ms, p95 ms, màx ms)."""
+        durations = {}
+        for name, start, end, *_ in self.events:
+            durations.setdefault(name, []).append((end - start) / 1e6)
+
+        rows = []
+        for name, values in durations.items():
+            values.sort()
+            p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+            total = sum(values)
+            rows.append((name, len(values), total, total / len(values), p95, values[-1]))
+        rows.sort(key=lambda row: row[2], reverse=True)
+        return rows
+
+    def slowest_frames(self, count: int = 5) -> list:
+        """Els frames més lents amb el tram que més hi ha pesat: (frame, ms, tram, ms)."""
+        frames = [(args["frame"], start, end, pid, tid) for name, start, end, pid, tid, args in self.events
+                  if name == "frame" and args]
+        frames.sort(key=lambda f: f[2] - f[1], reverse=True)
+
+        result = []
+        for frame_num, f_start, f_end, f_pid, f_tid in frames[:count]:
+            stages = {}
+            for name, start, end, pid, tid, _ in self.events:
+                if name in RENDER_STAGES and pid == f_pid and tid == f_tid and f_start <= start and end <= f_end:
+                    stages[name] = stages.get(name, 0) + (end - start)
+            worst = max(stages, key=stages.get) if stages else "-"
+            result.append((frame_num, (f_end - f_start) / 1e6, worst, stages.get(worst, 0) / 1e6))
+        return result
+
+    def format_table(self) -> str:
+        """Taula de text amb l'agregat per tram i els frames més lents."""
+        rows = self.summary()
+        frame_total = next((row[2] for row in rows if row[0] == "frame"), 0.0)
+        lines = [f"   {'tram':<18}{'crides':>8}{'total ms':>11}{'mitjana':>10}{'p95':>9}{'màx':>9}{'%':>7}"]
+        for name, calls, total, mean, p95, peak in rows:
+            share = f"{total / frame_total:>7.1%}" if frame_total and name != "frame" else f"{'':>7}"
+            lines.append(f"   {name:<18}{calls:>8}{total:>11.1f}{mean:>10.2f}{p95:>9.2f}{peak:>9.2f}{share}")
+
+        slowest = self.slowest_frames()
+        if slowest:
+            lines.append("   Frames més lents:")
+            for frame_num, ms, stage, stage_ms in slowest:
+                lines.append(f"     #{frame_num:<6}{ms:>8.1f} ms  (sobretot {stage}: {stage_ms:.1f} ms)")
+        return "\n".join(lines)
+
 
 # ============================================================================
 # FUNCIONS AUXILIARS
 # ============================================================================
 
-def create_gradient_background(width: int, height: int) -> Image.Image:
-    """Crea un fons degradat elegant."""
-    img = Image.new('RGB', (width, height), COLORS["primary"])
-    draw = ImageDraw.Draw(img)
+def gradient_rows(height: int) -> np.ndarray:
+    """Color RGB de cada fila del fons degradat (el degradat és vertical)."""
+    # Mateixa fórmula que línia a línia, però en una sola operació vectoritzada
+    ratio = np.arange(height, dtype=np.float64)[:, None] / height
+    primary = np.array(COLORS["primary"], dtype=np.float64)
+    secondary = np.array(COLORS["secondary"], dtype=np.float64)
+    return (primary + (secondary - primary) * ratio * 0.5).astype(np.uint8)
 
-    for y in range(height):
-        ratio = y / height
-        r = int(COLORS["primary"][0] + (COLORS["secondary"][0] - COLORS["primary"][0]) * ratio * 0.5)
-        g = int(COLORS["primary"][1] + (COLORS["secondary"][1] - COLORS["primary"][1]) * ratio * 0.5)
-        b = int(COLORS["primary"][2] + (COLORS["secondary"][2] - COLORS["primary"][2]) * ratio * 0.5)
-        draw.line([(0, y), (width, y)], fill=(r, g, b))
 
-    return img
+def create_gradient_background(width: int, height: int, rows: np.ndarray = None) -> Image.Image:
+    """Crea un fons degradat elegant (o només les files `rows` de gradient_rows())."""
+    if rows is None:
+        rows = gradient_rows(height)
+    pixels = np.broadcast_to(rows[:, None, :], (len(rows), width, 3))
+    return Image.fromarray(np.ascontiguousarray(pixels), 'RGB')
 
 
 def load_logo(max_width: int = 300, crop_slogan: bool = True) -> Image.Image:
@@ -105,6 +280,11 @@ def load_logo(max_width: int = 300, crop_slogan: bool = True) -> Image.Image:
 
 def add_top_gradient_and_logo(img: Image.Image, logo: Image.Image) -> Image.Image:
     """Afegeix una franja fosca a la part superior i el logotip."""
+    with span("logo"):
+        return _add_top_gradient_and_logo(img, logo)
+
+
+def _add_top_gradient_and_logo(img: Image.Image, logo: Image.Image) -> Image.Image:
     img = img.convert('RGBA')
 
     # Calcular altura de la franja basada en el logo + marges
@@ -127,31 +307,368 @@ def add_top_gradient_and_logo(img: Image.Image, logo: Image.Image) -> Image.Imag
     return img
 
 
-def load_cover(album_id: str, size: int = 500) -> Image.Image:
-    """Carrega i redimensiona una portada quadrada."""
-    cover_path = COVERS_DIR / f"{album_id}.jpg"
+def _placeholder_cover(size: int) -> Image.Image:
+    """Portada per defecte quan no hi ha fitxer."""
+    img = Image.new('RGB', (size, size), COLORS["secondary"])
+    draw = ImageDraw.Draw(img)
+    draw.text((size//2, size//2), "?", fill=COLORS["accent"], anchor="mm")
+    return img
+
 
-    if not cover_path.exists():
-        img = Image.new('RGB', (size, size), COLORS["secondary"])
-        draw = ImageDraw.Draw(img)
-        draw.text((size//2, size//2), "?", fill=COLORS["accent"], anchor="mm")
-        return img
+def _crop_square(img: Image.Image) -> Image.Image:
+    """Retalla la part central quadrada d'una imatge."""
+    min_dim = min(img.size)
+    left = (img.width - min_dim) // 2
+    top = (img.height - min_dim) // 2
+    return img.crop((left, top, left + min_dim, top + min_dim))
 
+
+def _file_signature(path: Path) -> Optional[list]:
+    """(mtime, mida) d'un fitxer, o None si no existeix."""
     try:
-        img = Image.open(cover_path)
-        img = img.convert('RGB')
-        min_dim = min(img.size)
-        left = (img.width - min_dim) // 2
-        top = (img.height - min_dim) // 2
-        img = img.crop((left, top, left + min_dim, top + min_dim))
-        img = img.resize((size, size), Image.Resampling.LANCZOS)
-        return img
-    except Exception as e:
-        return Image.new('RGB', (size, size), COLORS["secondary"])
+        st = path.stat()
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+
+class CoverCache:
+    """
+    Cache de portades per a la ruleta.
+    Cada JPEG es descodifica i es retalla una sola vegada (o es llegeix de
+    l'atles compartit, veure CoverAtlas); les portades descodificades i les
+    variants emmarcades (RGBA, per mida) comparteixen un LRU limitat per
+    memòria. Les de l'atles no compten: són pàgines mapejades i compartides.
+    """
+
+    def __init__(
+        self,
+        covers_dir: Path = None,
+        size_step: int = COVER_SIZE_STEP,
+        max_bytes: int = COVER_CACHE_MAX_BYTES,
+        atlas: "CoverAtlas" = None
+    ):
+        self.covers_dir = covers_dir
+        self.atlas = atlas
+        self.size_step = max(1, size_step)
+        self.max_bytes = max_bytes
+        self._initial_max_bytes = max_bytes
+        self._missing = {}              # album_id -> None (sense fitxer) o False (il·legible)
+        self._entries = OrderedDict()   # ("source", id) o ("variant", id, mida, gruix, filtre) -> (imatge, bytes)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.decodes = 0
+        self.mapped = 0
+        self.evictions = 0
+
+    def use_atlas(self, atlas: "CoverAtlas"):
+        """Llegeix les portades de l'atles (les ja descodificades s'alliberen)."""
+        self.atlas = atlas
+        self._missing.clear()
+        for key in [key for key in self._entries if key[0] == "source"]:
+            self._bytes -= self._entries.pop(key)[1]
+
+    def bucket(self, size: int) -> int:
+        """Arrodoneix una mida al pas de la cache."""
+        if self.size_step == 1:
+            return size
+        return max(self.size_step, int(round(size / self.size_step)) * self.size_step)
+
+    def _store(self, key: tuple, img: Image.Image, nbytes: int):
+        """Afegeix una entrada al LRU i en descarta les més antigues si cal."""
+        self._entries[key] = (img, nbytes)
+        self._bytes += nbytes
+        self._evict()
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, (_, old_bytes) = self._entries.popitem(last=False)
+            self._bytes -= old_bytes
+            self.evictions += 1
+
+    def limit(self, max_bytes: int = None):
+        """Fixa la mida màxima de la cache (None: la inicial) i en descarta el que ja no hi cap."""
+        max_bytes = max_bytes or self._initial_max_bytes
+        if max_bytes != self.max_bytes:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def source(self, album_id: str) -> Optional[Image.Image]:
+        """Portada original retallada (None si no existeix o és il·legible)."""
+        if album_id in self._missing:
+            return self._missing[album_id]
+        key = ("source", album_id)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            return entry[0]
+
+        if self.atlas is not None:
+            src = self.atlas.get(album_id)
+            if src is not None:
+                self.mapped += 1
+                if src is False:
+                    self._missing[album_id] = src
+                else:
+                    self._store(key, src, 0)
+                return src
+
+        cover_path = (self.covers_dir or COVERS_DIR) / f"{album_id}.jpg"
+        src = None
+        if cover_path.exists():
+            try:
+                with span("cover.decode", album_id=album_id), Image.open(cover_path) as img:
+                    src = _crop_square(img.convert('RGB'))
+                self.decodes += 1
+            except Exception:
+                src = False
+        if src:
+            self._store(key, src, src.width * src.height * 4)
+        else:
+            self._missing[album_id] = src
+        return src
+
+    def signature(self, album_id: str) -> Optional[list]:
+        """(mtime, mida) del JPEG de la portada, per invalidar caches derivades."""
+        return _file_signature((self.covers_dir or COVERS_DIR) / f"{album_id}.jpg")
+
+    def cover(self, album_id: str, size: int, resample: int = Image.Resampling.LANCZOS) -> Image.Image:
+        """Portada quadrada de `size` px (o la de recanvi si no n'hi ha)."""
+        src = self.source(album_id)
+        if src is None:
+            return _placeholder_cover(size)
+        if src is False:
+            return Image.new('RGB', (size, size), COLORS["secondary"])
+        return src.resize((size, size), resample)
+
+    def get(self, album_id: str, size: int, thickness: int = 4,
+            resample: int = Image.Resampling.LANCZOS) -> Image.Image:
+        """
+        Portada emmarcada en RGBA, escalada amb el filtre `resample`. La imatge
+        retornada és compartida: cal fer-ne una còpia abans de modificar-la.
+        """
+        key = ("variant", album_id, size, thickness, resample)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+        self.misses += 1
+        with span("cover.scale", size=size):
+            framed = add_cover_frame(self.cover(album_id, size, resample), thickness).convert('RGBA')
+        self._store(key, framed, framed.width * framed.height * 4)
+        return framed
+
+    def stats(self) -> dict:
+        """Estadístiques d'ús de la cache."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "decodes": self.decodes,
+            "mapped": self.mapped,
+            "evictions": self.evictions,
+            "sources": sum(1 for key in self._entries if key[0] == "source"),
+            "variants": sum(1 for key in self._entries if key[0] == "variant"),
+            "mb": self._bytes / (1024 * 1024),
+        }
+
+
+_default_cover_cache = None
+
+
+def get_cover_cache() -> CoverCache:
+    """Cache de portades compartida pel procés."""
+    global _default_cover_cache
+    if _default_cover_cache is None:
+        _default_cover_cache = CoverCache()
+    return _default_cover_cache
+
+
+# ============================================================================
+# ATLES DE PORTADES (compartit entre processos)
+# ============================================================================
+
+COVER_ATLAS_DIR = OUTPUT_DIR / "cache" / "covers"
+COVER_ATLAS_INDEX = "covers.json"
+COVER_ATLAS_ALIGN = 64
+
+# Incrementar quan canviï el format o el retall de les portades de l'atles
+COVER_ATLAS_VERSION = 1
+
+
+def _file_hash(path: Path) -> str:
+    """Hash del contingut d'un fitxer."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_atlas_index(atlas_dir: Path) -> Optional[dict]:
+    try:
+        with open(atlas_dir / COVER_ATLAS_INDEX, encoding="utf-8") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if index.get("version") != COVER_ATLAS_VERSION or not (atlas_dir / index.get("data", "")).is_file():
+        return None
+    return index
 
 
-def create_vinyl_disc(size: int) -> Image.Image:
-    """Crea un disc de vinil realista."""
+class CoverAtlas:
+    """
+    Portades descodificades i retallades (el mateix retall que CoverCache) en
+    un sol fitxer de píxels uint8 crus (RGBX, el format intern de PIL per a
+    RGB), amb un índex JSON per album_id. Cada procés el mapeja a memòria i en
+    llegeix les portades sense descodificar-les ni copiar-les al seu heap: les
+    pàgines són compartides.
+    """
+
+    def __init__(self, atlas_dir: Path = None):
+        self.atlas_dir = Path(atlas_dir or COVER_ATLAS_DIR)
+        index = _read_atlas_index(self.atlas_dir)
+        if index is None:
+            raise FileNotFoundError(f"No hi ha cap atles de portades a {self.atlas_dir}")
+        self.data_name = index["data"]
+        self.entries = index["entries"]
+        data_path = self.atlas_dir / self.data_name
+        self._data = np.memmap(data_path, dtype=np.uint8, mode='r') if data_path.stat().st_size else None
+
+    def get(self, album_id: str):
+        """
+        Portada retallada (RGBX de només lectura, sense còpia), False si el
+        JPEG és il·legible o None si l'atles no la té.
+        """
+        entry = self.entries.get(album_id)
+        if entry is None:
+            return None
+        if entry.get("error"):
+            return False
+        side = entry["side"]
+        view = self._data[entry["offset"]:entry["offset"] + side * side * 4]
+        return Image.frombuffer('RGBX', (side, side), view, 'raw', 'RGBX', 0, 1)
+
+    def nbytes(self) -> int:
+        return 0 if self._data is None else self._data.size
+
+
+def build_cover_atlas(atlas_dir: Path = None, covers_dir: Path = None) -> bool:
+    """
+    Crea o actualitza l'atles de portades. Una portada es torna a descodificar
+    si el JPEG és nou o el seu contingut ha canviat (un canvi de mtime amb el
+    mateix hash només actualitza l'índex). Les dades noves van a un fitxer nou
+    i l'índex se substitueix atòmicament: els processos que tenen l'atles
+    anterior mapejat el poden continuar llegint. Retorna si l'atles ha canviat.
+    """
+    atlas_dir = Path(atlas_dir or COVER_ATLAS_DIR)
+    covers_dir = Path(covers_dir or COVERS_DIR)
+    atlas_dir.mkdir(parents=True, exist_ok=True)
+
+    index = _read_atlas_index(atlas_dir) or {"entries": {}, "data": None}
+    old_entries = index["entries"]
+    entries, stale = {}, []
+    for path in sorted(covers_dir.glob("*.jpg")):
+        album_id = path.stem
+        signature = _file_signature(path)
+        entry = old_entries.get(album_id)
+        if entry is not None and entry["signature"] == signature:
+            entries[album_id] = entry
+            continue
+        digest = _file_hash(path)
+        if entry is not None and entry["hash"] == digest:
+            entries[album_id] = {**entry, "signature": signature}
+        else:
+            entries[album_id] = {"signature": signature, "hash": digest}
+            stale.append(album_id)
+
+    data_name = index["data"]
+    if entries == old_entries and data_name is not None:
+        return False
+
+    if stale or set(old_entries) - set(entries) or data_name is None:
+        old_data = None
+        if index["data"] and (atlas_dir / index["data"]).stat().st_size:
+            old_data = np.memmap(atlas_dir / index["data"], dtype=np.uint8, mode='r')
+
+        # Nom segons el contingut: mai se sobreescriu un fitxer que algú tingui mapejat
+        hashes = json.dumps([[aid, entry["hash"]] for aid, entry in entries.items()]).encode()
+        data_name = f"covers-{hashlib.blake2b(hashes, digest_size=8).hexdigest()}.bin"
+        tmp_data = atlas_dir / f".{data_name}.{os.getpid()}"
+        offset = 0
+        with open(tmp_data, "wb") as f:
+            for album_id, entry in entries.items():
+                if album_id in stale:
+                    try:
+                        with span("cover.decode", album_id=album_id), \
+                                Image.open(covers_dir / f"{album_id}.jpg") as img:
+                            cover = _crop_square(img.convert('RGB'))
+                        entry["side"] = cover.width
+                        pixels = cover.convert('RGBX').tobytes()
+                    except Exception:
+                        entry.update({"error": True, "side": 0})
+                        continue
+                    entry.pop("error", None)
+                elif entry.get("error"):
+                    continue
+                else:
+                    start = entry["offset"]
+                    pixels = old_data[start:start + entry["side"] * entry["side"] * 4].tobytes()
+
+                padding = -offset % COVER_ATLAS_ALIGN
+                f.write(b"\0" * padding)
+                offset += padding
+                entry["offset"] = offset
+                f.write(pixels)
+                offset += len(pixels)
+        del old_data
+        os.replace(tmp_data, atlas_dir / data_name)
+
+    tmp_index = atlas_dir / f".{COVER_ATLAS_INDEX}.{os.getpid()}"
+    with open(tmp_index, "w", encoding="utf-8") as f:
+        json.dump({"version": COVER_ATLAS_VERSION, "data": data_name, "entries": entries}, f)
+    os.replace(tmp_index, atlas_dir / COVER_ATLAS_INDEX)
+
+    # Els fitxers de dades anteriors ja no són a l'índex (els mapejos oberts continuen vàlids)
+    for old in atlas_dir.glob("covers-*.bin"):
+        if old.name != data_name:
+            old.unlink(missing_ok=True)
+
+    print(f"🗂️  Atles de portades actualitzat: {len(entries)} portades, {len(stale)} descodificades")
+    return True
+
+
+def use_cover_atlas(atlas_dir: Path = None, build: bool = False) -> CoverAtlas:
+    """
+    Fa que la cache de portades del procés llegeixi de l'atles (mapejat a
+    memòria). Amb `build`, abans el crea o l'actualitza si cal.
+    """
+    atlas_dir = Path(atlas_dir or COVER_ATLAS_DIR)
+    changed = build_cover_atlas(atlas_dir) if build else False
+
+    covers = get_cover_cache()
+    atlas = covers.atlas
+    if changed or atlas is None or atlas.atlas_dir != atlas_dir:
+        atlas = CoverAtlas(atlas_dir)
+        covers.use_atlas(atlas)
+    return atlas
+
+
+# El vinil gira a 33⅓ rpm durant la revelació. El cos i els solcs tenen simetria
+# radial i no canvien en girar: només es rota l'etiqueta, pre-rotada a angles quantitzats
+VINYL_RPM = 100 / 3
+VINYL_ANGLE_STEPS = 54      # 6⅔° per pas: a 33⅓ rpm i 30 fps, exactament un pas per frame
+
+
+def create_vinyl_disc(size: int, scale: float = 1.0) -> Image.Image:
+    """
+    Crea el cos d'un disc de vinil realista (solcs a l'escala del render), sense
+    l'etiqueta central: veure create_vinyl_label().
+    """
     vinyl = Image.new('RGBA', (size, size), (0, 0, 0, 0))
     draw = ImageDraw.Draw(vinyl)
     center = size // 2
@@ -163,22 +680,304 @@ def create_vinyl_disc(size: int) -> Image.Image:
                     fill=(brightness, brightness, brightness, 255))
 
     # Solcs
-    for radius in range(25, center - 10, 3):
+    for radius in range(layout_px(25, scale), center - layout_px(10, scale), layout_px(3, scale)):
         alpha = 35 + (radius % 6) * 4
         draw.ellipse([center - radius, center - radius, center + radius, center + radius],
                     outline=(55, 55, 55, alpha), width=1)
 
-    # Etiqueta central vermella
-    label_r = size // 6
-    draw.ellipse([center - label_r, center - label_r, center + label_r, center + label_r],
-                fill=COLORS["accent"] + (255,))
+    return vinyl
+
+
+def vinyl_label_radius(size: int) -> int:
+    """Radi de l'etiqueta central d'un vinil de `size` px."""
+    return size // 6
+
+
+def create_vinyl_label(size: int, artwork: Image.Image = None) -> Image.Image:
+    """
+    Etiqueta central d'un vinil de `size` px, sense rotar: vermella, amb la
+    portada al mig, la marca i la velocitat impreses a l'anell i el forat central.
+    Quadrada de costat 2 * radi + 1, amb el centre del disc al píxel central.
+    """
+    label_r = vinyl_label_radius(size)
+    side = 2 * label_r + 1
+    label = Image.new('RGBA', (side, side), COLORS["accent"] + (255,))
+    draw = ImageDraw.Draw(label)
+
+    # Portada retallada en cercle
+    art_r = int(label_r * 0.62)
+    if artwork is not None and art_r > 0:
+        art = artwork.convert('RGB').resize((2 * art_r + 1, 2 * art_r + 1), Image.Resampling.LANCZOS)
+        mask = Image.new('L', art.size, 0)
+        ImageDraw.Draw(mask).ellipse([0, 0, 2 * art_r, 2 * art_r], fill=255)
+        label.paste(art, (label_r - art_r, label_r - art_r), mask)
+
+    # Impressió a l'anell: marca a dalt i velocitat a baix
+    ring = label_r - art_r
+    font = get_font(max(6, int(ring * 0.3)), bold=True)
+    draw.text((label_r, ring // 2), "SOUND DELUXE", fill=COLORS["white"], anchor="mm", font=font)
+    draw.text((label_r, side - 1 - ring // 2), "33⅓ RPM", fill=COLORS["white"], anchor="mm", font=font)
 
     # Forat central
     hole_r = label_r // 5
-    draw.ellipse([center - hole_r, center - hole_r, center + hole_r, center + hole_r],
+    draw.ellipse([label_r - hole_r, label_r - hole_r, label_r + hole_r, label_r + hole_r],
                 fill=(15, 15, 15, 255))
 
-    return vinyl
+    # Fora del cercle, transparent
+    alpha = Image.new('L', (side, side), 0)
+    ImageDraw.Draw(alpha).ellipse([0, 0, side - 1, side - 1], fill=255)
+    label.putalpha(alpha)
+    return label
+
+
+def vinyl_label_angle(seconds, rpm: float = VINYL_RPM):
+    """
+    Angle de l'etiqueta (graus, en sentit horari) després de girar `seconds`
+    segons a `rpm`, quantitzat a VINYL_ANGLE_STEPS passos per volta.
+    """
+    # El marge evita que l'error de coma flotant deixi un frame al pas anterior
+    steps = np.floor(np.asarray(seconds, dtype=np.float64) * rpm / 60 * VINYL_ANGLE_STEPS + 1e-6)
+    return vinyl_step_angle(np.mod(steps, VINYL_ANGLE_STEPS))
+
+
+def vinyl_step_angle(step):
+    """Angle (graus) del pas `step` de VINYL_ANGLE_STEPS, arrodonit perquè sigui estable al pla."""
+    return np.round(np.asarray(step, dtype=np.float64) * (360 / VINYL_ANGLE_STEPS), 6)
+
+
+def create_slot_glow(glow_size: int, glow_alpha: int, blur: int = 15, ring_step: int = 3) -> Image.Image:
+    """
+    Glow daurat difuminat d'un disc que passa pel centre (sense blur si `blur`
+    és 0), dibuixat amb anells cada `ring_step` px.
+    """
+    glow = Image.new('RGBA', (glow_size, glow_size), (0, 0, 0, 0))
+    glow_draw = ImageDraw.Draw(glow)
+
+    for r in range(glow_size // 2, 0, -ring_step):
+        a = int(glow_alpha * (r / (glow_size // 2)) * 0.6)
+        glow_draw.ellipse(
+            [glow_size//2 - r, glow_size//2 - r, glow_size//2 + r, glow_size//2 + r],
+            fill=COLORS["gold"][:3] + (a,)
+        )
+
+    return glow.filter(ImageFilter.GaussianBlur(blur)) if blur else glow
+
+
+def create_reveal_glow(
+    size: tuple,
+    center: tuple,
+    glow_intensity: int,
+    radius: int = None,
+    blur: int = None,
+    ring_step: int = 4
+) -> Image.Image:
+    """Glow vermell difuminat darrere el vinil, com a capa de tot el frame."""
+    radius = REVEAL_GLOW_RADIUS if radius is None else radius
+    blur = REVEAL_GLOW_BLUR if blur is None else blur
+    center_x, center_y = center
+    glow = Image.new('RGBA', size, (0, 0, 0, 0))
+    gdraw = ImageDraw.Draw(glow)
+    for r in range(radius, 0, -ring_step):
+        alpha = int(glow_intensity * (1 - r/radius) * 0.6)
+        gdraw.ellipse([center_x - r, center_y - r, center_x + r, center_y + r],
+                     fill=COLORS["accent"][:3] + (alpha,))
+    return glow.filter(ImageFilter.GaussianBlur(blur)) if blur else glow
+
+
+# Els glows es difuminen una vegada a intensitat "unitat" i s'escalen per alpha
+SLOT_GLOW_UNIT = 255        # glow_alpha de referència del sprite daurat
+REVEAL_GLOW_UNIT = 425      # glow_intensity de referència (alpha màxim 255)
+REVEAL_GLOW_RADIUS = 200
+REVEAL_GLOW_BLUR = 35
+GLOW_SIZE_STEP = 8          # px: els glows són difusos, admeten buckets més grossos
+SPRITE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Nivells de qualitat dels efectes, de més a menys (el render amb termini els abaixa
+# per fases): factor del radi dels blurs, factor del pas entre anells dels glows,
+# ombres, filtre d'escalat de les portades i preset de x264 (None: el del job).
+# El nivell 0 és el render normal.
+QUALITY_LEVELS = (
+    {"name": "alta", "blur": 1.0, "ring_step": 1, "shadows": True, "resample": "lanczos", "preset": None},
+    {"name": "mitjana", "blur": 0.5, "ring_step": 2, "shadows": True, "resample": "bilinear", "preset": "faster"},
+    {"name": "baixa", "blur": 0.0, "ring_step": 4, "shadows": False, "resample": "bilinear", "preset": "ultrafast"},
+)
+RESAMPLE_FILTERS = {"lanczos": Image.Resampling.LANCZOS, "bilinear": Image.Resampling.BILINEAR}
+
+
+def layout_px(value: float, scale: float) -> int:
+    """Constant de maquetació (px a 1080x1920) a l'escala del render."""
+    return max(1, int(round(value * scale)))
+
+
+def frame_size(scale: float = 1.0) -> tuple:
+    """Mida del frame a l'escala donada (parella, com demana yuv420p)."""
+    width, height = layout_px(VIDEO_WIDTH, scale), layout_px(VIDEO_HEIGHT, scale)
+    return width - width % 2, height - height % 2
+
+
+def reveal_glow_half(scale: float = 1.0) -> int:
+    """Meitat del costat del sprite del glow de revelació (radi + marge del blur)."""
+    return layout_px(REVEAL_GLOW_RADIUS, scale) + 3 * layout_px(REVEAL_GLOW_BLUR, scale)
+
+
+class SpriteCache:
+    """
+    Sprites difuminats d'intensitat unitat: un glow daurat per mida de disc i
+    el glow de revelació dins la seva caixa. Per cada frame només s'escala el
+    canal alpha, en lloc de dibuixar centenars d'el·lipses i fer un GaussianBlur.
+    Els sprites es fan a l'escala del render; amb `cheap_effects` (esborranys)
+    els glows no es difuminen. `quality` és l'índex a QUALITY_LEVELS.
+    """
+
+    def __init__(self, max_bytes: int = SPRITE_CACHE_MAX_BYTES, scale: float = 1.0, cheap_effects: bool = False,
+                 quality: int = 0):
+        self.max_bytes = max_bytes
+        self.scale = scale
+        self._initial_max_bytes = max_bytes
+        self.cheap_effects = cheap_effects
+        self.quality = QUALITY_LEVELS[quality]
+        self._sprites = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, key, build):
+        sprite = self._sprites.get(key)
+        if sprite is not None:
+            self.hits += 1
+            self._sprites.move_to_end(key)
+            return sprite
+
+        self.misses += 1
+        sprite = build()
+        self._sprites[key] = sprite
+        self._bytes += self._nbytes(sprite)
+        self._evict()
+        return sprite
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and len(self._sprites) > 1:
+            _, old = self._sprites.popitem(last=False)
+            self._bytes -= self._nbytes(old)
+
+    def limit(self, max_bytes: int = None):
+        """Fixa la mida màxima de la cache (None: la inicial) i en descarta el que ja no hi cap."""
+        max_bytes = max_bytes or self._initial_max_bytes
+        if max_bytes != self.max_bytes:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    @staticmethod
+    def _nbytes(sprite) -> int:
+        if isinstance(sprite, Image.Image):
+            return sprite.width * sprite.height * len(sprite.getbands())
+        if isinstance(sprite, np.ndarray):
+            return sprite.nbytes
+        return sum(SpriteCache._nbytes(part) for part in sprite if isinstance(part, (Image.Image, np.ndarray)))
+
+    def _blur(self, radius: float) -> int:
+        """Radi de blur a l'escala i qualitat del render (0: sense blur)."""
+        if self.cheap_effects or not self.quality["blur"]:
+            return 0
+        return layout_px(radius * self.quality["blur"], self.scale)
+
+    @staticmethod
+    def glow_bucket(glow_size: int) -> int:
+        """Mida del sprite que s'usa per a un glow de `glow_size` px."""
+        return max(GLOW_SIZE_STEP, int(round(glow_size / GLOW_SIZE_STEP)) * GLOW_SIZE_STEP)
+
+    def slot_glow(self, glow_size: int) -> Image.Image:
+        """
+        Glow daurat difuminat a intensitat SLOT_GLOW_UNIT, de mida glow_bucket(glow_size).
+        Cal centrar-lo sobre la caixa original (compartit, no modificar).
+        """
+        size = self.glow_bucket(glow_size)
+        blur = self._blur(15)
+        ring_step = 3 * self.quality["ring_step"]
+        return self._get(("slot", size), lambda: create_slot_glow(size, SLOT_GLOW_UNIT, blur, ring_step))
+
+    def reveal_glow(self) -> Image.Image:
+        """
+        Glow de revelació a intensitat REVEAL_GLOW_UNIT, dibuixat només dins la seva
+        caixa (radi + marge del blur), centrat al sprite.
+        """
+        half = reveal_glow_half(self.scale)
+        radius = layout_px(REVEAL_GLOW_RADIUS, self.scale)
+        blur = self._blur(REVEAL_GLOW_BLUR)
+        ring_step = 4 * self.quality["ring_step"]
+        return self._get(("reveal",), lambda: create_reveal_glow((2 * half, 2 * half), (half, half),
+                                                                  REVEAL_GLOW_UNIT, radius, blur, ring_step))
+
+    def vinyl_label(self, size: int, album_id: str, angle: float, artwork_fn) -> Image.Image:
+        """
+        Etiqueta del vinil rotada `angle` graus en sentit horari. Cada angle
+        quantitzat es rota una sola vegada a partir de l'etiqueta a 0°;
+        `artwork_fn` retorna la portada (només es crida per construir-la).
+        """
+        base = self._get(("vinyl_label", size, album_id, 0), lambda: create_vinyl_label(size, artwork_fn()))
+        if angle % 360 == 0:
+            return base
+        return self._get(("vinyl_label", size, album_id, angle % 360),
+                         lambda: base.rotate(-angle, resample=Image.Resampling.BICUBIC))
+
+    def text(self, text: str, font_size: int, bold: bool = False) -> tuple:
+        """
+        Línia de text rasteritzada una sola vegada: (màscara 'L', dx, dy), on
+        (dx, dy) és la cantonada de la màscara respecte del punt d'ancoratge 'mm'.
+        """
+        def build():
+            font = get_font(font_size, bold=bold)
+            left, top, right, bottom = font.getbbox(text, anchor="mm")
+            mask = Image.new('L', (max(1, right - left), max(1, bottom - top)), 0)
+            ImageDraw.Draw(mask).text((-left, -top), text, fill=255, anchor="mm", font=font)
+            return mask, left, top
+        return self._get(("text", text, font_size, bold), build)
+
+    def line(self, points: list, width: int = 3) -> tuple:
+        """Línia rasteritzada una sola vegada: (màscara 'L', x, y) en coordenades del frame."""
+        def build():
+            xs = [p[0] for p in points]
+            ys = [p[1] for p in points]
+            x0, y0 = min(xs) - width, min(ys) - width
+            mask = Image.new('L', (max(xs) - x0 + width + 1, max(ys) - y0 + width + 1), 0)
+            ImageDraw.Draw(mask).line([(px - x0, py - y0) for px, py in points], fill=255, width=width)
+            return mask, x0, y0
+        return self._get(("line", tuple(map(tuple, points)), width), build)
+
+    def arrays(self, name: tuple, sprite_fn) -> tuple:
+        """Versió NumPy (rgb, alpha 0..1) d'un sprite, a la mateixa LRU."""
+        def build():
+            arr = np.asarray(sprite_fn(), dtype=np.float32)
+            return arr[..., :3], arr[..., 3] / 255.0
+        return self._get(("np", name), build)
+
+    def mask_array(self, name: tuple, mask_fn) -> tuple:
+        """Versió NumPy (cobertura 0..1, x, y) d'una màscara de text o línia."""
+        def build():
+            mask, x, y = mask_fn()
+            return np.asarray(mask, dtype=np.float32) / 255.0, x, y
+        return self._get(("np", name), build)
+
+    @staticmethod
+    def scaled_mask(mask: Image.Image, factor: float) -> Image.Image:
+        """Màscara 'L' multiplicada per `factor`."""
+        lut = [min(255, int(v * factor + 0.5)) for v in range(256)]
+        return mask.point(lut)
+
+    @staticmethod
+    def scaled_alpha(sprite: Image.Image, factor: float) -> Image.Image:
+        """Canal alpha del sprite multiplicat per `factor` (màscara 'L')."""
+        return SpriteCache.scaled_mask(sprite.getchannel('A'), factor)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "sprites": len(self._sprites),
+            "mb": self._bytes / (1024 * 1024),
+        }
 
 
 def add_cover_frame(cover: Image.Image, thickness: int = 4) -> Image.Image:
@@ -189,20 +988,83 @@ def add_cover_frame(cover: Image.Image, thickness: int = 4) -> Image.Image:
     return framed
 
 
+class FontRegistry:
+    """
+    Resol cada estil de font una sola vegada (primer candidat que es pot
+    carregar) i guarda les fonts per mida. Les rutes de PROMO_FONT_PATHS i
+    PROMO_BOLD_FONT_PATHS (separades per ':') tenen prioritat sobre FONT_CANDIDATES.
+    La negreta és opcional (`bold_faces` o PROMO_BOLD_FONTS=1): per defecte els
+    textos en negreta fan servir la cara regular, com el títol original.
+    """
+
+    def __init__(self, candidates: dict = None, bold_faces: bool = None):
+        if bold_faces is None:
+            bold_faces = os.environ.get("PROMO_BOLD_FONTS") == "1"
+        self.bold_faces = bold_faces
+        self.candidates = {style: list(paths) for style, paths in (candidates or FONT_CANDIDATES).items()}
+        for style, env in (("regular", "PROMO_FONT_PATHS"), ("bold", "PROMO_BOLD_FONT_PATHS")):
+            extra = [(path, 0) for path in os.environ.get(env, "").split(os.pathsep) if path]
+            self.candidates[style] = extra + self.candidates.get(style, [])
+        self._resolved = {}
+        self._fonts = {}
+
+    def resolve(self, bold: bool = False) -> Optional[tuple]:
+        """
+        (ruta, índex) de la font d'un estil; la negreta cau a la regular (sempre,
+        sense `bold_faces`). None si no n'hi ha cap.
+        """
+        bold = bold and self.bold_faces
+        style = "bold" if bold else "regular"
+        if style not in self._resolved:
+            found = None
+            for path, index in self.candidates.get(style, []):
+                if os.path.exists(path):
+                    try:
+                        ImageFont.truetype(path, 12, index=index)
+                    except OSError:
+                        continue
+                    found = (path, index)
+                    break
+            if found is None and bold:
+                found = self.resolve(bold=False)
+            if found is None and not bold:
+                print("⚠️  Cap font TrueType trobada: s'usa la font per defecte de Pillow "
+                      "(configura PROMO_FONT_PATHS)")
+            self._resolved[style] = found
+        return self._resolved[style]
+
+    def font(self, size: int, bold: bool = False) -> ImageFont.FreeTypeFont:
+        """Font carregada de la mida donada (compartida entre frames)."""
+        key = (size, bold)
+        font = self._fonts.get(key)
+        if font is None:
+            resolved = self.resolve(bold)
+            if resolved is not None:
+                font = ImageFont.truetype(resolved[0], size, index=resolved[1])
+            else:
+                font = ImageFont.load_default(size)
+            self._fonts[key] = font
+        return font
+
+    def describe(self) -> list:
+        """Fonts resoltes (per a claus de cache)."""
+        return [self.resolve(False), self.resolve(True)]
+
+
+_default_font_registry = None
+
+
+def get_font_registry() -> FontRegistry:
+    """Registre de fonts per defecte del procés."""
+    global _default_font_registry
+    if _default_font_registry is None:
+        _default_font_registry = FontRegistry()
+    return _default_font_registry
+
+
 def get_font(size: int, bold: bool = False) -> ImageFont.FreeTypeFont:
     """Obté una font del sistema."""
-    font_paths = [
-        "/System/Library/Fonts/Helvetica.ttc",
-        "/System/Library/Fonts/SFNSDisplay.ttf",
-        "/Library/Fonts/Arial.ttf",
-    ]
-    for path in font_paths:
-        if os.path.exists(path):
-            try:
-                return ImageFont.truetype(path, size)
-            except:
-                continue
-    return ImageFont.load_default()
+    return get_font_registry().font(size, bold)
 
 
 def ease_out_cubic(t: float) -> float:
@@ -235,394 +1097,2142 @@ def ease_slow_start(t: float) -> float:
 
 
 # ============================================================================
-# GENERACIÓ DE FRAMES - TOT EN UN (sense salts)
+# CONTEXT DE RENDER (capes estàtiques)
 # ============================================================================
 
-def create_unified_frame(
-    frame_num: int,
-    total_frames: int,
-    album_sequence: list,
-    featured_album_id: str,
-    session_info: dict,
-    cover_size: int = 500,
-    slot_height: int = 560
-) -> Image.Image:
+class RenderContext:
     """
-    Crea un frame unificat - la ruleta i la revelació són el mateix procés.
-    Quan la ruleta s'atura, el disc guanyador queda al centre i apareix la info.
+    Recursos que no canvien entre frames: fons degradat, franja superior amb
+    logotip, discs de vinil i cache de portades. Es construeixen una vegada i
+    es reutilitzen per tots els frames i renders del procés. Amb `scale` < 1
+    (esborranys) totes les capes es fan a l'escala del render. `quality` és
+    el nivell d'efectes (índex a QUALITY_LEVELS; 0 és el render normal).
     """
-    img = create_gradient_background(VIDEO_WIDTH, VIDEO_HEIGHT)
-    img = img.convert('RGBA')
 
-    progress = frame_num / (total_frames - 1)
-
-    center_x = VIDEO_WIDTH // 2
-    center_y = VIDEO_HEIGHT // 2 - 180  # Més amunt per deixar espai al text amb discos grans
+    def __init__(
+        self,
+        width: int = VIDEO_WIDTH,
+        height: int = VIDEO_HEIGHT,
+        logo_width: int = 660,
+        covers: CoverCache = None,
+        logo: Image.Image = None,
+        scale: float = 1.0,
+        cheap_effects: bool = False,
+        quality: int = 0
+    ):
+        self.width = width
+        self.height = height
+        self.scale = scale
+        self.cheap_effects = cheap_effects
+        self.quality = quality
+        self.resample = RESAMPLE_FILTERS[QUALITY_LEVELS[quality]["resample"]]
+        self.covers = covers if covers is not None else get_cover_cache()
+
+        self.logo = logo if logo is not None else load_logo(max_width=logo_width, crop_slogan=True)
+        # El fons sencer es crea en el primer frame sencer; els retalls surten de les files
+        self._rows = gradient_rows(height)
+        self._background = None
+        self._vinyls = {}
+        self.sprites = SpriteCache(scale=scale, cheap_effects=cheap_effects, quality=quality)
+        self.arrays = {}  # Capes en format NumPy (compositor numpy)
+
+        # Franja fosca al 75% i posició del logotip (veure add_top_gradient_and_logo)
+        margin_top = layout_px(30, scale)
+        margin_bottom = layout_px(30, scale)
+        band_height = self.logo.height + margin_top + margin_bottom
+        self.band = Image.new('RGBA', (width, band_height), (0, 0, 0, int(255 * 0.75)))
+        self.logo_pos = ((width - self.logo.width) // 2, margin_top)
+
+    def background(self, region: tuple = None) -> Image.Image:
+        """Còpia RGBA del fons degradat (o d'un rectangle), llesta per dibuixar-hi."""
+        if region is not None:
+            if self._background is not None:
+                return self._background.crop(region)
+            x0, y0, x1, y1 = region
+            return create_gradient_background(x1 - x0, y1 - y0, self._rows[y0:y1]).convert('RGBA')
+        if self._background is None:
+            self._background = create_gradient_background(self.width, self.height, self._rows).convert('RGBA')
+        return self._background.copy()
+
+    def vinyl(self, size: int) -> Image.Image:
+        """Cos del disc de vinil de la mida donada, sense etiqueta (compartit, no modificar)."""
+        disc = self._vinyls.get(size)
+        if disc is None:
+            disc = create_vinyl_disc(size, self.scale)
+            self._vinyls[size] = disc
+        return disc
+
+    def vinyl_label(self, size: int, album_id: str, angle: float) -> Image.Image:
+        """Etiqueta del vinil amb la portada de l'àlbum, rotada (compartida, no modificar)."""
+        return self.sprites.vinyl_label(size, album_id, angle, lambda: self.covers.source(album_id) or None)
+
+    def add_top_band(self, img: Image.Image, origin: tuple = (0, 0)) -> Image.Image:
+        """
+        Com add_top_gradient_and_logo(), però amb la franja ja construïda.
+        `origin` és la posició de `img` dins del frame quan és un retall.
+        """
+        ox, oy = origin
+        if oy >= self.band.height:
+            return img
+        with span("logo"):
+            if img.mode != 'RGBA':
+                img = img.convert('RGBA')
+            img.paste(self.band, (-ox, -oy), self.band)
+            img.paste(self.logo, (self.logo_pos[0] - ox, self.logo_pos[1] - oy), self.logo)
+        return img
 
-    num_albums = len(album_sequence)
 
-    # =========================================================================
-    # FASE 1: RULETA (0% - 55%) - gira i desaccelera
-    # FASE 2: PARADA (55% - 65%) - s'atura amb bounce
-    # FASE 3: REVELACIÓ (65% - 100%) - apareix vinil i text
-    # =========================================================================
+_render_contexts = {}
 
-    spin_end = 0.70      # 70% del vídeo girant (7 segons)
-    settle_end = 0.78    # Més temps per assentar-se
 
-    # Thriller està a la posició 14 de la seqüència (índex 14)
-    featured_index = 14
+def get_render_context(logo_width: int = 660, scale: float = 1.0, cheap_effects: bool = False,
+                       quality: int = 0) -> RenderContext:
+    """Context de render compartit pel procés (un per mida de logotip, escala i qualitat)."""
+    width, height = frame_size(scale)
+    key = (width, height, logo_width, scale, cheap_effects, quality)
+    ctx = _render_contexts.get(key)
+    if ctx is None:
+        ctx = RenderContext(width, height, layout_px(logo_width, scale),
+                            scale=scale, cheap_effects=cheap_effects, quality=quality)
+        _render_contexts[key] = ctx
+    return ctx
 
-    # SUPER LENT: el carrusel passa per 14 discos fins arribar a Thriller
-    # Això vol dir que en 7 segons veiem 14 discos = 2 segons per disc aproximadament
 
-    # L'offset per arribar a Thriller (posició 14)
-    target_offset = featured_index * slot_height
+def job_render_context(job: dict) -> RenderContext:
+    """
+    Context de render d'un job (escala i efectes de l'esborrany, si n'és un).
+    En un render amb memòria acotada (`tile_bytes`), les caches del procés
+    s'ajusten a la seva part del pressupost; sense, tornen a la mida inicial.
+    """
+    ctx = get_render_context(scale=job.get("scale", 1.0), cheap_effects=job.get("cheap_effects", False))
+    budget = memory_budget(ctx.width, ctx.height, job["tile_bytes"]) if job.get("tile_bytes") else {}
+    ctx.covers.limit(budget.get("covers"))
+    ctx.sprites.limit(budget.get("sprites"))
+    return ctx
 
-    if progress < spin_end:
-        # Fase de gir LENT amb easing suau
-        spin_progress = progress / spin_end
-        # Usar easing que comença LENT
-        eased = ease_slow_start(spin_progress)
-        y_offset = eased * target_offset
 
-    elif progress < settle_end:
-        # Fase d'assentament amb petit bounce
-        settle_progress = (progress - spin_end) / (settle_end - spin_end)
+# ============================================================================
+# GENERACIÓ DE FRAMES - TOT EN UN (sense salts)
+# ============================================================================
 
-        # Bounce suau
-        bounce_amplitude = slot_height * 0.06
-        bounce = math.sin(settle_progress * math.pi * 2) * bounce_amplitude * (1 - settle_progress)
+class TimelineParams:
+    """
+    Paràmetres del moviment de la ruleta: durada de les fases (fracció del
+    vídeo), posició del disc destacat a la seqüència i corbes d'escala,
+    opacitat i glow segons la distància al centre.
+    """
 
-        y_offset = target_offset + bounce
+    def __init__(
+        self,
+        spin_end: float = 0.70,         # 70% del vídeo girant (7 segons)
+        settle_end: float = 0.78,       # Més temps per assentar-se
+        featured_index: int = 14,       # Posició del disc destacat a la seqüència
+        center_lift: int = 180,         # Centre més amunt per deixar espai al text
+        slot_offsets: tuple = (-4, 8),  # Discos a dibuixar respecte del central
+        bounce: float = 0.06,           # Amplitud del bounce (fracció del slot)
+        min_scale: float = 0.35,
+        zoom_bonus: float = 0.12,       # Discos un 12% més grans al centre
+        max_scale: float = 1.12,
+        min_opacity: float = 0.1,
+        vinyl_rpm: float = VINYL_RPM    # 0: el vinil no gira
+    ):
+        self.spin_end = spin_end
+        self.settle_end = settle_end
+        self.featured_index = featured_index
+        self.center_lift = center_lift
+        self.slot_offsets = tuple(slot_offsets)
+        self.bounce = bounce
+        self.min_scale = min_scale
+        self.zoom_bonus = zoom_bonus
+        self.max_scale = max_scale
+        self.min_opacity = min_opacity
+        self.vinyl_rpm = vinyl_rpm
+
+    def as_dict(self) -> dict:
+        """Paràmetres com a diccionari (viatgen amb el job i entren a les claus de cache)."""
+        return dict(vars(self))
+
+    @classmethod
+    def from_dict(cls, values: dict = None) -> "TimelineParams":
+        return cls(**(values or {}))
+
+
+def _ease_slow_start_array(t: np.ndarray) -> np.ndarray:
+    """ease_slow_start() per a un array (mateixes operacions, element a element)."""
+    remaining = (t - 0.8) / 0.2
+    return np.where(t < 0.3, (t / 0.3) ** 2 * 0.15,
+                    np.where(t < 0.8, 0.15 + (t - 0.3) / 0.5 * 0.7,
+                             0.85 + (1 - (1 - remaining) ** 2) * 0.15))
+
+
+def _clip(values: np.ndarray, low: float, high: float) -> np.ndarray:
+    return np.maximum(low, np.minimum(high, values))
+
+
+class RouletteTimeline:
+    """
+    Moviment de la ruleta precalculat per a tots els frames d'un render: fase,
+    desplaçament, i per cada frame × disc la mida, posició, opacitat, ombra,
+    glow i brillantor, com a arrays de NumPy. plan() només llegeix els arrays.
+    `frames` són les posicions a la línia de temps de `total_frames` frames
+    (poden ser fraccionàries en un esborrany amb menys fps).
+    """
 
-    else:
-        # Fase de revelació - el disc està fix al centre
-        y_offset = target_offset
+    def __init__(
+        self,
+        frames,
+        total_frames: int,
+        album_sequence: list,
+        featured_album_id: str,
+        cover_size: int = 500,
+        slot_height: int = 560,
+        size_step: int = COVER_SIZE_STEP,
+        params: TimelineParams = None,
+        album_info: dict = None
+    ):
+        params = params or TimelineParams()
+        self.params = params
+        self.album_sequence = album_sequence
+        self.featured_album_id = featured_album_id
+        # Dades del destacat per al text (el job les porta: els nodes no necessiten el catàleg)
+        self.album_info = album_info if album_info is not None else get_catalog().info(featured_album_id)
+        self.cover_size = cover_size
+        self.slot_height = slot_height
+
+        center_x = VIDEO_WIDTH // 2
+        center_y = VIDEO_HEIGHT // 2 - params.center_lift
+        self.center = (center_x, center_y)
+        spin_end, settle_end = params.spin_end, params.settle_end
+
+        # =====================================================================
+        # PER FRAME: fase i desplaçament de la ruleta
+        # =====================================================================
+
+        progress = np.asarray(frames, dtype=np.float64) / (total_frames - 1)
+        self.progress = progress
+        spin = progress < spin_end
+        settle = ~spin & (progress < settle_end)
+        self.phase = np.where(spin, 0, np.where(settle, 1, 2))
+
+        # El carrusel passa per featured_index discos fins arribar al destacat
+        target_offset = params.featured_index * slot_height
+        eased = _ease_slow_start_array(progress / spin_end)
+        settle_progress = (progress - spin_end) / (settle_end - spin_end)
+        bounce_amplitude = slot_height * params.bounce
+        bounce = np.sin(settle_progress * math.pi * 2) * bounce_amplitude * (1 - settle_progress)
+        y_offset = np.where(spin, eased * target_offset,
+                            np.where(settle, target_offset + bounce, float(target_offset)))
 
-    # =========================================================================
-    # DIBUIXAR ELS DISCOS DE LA RULETA
-    # =========================================================================
+        num_albums = len(album_sequence)
+        current_center_index = np.trunc(y_offset / slot_height).astype(np.int64) % num_albums
+        offset_within_slot = np.mod(y_offset, slot_height)
 
-    # Durant la revelació, els altres discos es fan transparents
-    if progress > settle_end:
+        # Durant la revelació, els altres discos es fan transparents
         reveal_progress = (progress - settle_end) / (1 - settle_end)
-        other_albums_opacity = max(0, 1 - reveal_progress * 2)  # Desapareixen ràpid
-    else:
-        other_albums_opacity = 1.0
+        revealing = progress > settle_end
+        other_albums_opacity = np.where(revealing, np.maximum(0, 1 - reveal_progress * 2), 1.0)
 
-    # Calcular quin índex d'àlbum està al centre ara
-    current_center_index = int(y_offset / slot_height) % num_albums
-    offset_within_slot = y_offset % slot_height
+        # =====================================================================
+        # PER FRAME × DISC
+        # =====================================================================
 
-    # Dibuixar els discos
-    for i in range(-4, 8):
-        # L'índex de l'àlbum per aquesta posició
-        album_idx = (current_center_index + i) % num_albums
-        album_id = album_sequence[album_idx]
+        offsets = np.arange(*params.slot_offsets)
+        album_idx = (current_center_index[:, None] + offsets[None, :]) % num_albums
+        self.album_idx = album_idx
 
-        # Posició Y del disc
-        # Quan i=0, el disc hauria d'estar centrat (menys l'offset dins del slot)
         base_y = center_y - cover_size // 2
-        disc_y = base_y + (i * slot_height) - offset_within_slot
+        disc_y = (base_y + offsets * slot_height)[None, :] - offset_within_slot[:, None]
+        on_screen = ~((disc_y < -slot_height) | (disc_y > VIDEO_HEIGHT))
 
-        # Només dibuixar si és visible
-        if disc_y < -slot_height or disc_y > VIDEO_HEIGHT:
-            continue
+        distance = np.abs(disc_y + cover_size // 2 - center_y)
+        featured = np.array([aid == featured_album_id for aid in album_sequence])[album_idx]
+        is_center = distance < slot_height * 0.4
+
+        # Els discos al centre són MOLT més grans (escala per distància + zoom)
+        max_distance = VIDEO_HEIGHT // 2
+        base_scale = _clip(1.0 - (distance / max_distance) * 0.5, params.min_scale, 1.0)
+        center_zoom = _clip(1.0 - (distance / (slot_height * 0.6)), 0, 1)
+        scale = np.minimum(params.max_scale, base_scale + center_zoom * params.zoom_bonus)
+
+        # Opacitat: més contrast entre centre i extrems; en la revelació només queda el destacat
+        opacity = _clip(1.0 - (distance / max_distance) * 0.7, params.min_opacity, 1.0)
+        opacity = np.where(featured & is_center, opacity, opacity * other_albums_opacity[:, None])
+        self.visible = on_screen & ~(opacity < 0.05)
+
+        # Portada escalada (mida arrodonida al bucket de la cache)
+        size = np.trunc(cover_size * scale).astype(np.int64)
+        if size_step > 1:
+            size = np.maximum(size_step, np.rint(size / size_step).astype(np.int64) * size_step)
+        thickness = np.trunc(4 * scale).astype(np.int64)
+        framed_size = size + thickness * 2
+        self.size = size
+        self.thickness = thickness
+        self.x = center_x - framed_size // 2
+        self.y = np.trunc(disc_y + (cover_size - size) // 2).astype(np.int64)
+        self.alpha = np.where(opacity < 1.0, np.trunc(255 * opacity), -1).astype(np.int64)
+        self.shadow_alpha = np.where((opacity > 0.3) & (scale > 0.6), np.trunc(80 * opacity), -1).astype(np.int64)
+
+        # Il·luminació quan passa pel centre: glow daurat i més brillantor
+        proximity = _clip(1.0 - (distance / (slot_height * 0.8)), 0, 1)
+        self.has_glow = (proximity > 0.3) & (progress < settle_end)[:, None]
+        glow_strength = (proximity - 0.3) / 0.7
+        self.glow_alpha = np.trunc(glow_strength * 120).astype(np.int64)
+        self.glow_size = size + 40
+        self.glow_x = self.x - 20 + (framed_size - self.glow_size) // 2 + 20
+        self.glow_y = self.y - 20 + (framed_size - self.glow_size) // 2 + 20
+        self.brightness = np.where(self.has_glow & (glow_strength > 0.5), 1.0 + (glow_strength - 0.5) * 0.4, 0.0)
+
+        # =====================================================================
+        # INDICADORS, VINIL I TEXT
+        # =====================================================================
+
+        # Brillantor dels indicadors augmenta quan s'atura
+        self.indicator_alpha = np.where(
+            progress > spin_end,
+            np.minimum(255, np.trunc(200 + 55 * ((progress - spin_end) / (1 - spin_end)))),
+            180).astype(np.int64)
 
-        # Distància al centre
-        disc_center_y = disc_y + cover_size // 2
-        distance_to_center = abs(disc_center_y - center_y)
+        # El vinil surt gradualment per la dreta
+        self.vinyl_size = int(cover_size * 1.1)
+        max_vinyl_offset = int(cover_size * 0.35)
+        vinyl_offset = np.trunc(max_vinyl_offset * np.minimum(1.0, reveal_progress * 1.5)).astype(np.int64)
+        self.vinyl_offset = np.where(revealing & (vinyl_offset > 5), vinyl_offset, -1)
+        self.vinyl_glow = np.where(reveal_progress > 0.2, np.trunc((reveal_progress - 0.2) * 100), -1).astype(np.int64)
 
-        # És el disc destacat (Thriller)?
-        is_featured = (album_id == featured_album_id)
-        is_center = distance_to_center < slot_height * 0.4
+        # L'etiqueta gira des de l'inici de la revelació (segons de la línia de temps a FPS)
+        reveal_seconds = np.maximum(0.0, progress - settle_end) * (total_frames - 1) / FPS
+        self.vinyl_angle = vinyl_label_angle(reveal_seconds, params.vinyl_rpm)
+
+        # Text (títol, artista, any i info de la sessió) amb fade per línia
+        text_start = settle_end + 0.05
+        text_progress = (progress - settle_end - 0.05) / (1 - settle_end - 0.05)
+        self.has_text = progress > text_start
+
+        def fade(start: float, speed: float = 3) -> np.ndarray:
+            alpha = np.trunc(np.minimum(255, (text_progress - start) * speed * 255))
+            return np.where(self.has_text & (text_progress > start), alpha, -1).astype(np.int64)
+
+        self.title_alpha = fade(0)
+        self.artist_alpha = fade(0.1)
+        self.year_alpha = fade(0.2)
+        self.info_alpha = fade(0.35, 2.5)
+
+    def __len__(self) -> int:
+        return len(self.progress)
+
+    def slot_plans(self, i: int) -> list:
+        """Discos visibles del frame i (en ordre de dibuix)."""
+        slots = []
+        for k in np.flatnonzero(self.visible[i]):
+            glow = None
+            if self.has_glow[i, k]:
+                glow = {
+                    "alpha": int(self.glow_alpha[i, k]),
+                    "size": int(self.glow_size[i, k]),
+                    "x": int(self.glow_x[i, k]),
+                    "y": int(self.glow_y[i, k]),
+                }
+            slots.append({
+                "album_id": self.album_sequence[self.album_idx[i, k]],
+                "size": int(self.size[i, k]),
+                "thickness": int(self.thickness[i, k]),
+                "x": int(self.x[i, k]),
+                "y": int(self.y[i, k]),
+                "alpha": int(self.alpha[i, k]) if self.alpha[i, k] >= 0 else None,
+                "shadow_alpha": int(self.shadow_alpha[i, k]) if self.shadow_alpha[i, k] >= 0 else None,
+                "glow": glow,
+                "brightness": float(self.brightness[i, k]) if self.brightness[i, k] else None,
+            })
+        return slots
+
+    def plan(self, i: int, session_info: dict) -> dict:
+        """Pla del frame i (veure plan_frame()), llegit dels arrays."""
+        center_x, center_y = self.center
+        cover_size = self.cover_size
+        plan = {
+            "phase": ("spin", "settle", "reveal")[self.phase[i]],
+            "center": (center_x, center_y),
+            "cover_size": cover_size,
+            "slots": self.slot_plans(i),
+            "indicator_alpha": int(self.indicator_alpha[i]),
+            "vinyl": None,
+            "text": None,
+        }
+
+        if self.vinyl_offset[i] >= 0:
+            vinyl_size = self.vinyl_size
+            plan["vinyl"] = {
+                "size": vinyl_size,
+                "x": center_x - vinyl_size // 2 + int(self.vinyl_offset[i]),
+                "y": center_y - vinyl_size // 2,
+                # Glow darrere
+                "glow_intensity": int(self.vinyl_glow[i]) if self.vinyl_glow[i] >= 0 else None,
+                "album_id": self.featured_album_id,
+                "angle": float(self.vinyl_angle[i]),
+            }
+
+        if self.has_text[i]:
+            album_info = self.album_info
+            text_y_base = center_y + cover_size // 2 + 80
+            # Operacions de dibuix en ordre: línies de text i la línia separadora
+            text = []
+
+            # Títol (apareix primer) - 58 * 1.5 = 87
+            if self.title_alpha[i] >= 0:
+                title = album_info.get("title", "")
+                if len(title) > 20:
+                    title = title[:18] + "..."
+                text.append({
+                    "kind": "text", "text": title, "font_size": 87, "bold": True, "color": "white",
+                    "alpha": int(self.title_alpha[i]), "xy": (center_x, text_y_base),
+                })
+
+            # Artista - 42 * 1.5 = 63
+            if self.artist_alpha[i] >= 0:
+                text.append({
+                    "kind": "text", "text": album_info.get("artist", ""), "font_size": 63, "bold": False,
+                    "color": "gold", "alpha": int(self.artist_alpha[i]), "xy": (center_x, text_y_base + 95),
+                })
+
+            # Any - 32 * 1.5 = 48
+            if self.year_alpha[i] >= 0:
+                text.append({
+                    "kind": "text", "text": str(album_info.get("year", "")), "font_size": 48, "bold": False,
+                    "color": "light_gray", "alpha": int(self.year_alpha[i]), "xy": (center_x, text_y_base + 170),
+                })
+
+            # Línia i info sessió - 34 * 1.5 = 51
+            if self.info_alpha[i] >= 0:
+                info_alpha = int(self.info_alpha[i])
+                info_y = text_y_base + 260
+
+                text.append({
+                    "kind": "line", "color": "accent", "alpha": info_alpha, "width": 3,
+                    "points": [(center_x - 200, info_y - 15), (center_x + 200, info_y - 15)],
+                })
+                text.append({
+                    "kind": "text", "text": session_info.get('date', ''), "font_size": 51, "bold": False,
+                    "color": "white", "alpha": info_alpha, "xy": (center_x, info_y + 45),
+                })
+                text.append({
+                    "kind": "text", "text": session_info.get('time', ''), "font_size": 51, "bold": False,
+                    "color": "white", "alpha": info_alpha, "xy": (center_x, info_y + 110),
+                })
+
+            plan["text"] = text
+
+        return plan
+
+    def frame_costs(self) -> np.ndarray:
+        """
+        Cost relatiu de cada frame (píxels de portades, glows i vinil a compondre),
+        per repartir la feina entre workers abans de començar.
+        """
+        framed = np.where(self.visible, (self.size + 2 * self.thickness) ** 2, 0)
+        glows = np.where(self.visible & self.has_glow, self.glow_size ** 2, 0)
+        vinyl = np.where(self.vinyl_offset >= 0, self.vinyl_size ** 2 + self.cover_size ** 2, 0)
+        return framed.sum(axis=1) + glows.sum(axis=1) + vinyl
+
+
+def plan_frame(
+    frame_num: int,
+    total_frames: int,
+    album_sequence: list,
+    featured_album_id: str,
+    session_info: dict,
+    cover_size: int = 500,
+    slot_height: int = 560,
+    covers: CoverCache = None,
+    params: TimelineParams = None
+) -> dict:
+    """
+    Calcula tot el que es dibuixa en un frame (discos, ombres, glows, vinil i
+    text) sense dibuixar res. El resultat és serialitzable i determina el frame.
+    Per renderitzar molts frames és més ràpid un RouletteTimeline de tot el vídeo.
+    """
+    if covers is None:
+        covers = get_cover_cache()
+    timeline = RouletteTimeline([frame_num], total_frames, album_sequence, featured_album_id,
+                                cover_size, slot_height, covers.size_step, params)
+    return timeline.plan(0, session_info)
 
-        # ESCALA AMPLIADA: els discos al centre són MOLT més grans
-        # Escala base per distància
-        max_distance = VIDEO_HEIGHT // 2
-        base_scale = 1.0 - (distance_to_center / max_distance) * 0.5
-        base_scale = max(0.35, min(1.0, base_scale))
 
-        # BONUS d'escala quan està al centre (efecte ZOOM)
-        center_zoom = 1.0 - (distance_to_center / (slot_height * 0.6))
-        center_zoom = max(0, min(1, center_zoom))
-        zoom_bonus = center_zoom * 0.12  # 12% més gran al centre (discos ja són grans)
+def scale_plan(plan: dict, scale: float, covers: CoverCache = None) -> dict:
+    """
+    Pla de plan_frame() (a 1080x1920) portat a l'escala d'un esborrany: mides,
+    posicions i gruixos s'escalen mantenint el centre de cada element, i les
+    portades es tornen a arrodonir al bucket de la cache.
+    """
+    if covers is None:
+        covers = get_cover_cache()
+
+    def px(value: float) -> int:
+        return layout_px(value, scale)
+
+    def centered(pos: float, old_side: int, new_side: int) -> int:
+        return int(round((pos + old_side / 2) * scale)) - new_side // 2
+
+    slots = []
+    for slot in plan["slots"]:
+        size = covers.bucket(px(slot["size"]))
+        thickness = int(slot["thickness"] * scale)
+        old_side = slot["size"] + 2 * slot["thickness"]
+        new_side = size + 2 * thickness
+        scaled = {
+            **slot,
+            "size": size,
+            "thickness": thickness,
+            "x": centered(slot["x"], old_side, new_side),
+            "y": centered(slot["y"], old_side, new_side),
+        }
+        if slot["glow"] is not None:
+            glow = slot["glow"]
+            glow_size = px(glow["size"])
+            scaled["glow"] = {
+                **glow,
+                "size": glow_size,
+                "x": centered(glow["x"], glow["size"], glow_size),
+                "y": centered(glow["y"], glow["size"], glow_size),
+            }
+        slots.append(scaled)
+
+    vinyl = plan["vinyl"]
+    if vinyl is not None:
+        size = px(vinyl["size"])
+        vinyl = {
+            **vinyl,
+            "size": size,
+            "x": centered(vinyl["x"], vinyl["size"], size),
+            "y": centered(vinyl["y"], vinyl["size"], size),
+        }
+
+    text = plan["text"]
+    if text is not None:
+        text = [
+            {**op, "points": [(px(x), px(y)) for x, y in op["points"]], "width": px(op["width"])}
+            if op["kind"] == "line" else
+            {**op, "font_size": px(op["font_size"]), "xy": (px(op["xy"][0]), px(op["xy"][1]))}
+            for op in text
+        ]
+
+    return {
+        **plan,
+        "scale": scale,
+        "center": (px(plan["center"][0]), px(plan["center"][1])),
+        "cover_size": px(plan["cover_size"]),
+        "slots": slots,
+        "vinyl": vinyl,
+        "text": text,
+    }
 
-        scale = base_scale + zoom_bonus
-        scale = min(1.12, scale)  # Màxim 112% de la mida original
 
-        # Opacitat: més contrast entre centre i extrems
-        base_opacity = 1.0 - (distance_to_center / max_distance) * 0.7
-        base_opacity = max(0.1, min(1.0, base_opacity))
+def quality_plan(plan: dict, quality: int) -> dict:
+    """
+    Pla d'un frame a un nivell de qualitat reduït (índex a QUALITY_LEVELS): el
+    nivell forma part del pla (els píxels canvien) i, sense ombres, els discos
+    no en porten.
+    """
+    level = QUALITY_LEVELS[quality]
+    slots = plan["slots"] if level["shadows"] else [{**slot, "shadow_alpha": None} for slot in plan["slots"]]
+    return {**plan, "slots": slots, "quality": quality}
 
-        # Durant revelació, només el disc destacat (Thriller) es manté visible
-        if not (is_featured and is_center):
-            base_opacity *= other_albums_opacity
 
-        if base_opacity < 0.05:
-            continue
+def plan_scale(plan: dict) -> float:
+    """Escala d'un pla (1.0 si no és d'un esborrany)."""
+    return plan.get("scale", 1.0)
 
-        # Carregar i escalar portada
-        current_size = int(cover_size * scale)
-        cover = load_cover(album_id, current_size)
-        cover = add_cover_frame(cover, int(4 * scale))
-
-        disc_x = center_x - cover.width // 2
-        actual_y = int(disc_y + (cover_size - current_size) // 2)
-
-        # Convertir a RGBA i aplicar opacitat
-        cover_rgba = cover.convert('RGBA')
-        if base_opacity < 1.0:
-            alpha_channel = Image.new('L', cover_rgba.size, int(255 * base_opacity))
-            cover_rgba.putalpha(alpha_channel)
-
-        # Ombra (només per discos visibles)
-        if base_opacity > 0.3 and scale > 0.6:
-            shadow = Image.new('RGBA', cover_rgba.size, (0, 0, 0, int(80 * base_opacity)))
-            shadow = shadow.filter(ImageFilter.GaussianBlur(15))
-            img.paste(shadow, (disc_x + 8, actual_y + 8), shadow)
-
-        # EFECTE IL·LUMINACIÓ quan passa pel centre
-        # Com més a prop del centre, més brillant
-        center_proximity = 1.0 - (distance_to_center / (slot_height * 0.8))
-        center_proximity = max(0, min(1, center_proximity))
-
-        if center_proximity > 0.3 and progress < settle_end:
-            # Glow daurat/blanc quan passa pel centre
-            glow_strength = (center_proximity - 0.3) / 0.7  # 0 a 1
-            glow_alpha = int(glow_strength * 120)
-
-            # Crear glow al voltant del disc
-            glow_size = current_size + 40
-            glow = Image.new('RGBA', (glow_size, glow_size), (0, 0, 0, 0))
-            glow_draw = ImageDraw.Draw(glow)
-
-            # Glow daurat
-            for r in range(glow_size // 2, 0, -3):
-                a = int(glow_alpha * (r / (glow_size // 2)) * 0.6)
-                glow_draw.ellipse(
-                    [glow_size//2 - r, glow_size//2 - r, glow_size//2 + r, glow_size//2 + r],
-                    fill=COLORS["gold"][:3] + (a,)
-                )
-
-            glow = glow.filter(ImageFilter.GaussianBlur(15))
-            glow_x = disc_x - 20 + (cover_rgba.width - glow_size) // 2 + 20
-            glow_y = actual_y - 20 + (cover_rgba.height - glow_size) // 2 + 20
-            img.paste(glow, (glow_x, glow_y), glow)
-
-            # Augmentar brillantor del disc quan és al centre
-            if glow_strength > 0.5:
-                enhancer = ImageEnhance.Brightness(cover_rgba.convert('RGB'))
-                bright_factor = 1.0 + (glow_strength - 0.5) * 0.4
-                cover_bright = enhancer.enhance(bright_factor).convert('RGBA')
-                cover_bright.putalpha(cover_rgba.split()[3])
-                cover_rgba = cover_bright
-
-        img.paste(cover_rgba, (disc_x, actual_y), cover_rgba)
 
-    # =========================================================================
-    # INDICADORS LATERALS (sempre visibles)
-    # =========================================================================
+def _overlaps(box: tuple, region: tuple) -> bool:
+    return box[0] < region[2] and box[2] > region[0] and box[1] < region[3] and box[3] > region[1]
 
-    draw = ImageDraw.Draw(img)
-    indicator_y = center_y
-    ind_width = 70
 
-    # Brillantor dels indicadors augmenta quan s'atura
-    if progress > spin_end:
-        ind_alpha = min(255, int(200 + 55 * ((progress - spin_end) / (1 - spin_end))))
+def _clip_box(box: tuple, size: tuple) -> Optional[tuple]:
+    """Rectangle retallat a una imatge de mida `size` (None si en queda fora)."""
+    x0, y0 = max(box[0], 0), max(box[1], 0)
+    x1, y1 = min(box[2], size[0]), min(box[3], size[1])
+    return (x0, y0, x1, y1) if x0 < x1 and y0 < y1 else None
+
+
+def _visible_part(sprite: Image.Image, x: int, y: int, size: tuple) -> Optional[tuple]:
+    """
+    Part d'un sprite situat a (x, y) que cau dins d'una imatge de mida `size`:
+    (retall, x, y), o None. Els efectes s'apliquen només al retall.
+    """
+    box = _clip_box((x, y, x + sprite.width, y + sprite.height), size)
+    if box is None:
+        return None
+    if box == (x, y, x + sprite.width, y + sprite.height):
+        return sprite, x, y
+    return sprite.crop((box[0] - x, box[1] - y, box[2] - x, box[3] - y)), box[0], box[1]
+
+
+def slot_boxes(slot: dict, sprites: "SpriteCache") -> list:
+    """Rectangles (x0, y0, x1, y1) que pinta un disc: portada, ombra i glow."""
+    x, y = slot["x"], slot["y"]
+    side = slot["size"] + 2 * slot["thickness"]
+    boxes = [(x, y, x + side, y + side)]
+    if slot["shadow_alpha"] is not None:
+        offset = layout_px(8, sprites.scale)
+        boxes.append((x + offset, y + offset, x + offset + side, y + offset + side))
+    glow_plan = slot["glow"]
+    if glow_plan is not None:
+        bucket = sprites.glow_bucket(glow_plan["size"])
+        shift = (glow_plan["size"] - bucket) // 2
+        gx, gy = glow_plan["x"] + shift, glow_plan["y"] + shift
+        boxes.append((gx, gy, gx + bucket, gy + bucket))
+    return boxes
+
+
+def indicator_lines(plan: dict) -> tuple:
+    """Els quatre indicadors laterals: ([[(x0, y), (x1, y)], ...], gruix)."""
+    scale = plan_scale(plan)
+    margin, length = layout_px(40, scale), layout_px(70, scale)
+    right = frame_size(scale)[0] - margin
+    center_y = plan["center"][1]
+    half = plan["cover_size"] // 2 + layout_px(10, scale)
+    lines = []
+    for y in (center_y - half, center_y + half):
+        lines.append([(margin, y), (margin + length, y)])
+        lines.append([(right - length, y), (right, y)])
+    return lines, layout_px(3, scale)
+
+
+def indicator_boxes(plan: dict) -> list:
+    """Rectangles dels quatre indicadors laterals (amb marge pel gruix de la línia)."""
+    lines, width = indicator_lines(plan)
+    return [(x0 - width, y - width, x1 + width + 1, y + width + 1) for (x0, y), (x1, _) in lines]
+
+
+def center_cover_side(plan: dict) -> int:
+    """Costat de la portada central redibuixada sobre el vinil (amb el marc)."""
+    return plan["cover_size"] + 2 * layout_px(4, plan_scale(plan))
+
+
+def reveal_glow_hidden(plan: dict) -> bool:
+    """
+    El glow de revelació queda sencer darrere de la portada central (opaca i
+    dibuixada després) quan la portada és més gran que el sprite: no cal dibuixar-lo.
+    """
+    half = reveal_glow_half(plan_scale(plan))
+    side = center_cover_side(plan)
+    return half <= side // 2 and half <= side - side // 2
+
+
+def vinyl_boxes(plan: dict, sprites: "SpriteCache") -> list:
+    """Rectangles del vinil, del glow de revelació i de la portada central redibuixada."""
+    vinyl_plan = plan["vinyl"]
+    center_x, center_y = plan["center"]
+    x, y, size = vinyl_plan["x"], vinyl_plan["y"], vinyl_plan["size"]
+    side = center_cover_side(plan)
+    boxes = [
+        (x, y, x + size, y + size),
+        (center_x - side // 2, center_y - side // 2, center_x - side // 2 + side, center_y - side // 2 + side),
+    ]
+    if vinyl_plan["glow_intensity"] is not None and not reveal_glow_hidden(plan):
+        half = reveal_glow_half(plan_scale(plan))
+        boxes.append((center_x - half, center_y - half, center_x + half, center_y + half))
+    return boxes
+
+
+def vinyl_label_box(vinyl_plan: dict) -> tuple:
+    """Rectangle de l'etiqueta central del vinil (la part que gira)."""
+    size = vinyl_plan["size"]
+    label_r = vinyl_label_radius(size)
+    center_x = vinyl_plan["x"] + size // 2
+    center_y = vinyl_plan["y"] + size // 2
+    return (center_x - label_r, center_y - label_r, center_x + label_r + 1, center_y + label_r + 1)
+
+
+def text_box(op: dict, sprites: "SpriteCache") -> tuple:
+    """Rectangle d'una operació de text (línia de text o línia separadora)."""
+    if op["kind"] == "line":
+        mask, x, y = sprites.line(op["points"], op["width"])
     else:
-        ind_alpha = 180
+        mask, dx, dy = sprites.text(op["text"], op["font_size"], op["bold"])
+        x, y = op["xy"][0] + dx, op["xy"][1] + dy
+    return (x, y, x + mask.width, y + mask.height)
+
+
+def draw_frame(plan: dict, ctx: RenderContext = None, region: tuple = None) -> Image.Image:
+    """
+    Dibuixa un frame a partir del pla calculat per plan_frame(). Amb `region`
+    (x0, y0, x1, y1) només es dibuixa aquest rectangle del frame (mateixos
+    píxels que el retall del frame sencer) i es retorna el retall.
+    """
+    if ctx is None:
+        ctx = get_render_context()
+    covers = ctx.covers
+    sprites = ctx.sprites
+    shadow_offset = layout_px(8, ctx.scale)
 
-    ind_color = COLORS["gold"][:3] + (ind_alpha,)
+    with span("background"):
+        img = ctx.background(region)
+    ox, oy = region[:2] if region is not None else (0, 0)
 
-    # Esquerra
-    draw.line([(40, indicator_y - cover_size//2 - 10), (40 + ind_width, indicator_y - cover_size//2 - 10)],
-              fill=ind_color, width=3)
-    draw.line([(40, indicator_y + cover_size//2 + 10), (40 + ind_width, indicator_y + cover_size//2 + 10)],
-              fill=ind_color, width=3)
+    def visible(boxes: list) -> bool:
+        return region is None or any(_overlaps(box, region) for box in boxes)
 
-    # Dreta
-    draw.line([(VIDEO_WIDTH - 40 - ind_width, indicator_y - cover_size//2 - 10),
-               (VIDEO_WIDTH - 40, indicator_y - cover_size//2 - 10)], fill=ind_color, width=3)
-    draw.line([(VIDEO_WIDTH - 40 - ind_width, indicator_y + cover_size//2 + 10),
-               (VIDEO_WIDTH - 40, indicator_y + cover_size//2 + 10)], fill=ind_color, width=3)
+    center_x, center_y = plan["center"]
+    cover_size = plan["cover_size"]
 
     # =========================================================================
-    # VINIL (apareix durant la revelació)
+    # DIBUIXAR ELS DISCOS DE LA RULETA
     # =========================================================================
 
-    if progress > settle_end:
-        reveal_progress = (progress - settle_end) / (1 - settle_end)
+    for slot in plan["slots"]:
+        if region is not None and not visible(slot_boxes(slot, sprites)):
+            continue
+        disc_x, actual_y = slot["x"] - ox, slot["y"] - oy
+
+        with span("slot", album_id=slot["album_id"], size=slot["size"]):
+            with span("covers"):
+                with span("cover.load"):
+                    cover_rgba = covers.get(slot["album_id"], slot["size"], slot["thickness"], ctx.resample)
+                side = cover_rgba.width
+                # Només la part dins la imatge (o el retall): opacitat i brillantor són per píxel
+                visible_cover = _visible_part(cover_rgba, disc_x, actual_y, img.size)
+
+                # Aplicar opacitat (sobre una còpia, la variant és compartida)
+                if slot["alpha"] is not None and visible_cover is not None:
+                    with span("cover.opacity"):
+                        part, px, py = visible_cover
+                        part = part.copy()
+                        part.putalpha(Image.new('L', part.size, slot["alpha"]))
+                        visible_cover = part, px, py
+
+                # Ombra: un GaussianBlur d'un rectangle uniforme és el mateix rectangle,
+                # així que n'hi ha prou amb enfosquir la caixa desplaçada
+                if slot["shadow_alpha"] is not None:
+                    sx, sy = disc_x + shadow_offset, actual_y + shadow_offset
+                    box = _clip_box((sx, sy, sx + side, sy + side), img.size)
+                    if box is not None:
+                        with span("cover.shadow"):
+                            shadow_alpha = slot["shadow_alpha"]
+                            mask = Image.new('L', (box[2] - box[0], box[3] - box[1]), shadow_alpha)
+                            img.paste((0, 0, 0, shadow_alpha), box, mask)
+
+            # Glow daurat quan passa pel centre (sprite escalat per alpha)
+            glow_plan = slot["glow"]
+            if glow_plan is not None:
+                glow = sprites.slot_glow(glow_plan["size"])
+                shift = (glow_plan["size"] - glow.width) // 2
+                visible_glow = _visible_part(glow, glow_plan["x"] + shift - ox, glow_plan["y"] + shift - oy, img.size)
+                if visible_glow is not None:
+                    with span("glow"):
+                        part, gx, gy = visible_glow
+                        img.paste(part, (gx, gy), sprites.scaled_alpha(part, glow_plan["alpha"] / SLOT_GLOW_UNIT))
+
+            if visible_cover is not None:
+                with span("covers"):
+                    part, px, py = visible_cover
+                    # Augmentar brillantor del disc quan és al centre
+                    if slot["brightness"] is not None:
+                        with span("cover.brightness"):
+                            enhancer = ImageEnhance.Brightness(part.convert('RGB'))
+                            part_bright = enhancer.enhance(slot["brightness"]).convert('RGBA')
+                            part_bright.putalpha(part.split()[3])
+                            part = part_bright
+
+                    with span("cover.paste"):
+                        img.paste(part, (px, py), part)
 
-        # El vinil surt gradualment per la dreta
-        vinyl_reveal = min(1.0, reveal_progress * 1.5)
-        vinyl_size = int(cover_size * 1.1)
-        max_vinyl_offset = int(cover_size * 0.35)
-        vinyl_offset = int(max_vinyl_offset * vinyl_reveal)
-
-        if vinyl_offset > 5:
-            vinyl = create_vinyl_disc(vinyl_size)
-
-            # Glow darrere
-            if reveal_progress > 0.2:
-                glow_intensity = int((reveal_progress - 0.2) * 100)
-                glow = Image.new('RGBA', img.size, (0, 0, 0, 0))
-                gdraw = ImageDraw.Draw(glow)
-                for r in range(200, 0, -4):
-                    alpha = int(glow_intensity * (1 - r/200) * 0.6)
-                    gdraw.ellipse([center_x - r, center_y - r, center_x + r, center_y + r],
-                                 fill=COLORS["accent"][:3] + (alpha,))
-                glow = glow.filter(ImageFilter.GaussianBlur(35))
-                img = Image.alpha_composite(img, glow)
-
-            vinyl_x = center_x - vinyl_size // 2 + vinyl_offset
-            vinyl_y = center_y - vinyl_size // 2
-            img.paste(vinyl, (vinyl_x, vinyl_y), vinyl)
+    # =========================================================================
+    # INDICADORS LATERALS (sempre visibles)
+    # =========================================================================
 
-            # Tornar a dibuixar la portada central per sobre del vinil
-            center_cover = load_cover(featured_album_id, cover_size)
-            center_cover = add_cover_frame(center_cover, 4)
-            cover_x = center_x - center_cover.width // 2
-            cover_y = center_y - center_cover.height // 2
-            img.paste(center_cover.convert('RGBA'), (cover_x, cover_y), center_cover.convert('RGBA'))
+    if visible(indicator_boxes(plan)):
+        with span("indicators"):
+            draw = ImageDraw.Draw(img)
+            ind_color = COLORS["gold"][:3] + (plan["indicator_alpha"],)
+            lines, width = indicator_lines(plan)
+            for line in lines:
+                draw.line([(x - ox, y - oy) for x, y in line], fill=ind_color, width=width)
 
     # =========================================================================
-    # TEXT (apareix durant la revelació) - 50% més gran
+    # VINIL (apareix durant la revelació)
     # =========================================================================
 
-    if progress > settle_end + 0.05:
-        text_progress = (progress - settle_end - 0.05) / (1 - settle_end - 0.05)
+    vinyl_plan = plan["vinyl"]
+    if vinyl_plan is not None and visible(vinyl_boxes(plan, sprites)):
+        # Glow darrere (si no queda tapat per la portada central)
+        glow_intensity = vinyl_plan["glow_intensity"]
+        if glow_intensity is not None and not reveal_glow_hidden(plan):
+            sprite = sprites.reveal_glow()
+            # alpha_composite no accepta destinacions negatives: es compon només la part visible
+            visible_glow = _visible_part(sprite, center_x - sprite.width // 2 - ox,
+                                         center_y - sprite.height // 2 - oy, img.size)
+            if visible_glow is not None:
+                with span("glow"):
+                    part, gx, gy = visible_glow
+                    glow = part.copy()
+                    glow.putalpha(sprites.scaled_alpha(part, glow_intensity / REVEAL_GLOW_UNIT))
+                    img.alpha_composite(glow, (gx, gy))
+
+        with span("vinyl"):
+            vinyl = ctx.vinyl(vinyl_plan["size"])
+            img.paste(vinyl, (vinyl_plan["x"] - ox, vinyl_plan["y"] - oy), vinyl)
+
+            # Etiqueta girada (de la cache d'angles) sobre el cos, que no canvia en girar
+            label = ctx.vinyl_label(vinyl_plan["size"], vinyl_plan["album_id"], vinyl_plan["angle"])
+            label_x, label_y = vinyl_label_box(vinyl_plan)[:2]
+            img.paste(label, (label_x - ox, label_y - oy), label)
+
+            # Tornar a dibuixar la portada central per sobre del vinil
+            with span("cover.load"):
+                center_cover = covers.get(vinyl_plan["album_id"], cover_size, layout_px(4, ctx.scale),
+                                          ctx.resample)
+            cover_x = center_x - center_cover.width // 2 - ox
+            cover_y = center_y - center_cover.height // 2 - oy
+            img.paste(center_cover, (cover_x, cover_y), center_cover)
+
+    # =========================================================================
+    # TEXT (apareix durant la revelació)
+    # =========================================================================
 
-        album_info = ALBUMS_DATA.get(featured_album_id, {})
-        text_y_base = center_y + cover_size // 2 + 80
-
-        draw = ImageDraw.Draw(img)
-
-        # Títol (apareix primer) - 58 * 1.5 = 87
-        if text_progress > 0:
-            title_alpha = int(min(255, text_progress * 3 * 255))
-            font_title = get_font(87, bold=True)
-            title = album_info.get("title", "")
-            if len(title) > 20:
-                title = title[:18] + "..."
-            draw.text((center_x, text_y_base), title,
-                     fill=COLORS["white"][:3] + (title_alpha,), anchor="mm", font=font_title)
-
-        # Artista - 42 * 1.5 = 63
-        if text_progress > 0.1:
-            artist_alpha = int(min(255, (text_progress - 0.1) * 3 * 255))
-            font_artist = get_font(63)
-            draw.text((center_x, text_y_base + 95), album_info.get("artist", ""),
-                     fill=COLORS["gold"][:3] + (artist_alpha,), anchor="mm", font=font_artist)
-
-        # Any - 32 * 1.5 = 48
-        if text_progress > 0.2:
-            year_alpha = int(min(255, (text_progress - 0.2) * 3 * 255))
-            font_year = get_font(48)
-            draw.text((center_x, text_y_base + 170), str(album_info.get("year", "")),
-                     fill=COLORS["light_gray"][:3] + (year_alpha,), anchor="mm", font=font_year)
-
-        # Línia i info sessió - 34 * 1.5 = 51
-        if text_progress > 0.35:
-            info_alpha = int(min(255, (text_progress - 0.35) * 2.5 * 255))
-            font_info = get_font(51)
-            info_y = text_y_base + 260
-
-            draw.line([(center_x - 200, info_y - 15), (center_x + 200, info_y - 15)],
-                     fill=COLORS["accent"][:3] + (info_alpha,), width=3)
-
-            draw.text((center_x, info_y + 45),
-                     session_info.get('date', ''),
-                     fill=COLORS["white"][:3] + (info_alpha,), anchor="mm", font=font_info)
-
-            draw.text((center_x, info_y + 110),
-                     session_info.get('time', ''),
-                     fill=COLORS["white"][:3] + (info_alpha,), anchor="mm", font=font_info)
+    # Cada línia es rasteritza una vegada; per frame només s'escala la màscara per l'alpha
+    if plan["text"] is not None:
+        with span("text"):
+            for op in plan["text"]:
+                if op["kind"] == "line":
+                    mask, x, y = sprites.line(op["points"], op["width"])
+                else:
+                    with span("text.raster"):
+                        mask, dx, dy = sprites.text(op["text"], op["font_size"], op["bold"])
+                    x, y = op["xy"][0] + dx, op["xy"][1] + dy
+                if region is not None and not _overlaps((x, y, x + mask.width, y + mask.height), region):
+                    continue
+                with span("text.draw"):
+                    img.paste(COLORS[op["color"]][:3] + (255,),
+                              (x - ox, y - oy, x - ox + mask.width, y - oy + mask.height),
+                              sprites.scaled_mask(mask, op["alpha"] / 255))
 
     return img.convert('RGB')
 
 
+def create_unified_frame(
+    frame_num: int,
+    total_frames: int,
+    album_sequence: list,
+    featured_album_id: str,
+    session_info: dict,
+    cover_size: int = 500,
+    slot_height: int = 560,
+    ctx: RenderContext = None
+) -> Image.Image:
+    """
+    Crea un frame unificat - la ruleta i la revelació són el mateix procés.
+    Quan la ruleta s'atura, el disc guanyador queda al centre i apareix la info.
+    """
+    if ctx is None:
+        ctx = get_render_context()
+
+    plan = plan_frame(frame_num, total_frames, album_sequence, featured_album_id,
+                      session_info, cover_size, slot_height, covers=ctx.covers)
+    return draw_frame(plan, ctx)
+
+
 # ============================================================================
-# GENERACIÓ DEL VÍDEO
+# COMPOSICIÓ AMB NUMPY (backend alternatiu)
 # ============================================================================
 
-def generate_all_frames(
-    featured_album_id: str,
-    session_info: dict,
-    duration: float = 10.0
-) -> Path:
-    """Genera tots els frames del vídeo."""
-    print(f"🎬 Generant frames per a: {ALBUMS_DATA.get(featured_album_id, {}).get('title', 'Unknown')}")
+COMPOSITORS = ("pil", "numpy")
 
-    FRAMES_DIR.mkdir(parents=True, exist_ok=True)
 
-    for f in FRAMES_DIR.glob("*.png"):
-        f.unlink()
+def _np_blend(dst: np.ndarray, src: np.ndarray, x: int, y: int,
+              alpha: np.ndarray = None, opacity: float = 1.0):
+    """
+    Barreja `src` sobre `dst` a (x, y), in situ i retallat als límits:
+    dst += (src - dst) * alpha * opacity. Sense alpha, opacitat uniforme.
+    """
+    h, w = src.shape[:2]
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + w, dst.shape[1]), min(y + h, dst.shape[0])
+    if x0 >= x1 or y0 >= y1:
+        return
 
-    total_frames = int(duration * FPS)
+    region = dst[y0:y1, x0:x1]
+    src = src[y0 - y:y1 - y, x0 - x:x1 - x]
+    if alpha is None:
+        if opacity >= 1.0:
+            region[...] = src
+            return
+        a = opacity
+    else:
+        a = alpha[y0 - y:y1 - y, x0 - x:x1 - x, None]
+        if opacity < 1.0:
+            a = a * opacity
+    region += (src - region) * a
 
-    # Carregar el logotip una sola vegada (el triple de gran: 660px)
-    logo = load_logo(max_width=660, crop_slogan=True)
-    print(f"   Logotip carregat: {logo.size}")
 
-    # Preparar seqüència d'àlbums
-    available_albums = [aid for aid in ALBUMS_DATA.keys() if (COVERS_DIR / f"{aid}.jpg").exists()]
+def _np_darken(dst: np.ndarray, x: int, y: int, w: int, h: int, alpha: float):
+    """Enfosqueix un rectangle (negre amb alpha uniforme), retallat als límits."""
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + w, dst.shape[1]), min(y + h, dst.shape[0])
+    if x0 < x1 and y0 < y1:
+        dst[y0:y1, x0:x1] *= 1.0 - alpha
 
-    if featured_album_id in available_albums:
-        available_albums.remove(featured_album_id)
-    random.seed(42)  # Reproducibilitat
-    random.shuffle(available_albums)
 
-    # La seqüència comença amb alguns àlbums i ACABA amb Thriller
-    # Thriller serà el disc número 15 (índex 14 si comencem de 0)
-    album_sequence = available_albums[:14] + [featured_album_id] + available_albums[14:]
+def _np_rgba(img: Image.Image) -> tuple:
+    """(rgb float32, alpha 0..1 float32) d'una imatge RGBA."""
+    arr = np.asarray(img, dtype=np.float32)
+    return arr[..., :3], arr[..., 3] / 255.0
 
-    print(f"   Portades disponibles: {len(album_sequence)}")
-    print(f"   Total frames: {total_frames}")
 
-    cover_size = 850      # Quasi tot l'ample (1080px - marges)
-    slot_height = cover_size + 60  # Espai entre discos
+def _np_mask(size: tuple, draw_fn) -> np.ndarray:
+    """Rasteritza amb ImageDraw sobre una màscara 'L' i la retorna com a array."""
+    mask = Image.new('L', size, 0)
+    draw_fn(ImageDraw.Draw(mask))
+    return np.asarray(mask)
 
-    for i in range(total_frames):
-        frame = create_unified_frame(
-            frame_num=i,
-            total_frames=total_frames,
-            album_sequence=album_sequence,
-            featured_album_id=featured_album_id,
-            session_info=session_info,
-            cover_size=cover_size,
-            slot_height=slot_height
-        )
 
-        # Afegir logotip amb degradat fosc a la part superior
-        frame = add_top_gradient_and_logo(frame, logo)
+def _np_line(dst: np.ndarray, points: list, color: tuple, width: int = 3):
+    """
+    Línia com la d'ImageDraw sobre RGBA: els píxels se substitueixen pel color
+    (l'alpha de la línia només afecta el canal alpha, que es descarta).
+    """
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    x0, y0 = min(xs) - width, min(ys) - width
+    size = (max(xs) - x0 + width + 1, max(ys) - y0 + width + 1)
+    local = [(px - x0, py - y0) for px, py in points]
+    mask = _np_mask(size, lambda d: d.line(local, fill=255, width=width)) > 0
+
+    h, w = mask.shape
+    cx0, cy0 = max(x0, 0), max(y0, 0)
+    cx1, cy1 = min(x0 + w, dst.shape[1]), min(y0 + h, dst.shape[0])
+    if cx0 < cx1 and cy0 < cy1:
+        dst[cy0:cy1, cx0:cx1][mask[cy0 - y0:cy1 - y0, cx0 - x0:cx1 - x0]] = color
+
+
+def _np_layers(ctx: RenderContext) -> dict:
+    """Arrays de les capes estàtiques del context (es construeixen una vegada)."""
+    layers = ctx.arrays
+    if "background" not in layers:
+        layers["background"] = np.asarray(ctx.background().convert('RGB'), dtype=np.float32)
+        layers["frame"] = np.empty_like(layers["background"])
+        layers["logo"] = _np_rgba(ctx.logo)
+    return layers
+
+
+def draw_frame_numpy(plan: dict, ctx: RenderContext = None, top_band: bool = True,
+                     region: tuple = None) -> Image.Image:
+    """
+    Mateix frame que draw_frame(), compost sobre un buffer float32 preassignat
+    amb operacions in situ (opacitat, brillantor i barreja alpha) en lloc de
+    cadenes de paste/convert de PIL. Retorna el frame RGB (amb la franja superior).
+    Amb `region` (x0, y0, x1, y1) només compon aquest rectangle sobre una vista
+    del buffer: les operacions són per píxel, i el retall és idèntic al del
+    frame sencer.
+    """
+    if ctx is None:
+        ctx = get_render_context()
+    covers = ctx.covers
+    layers = _np_layers(ctx)
+
+    ox, oy, x1, y1 = region if region is not None else (0, 0, ctx.width, ctx.height)
+    frame = layers["frame"][oy:y1, ox:x1]
+    with span("background"):
+        np.copyto(frame, layers["background"][oy:y1, ox:x1])
+    center_x, center_y = plan["center"]
+    cover_size = plan["cover_size"]
+
+    def visible(boxes: list) -> bool:
+        return region is None or any(_overlaps(box, region) for box in boxes)
+
+    # Discos de la ruleta
+    for slot in plan["slots"]:
+        if region is not None and not visible(slot_boxes(slot, ctx.sprites)):
+            continue
+        disc_x, actual_y = slot["x"] - ox, slot["y"] - oy
+
+        with span("slot", album_id=slot["album_id"], size=slot["size"]):
+            with span("covers"):
+                with span("cover.load"):
+                    cover = covers.get(slot["album_id"], slot["size"], slot["thickness"], ctx.resample)
+                    cover = np.asarray(cover)[..., :3]
+                opacity = slot["alpha"] / 255.0 if slot["alpha"] is not None else 1.0
+                side = cover.shape[0]
+
+                # Ombra: el blur d'un rectangle uniforme és el mateix rectangle
+                if slot["shadow_alpha"] is not None:
+                    with span("cover.shadow"):
+                        offset = layout_px(8, ctx.scale)
+                        _np_darken(frame, disc_x + offset, actual_y + offset, side, side,
+                                   slot["shadow_alpha"] / 255.0)
+
+            glow_plan = slot["glow"]
+            if glow_plan is not None:
+                with span("glow"):
+                    glow_size = glow_plan["size"]
+                    glow_rgb, glow_alpha = ctx.sprites.arrays(("slot", ctx.sprites.glow_bucket(glow_size)),
+                                                              lambda: ctx.sprites.slot_glow(glow_size))
+                    shift = (glow_size - glow_rgb.shape[0]) // 2
+                    _np_blend(frame, glow_rgb, glow_plan["x"] + shift - ox, glow_plan["y"] + shift - oy, alpha=glow_alpha,
+                              opacity=glow_plan["alpha"] / SLOT_GLOW_UNIT)
+
+            with span("covers"):
+                if slot["brightness"] is not None:
+                    with span("cover.brightness"):
+                        cover = np.minimum(cover * np.float32(slot["brightness"]), 255.0)
+
+                with span("cover.paste"):
+                    _np_blend(frame, cover, disc_x, actual_y, opacity=opacity)
+
+    # Indicadors laterals
+    with span("indicators"):
+        ind_color = COLORS["gold"][:3]
+        lines, width = indicator_lines(plan)
+        for line in lines:
+            _np_line(frame, [(x - ox, y - oy) for x, y in line], ind_color, width)
+
+    # Vinil i glow de revelació
+    vinyl_plan = plan["vinyl"]
+    if vinyl_plan is not None and visible(vinyl_boxes(plan, ctx.sprites)):
+        if vinyl_plan["glow_intensity"] is not None and not reveal_glow_hidden(plan):
+            with span("glow"):
+                glow_rgb, glow_alpha = ctx.sprites.arrays(("reveal",), ctx.sprites.reveal_glow)
+                side = glow_rgb.shape[0]
+                _np_blend(frame, glow_rgb, center_x - side // 2 - ox, center_y - side // 2 - oy, alpha=glow_alpha,
+                          opacity=vinyl_plan["glow_intensity"] / REVEAL_GLOW_UNIT)
+
+        with span("vinyl"):
+            key = ("vinyl", vinyl_plan["size"])
+            if key not in ctx.arrays:
+                ctx.arrays[key] = _np_rgba(ctx.vinyl(vinyl_plan["size"]))
+            vinyl_rgb, vinyl_alpha = ctx.arrays[key]
+            _np_blend(frame, vinyl_rgb, vinyl_plan["x"] - ox, vinyl_plan["y"] - oy, alpha=vinyl_alpha)
+
+            size, album_id, angle = vinyl_plan["size"], vinyl_plan["album_id"], vinyl_plan["angle"]
+            label_rgb, label_alpha = ctx.sprites.arrays(("vinyl_label", size, album_id, angle),
+                                                        lambda: ctx.vinyl_label(size, album_id, angle))
+            label_x, label_y = vinyl_label_box(vinyl_plan)[:2]
+            _np_blend(frame, label_rgb, label_x - ox, label_y - oy, alpha=label_alpha)
+
+            center_cover = np.asarray(covers.get(vinyl_plan["album_id"], cover_size,
+                                                 layout_px(4, ctx.scale), ctx.resample))[..., :3]
+            side = center_cover.shape[0]
+            _np_blend(frame, center_cover, center_x - side // 2 - ox, center_y - side // 2 - oy)
+
+    # Text
+    if plan["text"] is not None:
+        with span("text"):
+            for op in plan["text"]:
+                if op["kind"] == "line":
+                    coverage, x, y = ctx.sprites.mask_array(
+                        ("line", tuple(map(tuple, op["points"])), op["width"]),
+                        lambda: ctx.sprites.line(op["points"], op["width"]))
+                else:
+                    coverage, dx, dy = ctx.sprites.mask_array(
+                        ("text", op["text"], op["font_size"], op["bold"]),
+                        lambda: ctx.sprites.text(op["text"], op["font_size"], op["bold"]))
+                    x, y = op["xy"][0] + dx, op["xy"][1] + dy
+                ink = np.broadcast_to(np.array(COLORS[op["color"]][:3], dtype=np.float32), coverage.shape + (3,))
+                _np_blend(frame, ink, x - ox, y - oy, alpha=coverage, opacity=op["alpha"] / 255)
+
+    # Franja superior i logotip
+    if top_band:
+        with span("logo"):
+            _np_darken(frame, -ox, -oy, ctx.band.width, ctx.band.height, ctx.band.getpixel((0, 0))[3] / 255.0)
+            logo_rgb, logo_alpha = layers["logo"]
+            _np_blend(frame, logo_rgb, ctx.logo_pos[0] - ox, ctx.logo_pos[1] - oy, alpha=logo_alpha)
+
+    out = np.empty(frame.shape, dtype=np.uint8)
+    np.rint(frame, out=frame)
+    np.clip(frame, 0, 255, out=frame)
+    out[...] = frame
+    return Image.fromarray(out, 'RGB')
+
+
+def _psnr(a: Image.Image, b: Image.Image) -> float:
+    diff = np.asarray(a, dtype=np.float64) - np.asarray(b, dtype=np.float64)
+    mse = float(np.mean(diff * diff))
+    return float("inf") if mse == 0 else 10 * math.log10(255.0 ** 2 / mse)
+
+
+def check_compositors(job: dict, step: int = 10, min_psnr: float = 45.0) -> bool:
+    """
+    Compara el backend numpy amb el de PIL en un frame de cada `step`.
+    Retorna False si algun frame queda per sota de `min_psnr` dB.
+    """
+    ctx = job_render_context(job)
+    worst = float("inf")
+    for i in range(0, job["total_frames"], step):
+        plan = plan_job_frame(ctx, i, job)
+        reference = ctx.add_top_band(draw_frame(plan, ctx)).convert('RGB')
+        value = _psnr(reference, draw_frame_numpy(plan, ctx))
+        worst = min(worst, value)
+        if value < min_psnr:
+            print(f"   ❌ Frame {i}: PSNR {value:.1f} dB < {min_psnr:.1f} dB")
 
-        frame_path = FRAMES_DIR / f"frame_{i:05d}.png"
-        frame.save(frame_path, optimize=True)
+    ok = worst >= min_psnr
+    print(f"{'✅' if ok else '❌'} Compositor numpy vs PIL: PSNR mínim {worst:.1f} dB")
+    return ok
 
-        if (i + 1) % FPS == 0 or i == total_frames - 1:
-            print(f"   Frame {i+1}/{total_frames} ({int((i+1)/total_frames*100)}%)")
 
-    print(f"✅ Frames guardats a: {FRAMES_DIR}")
-    return FRAMES_DIR
+# ============================================================================
+# CACHE DE FRAMES (re-render incremental)
+# ============================================================================
 
+FRAME_CACHE_DIR = OUTPUT_DIR / "cache" / "frames"
+FRAME_CACHE_MAX_BYTES = 4 * 1024 * 1024 * 1024
 
-def create_video_from_frames(frames_dir: Path, output_name: str) -> Path:
-    """Crea vídeo MP4."""
-    output_path = OUTPUT_DIR / output_name
-    print(f"🎥 Creant vídeo amb ffmpeg...")
+# Incrementar quan canviï com es dibuixa un frame (invalida la cache)
+FRAME_CACHE_VERSION = 4
 
-    cmd = [
-        "ffmpeg", "-y",
-        "-framerate", str(FPS),
-        "-i", str(frames_dir / "frame_%05d.png"),
+
+def frame_key(plan: dict, ctx: RenderContext, extra: dict = None) -> str:
+    """
+    Hash del pla del frame i de tot el que hi ha al voltant (portades,
+    logotip, opcions del render que canvien els píxels com el compositor).
+    """
+    album_ids = sorted({slot["album_id"] for slot in plan["slots"]}
+                       | ({plan["vinyl"]["album_id"]} if plan["vinyl"] else set()))
+    payload = {
+        "version": FRAME_CACHE_VERSION,
+        "size": [ctx.width, ctx.height],
+        "logo": [ctx.logo.size, _file_signature(LOGO_PATH)],
+        "fonts": get_font_registry().describe() if plan["text"] else None,
+        "covers": {aid: ctx.covers.signature(aid) for aid in album_ids},
+        "plan": plan,
+        "extra": extra or {},
+    }
+    data = json.dumps(payload, sort_keys=True, default=list).encode()
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def frame_key_extra(ctx: RenderContext, job: dict) -> dict:
+    """Opcions del job que canvien els píxels però no són al pla."""
+    extra = {"compositor": job.get("compositor", "pil")}
+    if ctx.cheap_effects:
+        extra["cheap_effects"] = True
+    return extra
+
+
+class FrameCache:
+    """
+    Cache a disc de frames finals, indexada pel hash del pla del frame
+    (fases, discos visibles, offsets, opacitats i textos). Si el pla no
+    canvia, el frame no es torna a renderitzar. Mida limitada: quan se
+    supera, s'expulsen els frames menys usats recentment.
+    """
+
+    def __init__(self, cache_dir: Path = None, max_bytes: int = FRAME_CACHE_MAX_BYTES):
+        self.cache_dir = Path(cache_dir or FRAME_CACHE_DIR)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._bytes = sum(f.stat().st_size for f in self.cache_dir.glob("*/*.png"))
+
+    def key(self, plan: dict, ctx: RenderContext, extra: dict = None) -> str:
+        return frame_key(plan, ctx, extra)
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.png"
+
+    def get(self, key: str) -> Optional[Image.Image]:
+        path = self._path(key)
+        try:
+            with Image.open(path) as img:
+                frame = img.convert('RGB')
+            os.utime(path)  # Marca d'ús per a l'LRU
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return frame
+
+    def put(self, key: str, frame: Image.Image):
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+
+        # Escriptura atòmica: mai queda un PNG a mitges a la cache
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        frame.save(tmp_path, format="PNG", compress_level=1)
+        # Si la clau ja hi era (p. ex. un PNG il·legible que es reescriu), la mida
+        # anterior surt del compte
+        try:
+            replaced = path.stat().st_size
+        except OSError:
+            replaced = 0
+        os.replace(tmp_path, path)
+
+        self.writes += 1
+        self._bytes += path.stat().st_size - replaced
+        if self._bytes > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        """Expulsa els frames més antics fins quedar al 90% del límit."""
+        entries = []
+        for f in self.cache_dir.glob("*/*.png"):
+            try:
+                st = f.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, f))
+        entries.sort()
+
+        self._bytes = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, f in entries:
+            if self._bytes <= target:
+                break
+            try:
+                f.unlink()
+            except OSError:
+                continue
+            self._bytes -= size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        """Estadístiques d'ús de la cache."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "mb": self._bytes / (1024 * 1024),
+        }
+
+
+_frame_caches = {}
+
+
+def job_frame_cache(job: dict) -> Optional[FrameCache]:
+    """Cache de frames del job (opció `frame_cache`), una per directori i procés."""
+    cache_dir = job.get("frame_cache")
+    if not cache_dir:
+        return None
+    cache = _frame_caches.get(str(cache_dir))
+    if cache is None:
+        cache = FrameCache(cache_dir, job.get("frame_cache_max_bytes", FRAME_CACHE_MAX_BYTES))
+        _frame_caches[str(cache_dir)] = cache
+    return cache
+
+
+# ============================================================================
+# JOBS DE RENDER
+# ============================================================================
+
+def prepare_render_job(
+    featured_album_id: str,
+    session_info: dict,
+    duration: float = 10.0,
+    options: dict = None
+) -> dict:
+    """
+    Paràmetres d'un render: tot el que necessita un frame a part del seu número.
+    `options` són opcions de render (cache de frames, esborrany, etc.) que viatgen
+    amb el job. Un esborrany (`scale`, `fps`) recorre la mateixa línia de temps
+    de `timeline_frames` frames a FPS que el render final.
+    """
+    options = options or {}
+    if options.get("catalog"):
+        use_catalog(options["catalog"])
+    album_info = get_catalog().info(featured_album_id)
+    print(f"🎬 Generant frames per a: {album_info.get('title', 'Unknown')}")
+
+    fps = options.get("fps", FPS)
+    total_frames = int(duration * fps)
+
+    # Portades mapejades de l'atles compartit (s'actualitza si algun JPEG ha canviat)
+    if options.get("cover_atlas"):
+        use_cover_atlas(options["cover_atlas"], build=True)
+
+    # Capes estàtiques i logotip (el triple de gran: 660px), reutilitzats entre renders
+    ctx = job_render_context(options)
+    print(f"   Logotip carregat: {ctx.logo.size}")
+    if options.get("draft"):
+        print(f"   Esborrany: {ctx.width}x{ctx.height} a {fps} fps"
+              f"{' (efectes simplificats)' if ctx.cheap_effects else ''}")
+    elif ctx.scale != 1.0:
+        print(f"   Resolució: {ctx.width}x{ctx.height}")
+    if options.get("tile_bytes"):
+        budget = memory_budget(ctx.width, ctx.height, options["tile_bytes"])
+        print(f"   Memòria acotada a {options['tile_bytes'] // (1024 * 1024)} MB: franges de "
+              f"{tile_height(ctx.width, budget['tile'])} files, portades {budget['covers'] // (1024 * 1024)} MB, "
+              f"sprites {budget['sprites'] // (1024 * 1024)} MB")
+
+    timeline = TimelineParams.from_dict(options.get("timeline"))
+    album_sequence = build_album_sequence(featured_album_id, COVERS_DIR, timeline.featured_index,
+                                          options.get("sequence_filter"),
+                                          options.get("sequence_seed", SEQUENCE_SEED))
+
+    print(f"   Portades disponibles: {len(album_sequence)}")
+    print(f"   Total frames: {total_frames}")
+
+    cover_size = 850      # Quasi tot l'ample (1080px - marges)
+    slot_height = cover_size + 60  # Espai entre discos
+
+    return {
+        "featured_album_id": featured_album_id,
+        "album_info": album_info,
+        "session_info": session_info,
+        "album_sequence": album_sequence,
+        "total_frames": total_frames,
+        "timeline_frames": int(duration * FPS),
+        "cover_size": cover_size,
+        "slot_height": slot_height,
+        "timeline": timeline.as_dict(),
+        **{k: v for k, v in options.items() if k != "timeline"},
+    }
+
+
+_job_timeline = (None, None)
+
+
+def job_timeline(ctx: RenderContext, job: dict) -> RouletteTimeline:
+    """
+    Línia de temps de tots els frames d'un job (es calcula una vegada per procés
+    i job). En un esborrany cada frame es situa a la línia de temps del render
+    final (mateix instant), que pot caure entre dos frames d'aquest.
+    """
+    global _job_timeline
+    key = json.dumps([job["total_frames"], job.get("timeline_frames"), job.get("fps", FPS),
+                      job["album_sequence"], job["featured_album_id"], job["cover_size"],
+                      job["slot_height"], job.get("timeline"), job.get("album_info"), ctx.covers.size_step])
+    if _job_timeline[0] != key:
+        fps = job.get("fps", FPS)
+        frames = np.arange(job["total_frames"])
+        if fps != FPS:
+            frames = frames * FPS / fps
+        timeline = RouletteTimeline(
+            frames,
+            total_frames=job.get("timeline_frames", job["total_frames"]),
+            album_sequence=job["album_sequence"],
+            featured_album_id=job["featured_album_id"],
+            cover_size=job["cover_size"],
+            slot_height=job["slot_height"],
+            size_step=ctx.covers.size_step,
+            params=TimelineParams.from_dict(job.get("timeline")),
+            album_info=job.get("album_info")
+        )
+        _job_timeline = (key, timeline)
+    return _job_timeline[1]
+
+
+def plan_job_frame(ctx: RenderContext, frame_num: int, job: dict) -> dict:
+    """Pla d'un frame d'un job de render (llegit de la línia de temps del job)."""
+    plan = job_timeline(ctx, job).plan(frame_num, job["session_info"])
+    scale = job.get("scale", 1.0)
+    if scale != 1.0:
+        plan = scale_plan(plan, scale, ctx.covers)
+    return quality_plan(plan, ctx.quality) if ctx.quality else plan
+
+
+def render_frame(ctx: RenderContext, frame_num: int, job: dict) -> Image.Image:
+    """Frame final RGB (ruleta + franja superior amb logotip) d'un job de render."""
+    with span("frame", frame=frame_num):
+        with span("plan"):
+            plan = plan_job_frame(ctx, frame_num, job)
+        return render_plan(ctx, plan, job)
+
+
+# ============================================================================
+# RENDER PER FRANGES (memòria acotada)
+# ============================================================================
+
+TILE_MAX_BYTES = 64 * 1024 * 1024
+
+# Bytes per píxel d'una franja en composició: llenç RGBA, fons, retalls de
+# portades i glows amb els seus efectes, i la conversió a RGB
+TILE_BYTES_PER_PIXEL = 24
+
+# Frames RGB sencers vius alhora en un render per franges: el que es compon,
+# l'anterior (render incremental) i els 2 de la cua de l'encoder, més la còpia
+# que s'escriu a ffmpeg
+TILE_FRAME_BUFFERS = 5
+
+
+def memory_budget(width: int, height: int, max_bytes: int) -> dict:
+    """
+    Reparteix la memòria d'un render per franges (--tile-mb): els frames
+    sencers, un terç del que queda de marge (fragmentació de l'heap, objectes
+    petits) i la resta entre les franges en composició (1/4), la cache de
+    portades (1/2) i la de sprites (1/4). Llença ValueError si els frames
+    sencers ja no hi caben.
+    """
+    frames = width * height * 3 * TILE_FRAME_BUFFERS
+    rest = (max_bytes - frames) * 2 // 3
+    if rest < width * TILE_BYTES_PER_PIXEL * 4:
+        raise ValueError(f"calen més de {math.ceil(frames / (1024 * 1024))} MB per als frames "
+                         f"de {width}x{height}")
+    return {"frames": frames, "tile": rest // 4, "covers": rest // 2, "sprites": rest - rest // 4 - rest // 2}
+
+
+def tile_height(width: int, tile_bytes: int) -> int:
+    """Files per franja perquè la composició d'una franja càpiga a `tile_bytes`."""
+    return max(1, tile_bytes // (width * TILE_BYTES_PER_PIXEL))
+
+
+def composite_region(ctx: RenderContext, plan: dict, frame: Image.Image, rect: tuple, strip_height: int = None):
+    """
+    Recompon el rectangle `rect` de `frame` (RGB) a partir del pla, en franges
+    horitzontals de `strip_height` files (o d'una sola vegada). Cada franja
+    només dibuixa els elements que la toquen i allibera els temporals abans
+    de la següent.
+    """
+    x0, y0, x1, y1 = rect
+    step = strip_height or (y1 - y0)
+    for top in range(y0, y1, step):
+        strip = (x0, top, x1, min(top + step, y1))
+        with span("region", box=strip):
+            tile = ctx.add_top_band(draw_frame(plan, ctx, strip), strip[:2])
+            frame.paste(tile.convert('RGB'), strip[:2])
+
+
+def job_tile_height(ctx: RenderContext, job: dict) -> Optional[int]:
+    """Files per franja del job (None si el job compon frames sencers)."""
+    tile_bytes = job.get("tile_bytes")
+    if not tile_bytes:
+        return None
+    return tile_height(ctx.width, memory_budget(ctx.width, ctx.height, tile_bytes)["tile"])
+
+
+def draw_frame_tiled(plan: dict, ctx: RenderContext, strip_height: int) -> Image.Image:
+    """Frame final RGB (amb la franja superior) compost per franges horitzontals."""
+    frame = Image.new('RGB', (ctx.width, ctx.height))
+    composite_region(ctx, plan, frame, (0, 0, ctx.width, ctx.height), strip_height)
+    return frame
+
+
+def check_tiled(job: dict, step: int = 10) -> bool:
+    """Comprova que el render per franges dona els mateixos píxels que el sencer."""
+    ctx = job_render_context(job)
+    strip_height = job_tile_height(ctx, job) or tile_height(ctx.width, TILE_MAX_BYTES)
+    mismatches = []
+    for i in range(0, job["total_frames"], step):
+        plan = plan_job_frame(ctx, i, job)
+        reference = ctx.add_top_band(draw_frame(plan, ctx)).convert('RGB')
+        if draw_frame_tiled(plan, ctx, strip_height).tobytes() != reference.tobytes():
+            mismatches.append(i)
+
+    strips = math.ceil(ctx.height / strip_height)
+    if mismatches:
+        print(f"❌ Render per franges diferent del sencer a {len(mismatches)} frames: {mismatches[:10]}")
+        return False
+    print(f"✅ Render per franges idèntic al sencer ({ctx.width}x{ctx.height}, {strips} franges de {strip_height} files)")
+    return True
+
+
+def render_plan(ctx: RenderContext, plan: dict, job: dict) -> Image.Image:
+    """Frame sencer a partir del seu pla (cache de frames i compositor del job)."""
+    compositor = job.get("compositor", "pil")
+
+    frame_cache = job_frame_cache(job)
+    if frame_cache is not None:
+        with span("frame.cache"):
+            key = frame_cache.key(plan, ctx, frame_key_extra(ctx, job))
+            frame = frame_cache.get(key)
+        if frame is not None:
+            return frame
+
+    strip_height = job_tile_height(ctx, job)
+    if compositor == "numpy":
+        frame = draw_frame_numpy(plan, ctx)
+    elif strip_height is not None:
+        frame = draw_frame_tiled(plan, ctx, strip_height)
+    else:
+        # Afegir logotip amb degradat fosc a la part superior
+        frame = ctx.add_top_band(draw_frame(plan, ctx)).convert('RGB')
+
+    if frame_cache is not None:
+        frame_cache.put(key, frame)
+    return frame
+
+
+# ============================================================================
+# RENDER INCREMENTAL
+# ============================================================================
+
+# Fracció del frame a partir de la qual és més barat renderitzar-lo sencer
+DIRTY_MAX_AREA = 0.5
+
+
+def frame_elements(plan: dict, sprites: SpriteCache) -> dict:
+    """
+    Elements que dibuixa un pla, en ordre de dibuix: {clau: rectangles}. La
+    clau inclou la posició i tots els paràmetres de l'element, de manera que
+    dos elements amb la mateixa clau pinten exactament els mateixos píxels.
+    """
+    def key(*parts) -> str:
+        return json.dumps(parts, sort_keys=True, default=list)
+
+    elements = {}
+    for i, slot in enumerate(plan["slots"]):
+        elements[key("slot", i, slot)] = slot_boxes(slot, sprites)
+    elements[key("indicators", plan["indicator_alpha"])] = indicator_boxes(plan)
+    if plan["vinyl"] is not None:
+        vinyl = dict(plan["vinyl"])
+        if reveal_glow_hidden(plan):
+            vinyl["glow_intensity"] = None
+        # Quan el vinil ja no es mou només canvia l'etiqueta que gira
+        angle = vinyl.pop("angle")
+        elements[key("vinyl", vinyl)] = vinyl_boxes(plan, sprites)
+        elements[key("vinyl.label", vinyl["x"], vinyl["y"], vinyl["size"], vinyl["album_id"], angle)] = \
+            [vinyl_label_box(plan["vinyl"])]
+    for i, op in enumerate(plan["text"] or []):
+        elements[key("text", i, op)] = [text_box(op, sprites)]
+    return elements
+
+
+def _merge_boxes(boxes: list) -> list:
+    """Uneix els rectangles que se solapen fins que no en queda cap de solapat."""
+    merged = []
+    for box in boxes:
+        while True:
+            overlapping = [other for other in merged if _overlaps(box, other)]
+            if not overlapping:
+                break
+            for other in overlapping:
+                merged.remove(other)
+                box = (min(box[0], other[0]), min(box[1], other[1]),
+                       max(box[2], other[2]), max(box[3], other[3]))
+        merged.append(box)
+    return merged
+
+
+def dirty_rects(previous: dict, plan: dict, ctx: RenderContext) -> Optional[list]:
+    """
+    Rectangles del frame que canvien entre dos plans consecutius: els
+    d'elements que desapareixen, apareixen o canvien de paràmetres. None si
+    la geometria general canvia o si és més barat renderitzar el frame sencer.
+    """
+    if previous["center"] != plan["center"] or previous["cover_size"] != plan["cover_size"]:
+        return None
+
+    before = frame_elements(previous, ctx.sprites)
+    after = frame_elements(plan, ctx.sprites)
+    boxes = [box for k, bs in before.items() if k not in after for box in bs]
+    boxes += [box for k, bs in after.items() if k not in before for box in bs]
+
+    rects = []
+    for x0, y0, x1, y1 in _merge_boxes(boxes):
+        x0, y0, x1, y1 = max(x0, 0), max(y0, 0), min(x1, ctx.width), min(y1, ctx.height)
+        if x0 < x1 and y0 < y1:
+            rects.append((x0, y0, x1, y1))
+
+    area = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in rects)
+    if area > DIRTY_MAX_AREA * ctx.width * ctx.height:
+        return None
+    return rects
+
+
+class FrameRenderer:
+    """
+    Renderitza frames consecutius d'un job aprofitant l'anterior. Si cap element
+    visible canvia, el frame és un duplicat (el mateix objecte) i no es
+    renderitza; si només canvien alguns elements (p. ex. l'etiqueta del vinil
+    que gira al final del clip), es recomponen només els rectangles afectats
+    sobre el frame anterior. Tots dos camins valen per a qualsevol compositor i
+    el resultat és idèntic píxel a píxel al render complet (veure
+    check_incremental()).
+    """
+
+    def __init__(self, ctx: RenderContext, job: dict):
+        self.ctx = ctx
+        self.job = job
+        self.incremental = job.get("incremental", True)
+        self.last_duplicate = False
+        self.duplicates = 0
+        self.partial = 0
+        self.full = 0
+        self._plan = None
+        self._frame = None
+
+    def render(self, frame_num: int) -> Image.Image:
+        with span("frame", frame=frame_num):
+            with span("plan"):
+                plan = plan_job_frame(self.ctx, frame_num, self.job)
+
+            frame = self._reuse(plan) if self.incremental and self._plan is not None else None
+            if frame is None:
+                self.last_duplicate = False
+                frame = render_plan(self.ctx, plan, self.job)
+                self.full += 1
+
+            self._plan, self._frame = plan, frame
+            return frame
+
+    def _reuse(self, plan: dict) -> Optional[Image.Image]:
+        if plan == self._plan:
+            self.last_duplicate = True
+            self.duplicates += 1
+            return self._frame
+
+        self.last_duplicate = False
+        # Amb un altre nivell de qualitat canvien píxels que les claus dels elements no veuen
+        if plan.get("quality") != self._plan.get("quality"):
+            return None
+
+        with span("dirty"):
+            rects = dirty_rects(self._plan, plan, self.ctx)
+        if rects is None:
+            return None
+        if not rects:
+            # El pla canvia però cap píxel (p. ex. un glow tapat): també és un duplicat
+            self.last_duplicate = True
+            self.duplicates += 1
+            return self._frame
+
+        frame = self._frame.copy()
+        if self.job.get("compositor", "pil") == "numpy":
+            for rect in rects:
+                with span("region", box=rect):
+                    frame.paste(draw_frame_numpy(plan, self.ctx, region=rect), rect[:2])
+        else:
+            strip_height = job_tile_height(self.ctx, self.job)
+            for rect in rects:
+                composite_region(self.ctx, plan, frame, rect, strip_height)
+        self.partial += 1
+        return frame
+
+    def stats(self) -> dict:
+        return {"duplicates": self.duplicates, "partial": self.partial, "full": self.full}
+
+
+_frame_renderer = None
+
+
+def get_frame_renderer(ctx: RenderContext, job: dict) -> FrameRenderer:
+    """
+    Renderer persistent del procés (workers): es conserva entre rangs del mateix
+    job. Qualsevol pla anterior és vàlid com a base, no cal que sigui el frame previ.
+    """
+    global _frame_renderer
+    if _frame_renderer is None or _frame_renderer.ctx is not ctx or _frame_renderer.job != job:
+        _frame_renderer = FrameRenderer(ctx, job)
+    return _frame_renderer
+
+
+def check_incremental(job: dict) -> bool:
+    """Comprova que el render incremental dona els mateixos píxels que el complet."""
+    ctx = job_render_context(job)
+    renderer = FrameRenderer(ctx, {**job, "incremental": True, "frame_cache": None})
+    full_job = {**job, "frame_cache": None}
+    mismatches = []
+    for i in range(job["total_frames"]):
+        if renderer.render(i).tobytes() != render_frame(ctx, i, full_job).tobytes():
+            mismatches.append(i)
+
+    stats = renderer.stats()
+    print(f"   Incremental: {stats['duplicates']} duplicats, {stats['partial']} parcials, "
+          f"{stats['full']} sencers")
+    if mismatches:
+        print(f"❌ Render incremental diferent del complet a {len(mismatches)} frames: {mismatches[:10]}")
+        return False
+    print(f"✅ Render incremental idèntic al complet ({job['total_frames']} frames)")
+    return True
+
+
+def save_frame(frame: Image.Image, frames_dir: Path, frame_num: int, duplicate_of: int = None) -> Path:
+    """
+    Desa un frame com a PNG numerat (un duplicat es copia del PNG ja desat).
+    Escriptura atòmica: un render interromput mai deixa un PNG a mitges.
+    """
+    frame_path = frames_dir / f"frame_{frame_num:05d}.png"
+    tmp_path = frames_dir / f".{frame_path.name}.{os.getpid()}.tmp"
+    with span("save", frame=frame_num):
+        if duplicate_of is not None:
+            shutil.copyfile(frames_dir / f"frame_{duplicate_of:05d}.png", tmp_path)
+        else:
+            frame.save(tmp_path, format="PNG", optimize=True)
+        os.replace(tmp_path, frame_path)
+    return frame_path
+
+
+_progress_hook = None
+
+
+def set_progress_hook(hook) -> object:
+    """
+    Crida `hook(done, total)` a cada informe de progrés d'un render (p. ex. el
+    dimoni, per reenviar-lo al procés principal). None el treu. Retorna l'anterior.
+    """
+    global _progress_hook
+    previous, _progress_hook = _progress_hook, hook
+    return previous
+
+
+def _print_progress(done: int, total_frames: int):
+    print(f"   Frame {done}/{total_frames} ({int(done/total_frames*100)}%)")
+    if _progress_hook is not None:
+        _progress_hook(done, total_frames)
+
+
+def render_stats(ctx: RenderContext, job: dict, renderer: FrameRenderer = None) -> dict:
+    """Estadístiques de les caches d'aquest procés per a un job."""
+    stats = {"covers": ctx.covers.stats()}
+    frame_cache = job_frame_cache(job)
+    if frame_cache is not None:
+        stats["frames"] = frame_cache.stats()
+    if renderer is not None:
+        stats["incremental"] = renderer.stats()
+    return stats
+
+
+def _merge_stats(worker_stats: dict) -> dict:
+    """Suma les estadístiques de cache de cada worker (per pid)."""
+    merged = {}
+    for stats in worker_stats.values():
+        for section, values in stats.items():
+            totals = merged.setdefault(section, {})
+            for name, value in values.items():
+                totals[name] = totals.get(name, 0) + value
+
+    for totals in merged.values():
+        lookups = totals.get("hits", 0) + totals.get("misses", 0)
+        totals["hit_rate"] = totals.get("hits", 0) / lookups if lookups else 0.0
+    return merged
+
+
+def _print_render_stats(stats: dict):
+    covers = stats.get("covers")
+    if covers:
+        mapped = f", {covers['mapped']} de l'atles" if covers.get("mapped") else ""
+        print(f"   Cache de portades: {covers['hits']} encerts, {covers['misses']} errades "
+              f"({covers['hit_rate']:.0%}), {covers['decodes']} descodificacions{mapped}, {covers['mb']:.0f} MB")
+    frames = stats.get("frames")
+    if frames:
+        print(f"   Cache de frames: {frames['hits']} reutilitzats, {frames['misses']} renderitzats "
+              f"({frames['hit_rate']:.0%}), {frames['evictions']} expulsats, {frames['mb']:.0f} MB")
+    incremental = stats.get("incremental")
+    if incremental:
+        print(f"   Render incremental: {incremental['duplicates']} duplicats, "
+              f"{incremental['partial']} parcials, {incremental['full']} sencers")
+
+
+# ============================================================================
+# DIARI DE FRAMES (renders reprenibles)
+# ============================================================================
+
+FRAME_JOURNAL = "journal.jsonl"
+
+
+class FrameJournal:
+    """
+    Diari només d'afegir dels PNG acabats d'un directori de frames: una línia
+    JSON per frame amb el hash dels seus paràmetres de render (frame_key) i la
+    mida del fitxer. Una línia s'afegeix després que el PNG ja és al seu lloc,
+    de manera que el diari mai anuncia un frame que no s'ha acabat d'escriure.
+    """
+
+    def __init__(self, frames_dir: Path):
+        self.path = Path(frames_dir) / FRAME_JOURNAL
+
+    def entries(self) -> dict:
+        """Última entrada de cada frame (una línia tallada per una interrupció s'ignora)."""
+        entries = {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        entries[int(entry["frame"])] = entry
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def append(self, entries: list):
+        if entries:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("".join(json.dumps(entry) + "\n" for entry in entries))
+
+    def rewrite(self, entries: list):
+        """Substitueix el diari (atòmicament) per aquestes entrades."""
+        write_atomic(self.path, "".join(json.dumps(entry) + "\n" for entry in entries).encode())
+
+
+def job_frames_dir(job: dict) -> Path:
+    """
+    Directori de frames d'un job, derivat dels seus paràmetres: el mateix
+    render (encara que s'hagi interromput) torna al mateix directori.
+    """
+    params = {k: v for k, v in job.items() if k not in ("resume", "trace")}
+    digest = hashlib.blake2b(json.dumps(params, sort_keys=True, default=str).encode(), digest_size=8)
+    return FRAMES_DIR / f"{job['featured_album_id']}_{digest.hexdigest()}"
+
+
+def journal_entry(ctx: RenderContext, job: dict, frame_num: int, path: Path) -> dict:
+    """Entrada del diari d'un frame que ja és a disc."""
+    key = frame_key(plan_job_frame(ctx, frame_num, job), ctx, frame_key_extra(ctx, job))
+    return {"frame": frame_num, "key": key, "bytes": path.stat().st_size}
+
+
+def prepare_frames_dir(job: dict, frames_dir: Path, resume: bool = False) -> set:
+    """
+    Deixa a punt el directori de frames d'un job. Sense `resume` el buida. Amb
+    `resume` conserva els frames del diari que continuen sent vàlids (mateix
+    hash de paràmetres i mateixa mida a disc) i esborra tota la resta. Retorna
+    els números dels frames conservats.
+    """
+    journal = FrameJournal(frames_dir)
+    kept = []
+    if resume:
+        ctx = job_render_context(job)
+        extra = frame_key_extra(ctx, job)
+        for frame_num, entry in sorted(journal.entries().items()):
+            if not 0 <= frame_num < job["total_frames"]:
+                continue
+            try:
+                size = (frames_dir / f"frame_{frame_num:05d}.png").stat().st_size
+            except OSError:
+                continue
+            # La mida també detecta un PNG que no va arribar a disc sencer (p. ex. un tall de corrent)
+            if size == entry.get("bytes") and \
+                    entry.get("key") == frame_key(plan_job_frame(ctx, frame_num, job), ctx, extra):
+                kept.append(entry)
+
+    valid = {entry["frame"] for entry in kept}
+    for f in frames_dir.glob("frame_*.png"):
+        try:
+            frame_num = int(f.stem[len("frame_"):])
+        except ValueError:
+            frame_num = None
+        if frame_num not in valid:
+            f.unlink()
+    for f in frames_dir.glob(".frame_*.tmp"):
+        f.unlink(missing_ok=True)
+    journal.rewrite(kept)
+    return valid
+
+
+def _frame_runs(start: int, end: int, skip: set) -> list:
+    """Subrangs contigus de [start, end) sense els frames de `skip`."""
+    runs, run_start = [], None
+    for i in range(start, end + 1):
+        if i < end and i not in skip:
+            if run_start is None:
+                run_start = i
+        elif run_start is not None:
+            runs.append((run_start, i))
+            run_start = None
+    return runs
+
+
+# ============================================================================
+# RENDER EN PARAL·LEL
+# ============================================================================
+
+# Frames per tasca quan els frames tornen al procés principal (6 MB cadascun a 1080p)
+STREAM_CHUNK_FRAMES = 4
+
+
+def warm_album_ids(featured_ids: list = None, options: dict = None) -> list:
+    """
+    Àlbums que convé descodificar en escalfar un worker: els de les ruletes
+    dels destacats donats o, sense destacats, tot el catàleg si és petit.
+    """
+    options = options or {}
+    if not featured_ids:
+        catalog = get_catalog()
+        return catalog.ids() if len(catalog) <= ROULETTE_ALBUMS else []
+    featured_index = TimelineParams.from_dict(options.get("timeline")).featured_index
+    ids = set()
+    for album_id in featured_ids:
+        ids.update(build_album_sequence(album_id, COVERS_DIR, featured_index, options.get("sequence_filter"),
+                                        options.get("sequence_seed", SEQUENCE_SEED)))
+    return sorted(ids)
+
+
+def warm_render_worker(album_sequence: list, options: dict = None):
+    """Inicialitzador dels workers: escalfa el context i descodifica (o mapeja) les portades."""
+    options = options or {}
+    if options.get("cover_atlas"):
+        use_cover_atlas(options["cover_atlas"])
+    ctx = job_render_context(options)
+    for album_id in album_sequence:
+        ctx.covers.source(album_id)
+
+
+def _render_frame_range(job: dict, start: int, end: int, frames_dir: Path = None) -> tuple:
+    """
+    Renderitza els frames [start, end) dins d'un worker.
+    Amb frames_dir els desa com a PNG i en retorna les entrades del diari; si
+    no, retorna els bytes RGB24 en ordre (None per als frames idèntics a l'anterior).
+    """
+    ctx = job_render_context(job)
+    tracer = _worker_tracer(job)
+    renderer = get_frame_renderer(ctx, job)
+    prewarm_render_caches(ctx, job, start, end)
+    frames = []
+    for i in range(start, end):
+        frame = renderer.render(i)
+        # Un duplicat del frame anterior del rang no es torna a desar ni enviar
+        duplicate = i > start and renderer.last_duplicate
+        if frames_dir is not None:
+            path = save_frame(frame, frames_dir, i, duplicate_of=i - 1 if duplicate else None)
+            frames.append(journal_entry(ctx, job, i, path))
+        else:
+            frames.append(None if duplicate else frame.tobytes())
+
+    stats = render_stats(ctx, job, renderer)
+    if tracer is not None:
+        stats["trace"] = tracer.drain()
+    return end - start, frames, os.getpid(), stats
+
+
+def _worker_tracer(job: dict) -> Optional[Tracer]:
+    """Tracer propi del worker si el job es traça (un fork hereta el del pare)."""
+    if not job.get("trace"):
+        return None
+    if _tracer is None or getattr(_tracer, "pid", None) != os.getpid():
+        set_tracer(Tracer())
+    return _tracer
+
+
+def _collect_trace(stats: dict):
+    """Passa els trams d'un worker al tracer del procés principal."""
+    events = stats.pop("trace", None)
+    if events and _tracer is not None:
+        _tracer.extend(events)
+
+
+def _frame_ranges(total_frames: int, chunk: int) -> list:
+    return [(start, min(start + chunk, total_frames)) for start in range(0, total_frames, chunk)]
+
+
+def _balanced_ranges(costs: np.ndarray, count: int) -> list:
+    """`count` rangs contigus de frames amb un cost semblant (segons la línia de temps)."""
+    total_frames = len(costs)
+    count = max(1, min(count, total_frames))
+    cumulative = np.cumsum(costs, dtype=np.float64)
+    targets = cumulative[-1] * np.arange(1, count) / count
+    bounds = [0] + sorted(set(int(b) + 1 for b in np.searchsorted(cumulative, targets))) + [total_frames]
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if start < end]
+
+
+def prewarm_render_caches(ctx: RenderContext, job: dict, start: int, end: int):
+    """
+    Prepara les portades, glows i etiquetes de vinil rotades que necessiten els
+    frames [start, end) abans de dibuixar-los.
+    """
+    variants, glows, labels = set(), set(), set()
+    for i in range(start, end):
+        plan = plan_job_frame(ctx, i, job)
+        for slot in plan["slots"]:
+            variants.add((slot["album_id"], slot["size"], slot["thickness"]))
+            if slot["glow"] is not None:
+                glows.add(slot["glow"]["size"])
+        if plan["vinyl"] is not None:
+            variants.add((plan["vinyl"]["album_id"], plan["cover_size"], layout_px(4, ctx.scale)))
+            labels.add((plan["vinyl"]["size"], plan["vinyl"]["album_id"]))
+    # Tots els angles del job, no només els del rang: en un clip l'etiqueta fa més d'una volta
+    angles = np.unique(job_timeline(ctx, job).vinyl_angle).tolist() if labels else []
+
+    with span("prewarm", variants=len(variants), glows=len(glows), labels=len(labels)):
+        for album_id, size, thickness in sorted(variants):
+            ctx.covers.get(album_id, size, thickness, ctx.resample)
+        for size in sorted(glows):
+            ctx.sprites.slot_glow(size)
+        for size, album_id in sorted(labels):
+            for angle in angles:
+                ctx.vinyl_label(size, album_id, angle)
+
+
+def prewarm_vinyl_labels(ctx: RenderContext, job: dict):
+    """
+    Pre-rota l'etiqueta del vinil del job a tots els angles que farà servir
+    (i prepara el darrer frame, on el vinil sempre hi és) abans del primer frame.
+    """
+    last = job["total_frames"] - 1
+    prewarm_render_caches(ctx, job, last, last + 1)
+
+
+def _new_render_pool(job: dict, workers: int) -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=warm_render_worker,
+        initargs=(job["album_sequence"], job)
+    )
+
+
+def _render_frames_parallel(job: dict, frames_dir: Path, workers: int, skip: set = frozenset(),
+                            segment_encoder: "SegmentedEncoder" = None):
+    """
+    Reparteix rangs de frames entre un pool de processos i els desa com a PNG
+    (menys els de `skip`, ja vàlids a disc). Les entrades del diari les escriu
+    només aquest procés. Amb `segment_encoder`, cada cop que s'allarga el
+    prefix de frames acabats li passa en ordre, sense esperar el pool sencer.
+    """
+    total_frames = job["total_frames"]
+    fps = job.get("fps", FPS)
+    # Rangs contigus (bona localitat de cache) de cost semblant segons la línia de temps
+    costs = job_timeline(job_render_context(job), job).frame_costs()
+    journal = FrameJournal(frames_dir)
+
+    done = len(skip)
+    next_report = (done // fps + 1) * fps
+    worker_stats = {}
+    # Frames a disc i llargada del prefix contigu ja passat a l'encoder
+    ready = [i in skip for i in range(total_frames)]
+    contiguous = 0
+
+    with _new_render_pool(job, workers) as pool:
+        futures = {
+            pool.submit(_render_frame_range, job, run_start, run_end, frames_dir): (run_start, run_end)
+            for start, end in _balanced_ranges(costs, workers * 4)
+            for run_start, run_end in _frame_runs(start, end, skip)
+        }
+        for future in as_completed(futures):
+            count, entries, pid, stats = future.result()
+            journal.append(entries)
+            run_start, run_end = futures[future]
+            ready[run_start:run_end] = [True] * (run_end - run_start)
+            while contiguous < total_frames and ready[contiguous]:
+                contiguous += 1
+            if segment_encoder is not None:
+                segment_encoder.add_png_frames(frames_dir, contiguous)
+            _collect_trace(stats)
+            worker_stats[pid] = stats
+            done += count
+            if done >= next_report or done == total_frames:
+                _print_progress(done, total_frames)
+                next_report = (done // fps + 1) * fps
+
+    _print_render_stats(_merge_stats(worker_stats))
+
+
+def iter_frames(job: dict, workers: int = 1, worker_stats: dict = None):
+    """
+    Genera (frame_num, frame RGB) en ordre. Amb workers > 1 els rangs es
+    renderitzen en paral·lel amb una finestra limitada de tasques pendents.
+    Els frames duplicats són el mateix objecte que l'anterior.
+    """
+    total_frames = job["total_frames"]
+
+    ctx = job_render_context(job)
+    if workers <= 1:
+        prewarm_vinyl_labels(ctx, job)
+        renderer = FrameRenderer(ctx, job)
+        for i in range(total_frames):
+            yield i, renderer.render(i)
+        if worker_stats is not None:
+            worker_stats[os.getpid()] = render_stats(ctx, job, renderer)
+        return
+
+    size = (ctx.width, ctx.height)
+    ranges = _frame_ranges(total_frames, STREAM_CHUNK_FRAMES)
+    window = workers + 2
+
+    frame = None
+    with _new_render_pool(job, workers) as pool:
+        pending = deque()
+        next_range = 0
+        while next_range < len(ranges) or pending:
+            while next_range < len(ranges) and len(pending) < window:
+                start, end = ranges[next_range]
+                pending.append((start, pool.submit(_render_frame_range, job, start, end)))
+                next_range += 1
+
+            start, future = pending.popleft()
+            _, frames, pid, stats = future.result()
+            _collect_trace(stats)
+            if worker_stats is not None:
+                worker_stats[pid] = stats
+            for offset, data in enumerate(frames):
+                # None: idèntic a l'anterior, es torna el mateix objecte
+                if data is not None:
+                    frame = Image.frombytes('RGB', size, data)
+                yield start + offset, frame
+
+
+def generate_all_frames(
+    featured_album_id: str,
+    session_info: dict,
+    duration: float = 10.0,
+    workers: int = 1,
+    frames_dir: Path = None,
+    options: dict = None,
+    segment_encoder: "SegmentedEncoder" = None
+) -> Path:
+    """
+    Genera tots els frames del vídeo com a PNG (en paral·lel si workers > 1)
+    en un directori propi del job (per defecte job_frames_dir, estable entre
+    execucions), amb un diari dels frames acabats. Amb
+    l'opció `resume` conserva els frames vàlids d'un render interromput i
+    només renderitza els que falten o han canviat.
+    Amb `segment_encoder`, cada segment es comença a codificar quan té tots els frames.
+    """
+    job = prepare_render_job(featured_album_id, session_info, duration, options)
+    total_frames = job["total_frames"]
+    frames_dir = Path(frames_dir or job_frames_dir(job))
+    frames_dir.mkdir(parents=True, exist_ok=True)
+
+    kept = prepare_frames_dir(job, frames_dir, resume=bool(job.get("resume")))
+    if job.get("resume"):
+        print(f"   Represa: {len(kept)} frames vàlids, {total_frames - len(kept)} per renderitzar")
+
+    if workers > 1:
+        print(f"   Workers: {workers}")
+        _render_frames_parallel(job, frames_dir, workers, skip=kept, segment_encoder=segment_encoder)
+    else:
+        ctx = job_render_context(job)
+        prewarm_vinyl_labels(ctx, job)
+        renderer = FrameRenderer(ctx, job)
+        journal = FrameJournal(frames_dir)
+        fps = job.get("fps", FPS)
+        previous = None
+        for i in range(total_frames):
+            if i not in kept:
+                frame = renderer.render(i)
+                # Un duplicat ho és de l'últim frame renderitzat (amb represa, no sempre i - 1)
+                duplicate_of = previous if renderer.last_duplicate else None
+                path = save_frame(frame, frames_dir, i, duplicate_of=duplicate_of)
+                journal.append([journal_entry(ctx, job, i, path)])
+                previous = i
+            if segment_encoder is not None:
+                segment_encoder.add_png_frames(frames_dir, i + 1)
+
+            if (i + 1) % fps == 0 or i == total_frames - 1:
+                _print_progress(i + 1, total_frames)
+
+        _print_render_stats(render_stats(ctx, job, renderer))
+
+    if segment_encoder is not None:
+        segment_encoder.add_png_frames(frames_dir, total_frames, final=True)
+
+    print(f"✅ Frames guardats a: {frames_dir}")
+    return frames_dir
+
+
+# ============================================================================
+# GENERACIÓ DEL VÍDEO
+# ============================================================================
+
+def x264_args(preset: str = "slow", crf: int = 17) -> list:
+    """Paràmetres de codificació H.264 comuns a tots els modes."""
+    return [
         "-c:v", "libx264",
-        "-preset", "slow",
-        "-crf", "17",
+        "-preset", preset,
+        "-crf", str(crf),
         "-pix_fmt", "yuv420p",
         "-movflags", "+faststart",
+    ]
+
+
+def create_video_from_frames(
+    frames_dir: Path,
+    output_name: str,
+    fps: int = FPS,
+    encode_args: list = None
+) -> Path:
+    """Crea vídeo MP4."""
+    output_path = OUTPUT_DIR / output_name
+    print(f"🎥 Creant vídeo amb ffmpeg...")
+
+    cmd = [
+        "ffmpeg", "-y",
+        "-framerate", str(fps),
+        "-i", str(frames_dir / "frame_%05d.png"),
+        *(encode_args or x264_args()),
         str(output_path)
     ]
 
@@ -641,20 +3251,1224 @@ def create_video_from_frames(frames_dir: Path, output_name: str) -> Path:
         return None
 
 
+class FFmpegStreamEncoder:
+    """
+    Envia frames RGB24 a l'stdin d'ffmpeg (-f rawvideo) a mesura que es
+    renderitzen. Una cua limitada desacobla el render de la codificació,
+    de manera que tots dos treballen alhora sense acumular frames.
+    """
+
+    def __init__(
+        self,
+        output_path: Path,
+        width: int = VIDEO_WIDTH,
+        height: int = VIDEO_HEIGHT,
+        fps: int = FPS,
+        queue_size: int = 8,
+        encode_args: list = None
+    ):
+        self.output_path = output_path
+        self.frames = 0
+        self._error = None
+        self._last_frame = None
+        self._last_data = None
+        self._stderr = tempfile.TemporaryFile()
+
+        cmd = [
+            "ffmpeg", "-y",
+            "-f", "rawvideo",
+            "-pix_fmt", "rgb24",
+            "-s", f"{width}x{height}",
+            "-framerate", str(fps),
+            "-i", "-",
+            *(encode_args or x264_args()),
+            str(output_path)
+        ]
+        self._process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                         stderr=self._stderr)
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._finished = False
+        self._thread = threading.Thread(target=self._pump, daemon=True)
+        self._thread.start()
+
+    def _pump(self):
+        while True:
+            data = self._queue.get()
+            if data is None:
+                break
+            if self._error is not None:
+                continue
+            try:
+                self._process.stdin.write(data)
+            except (BrokenPipeError, OSError) as e:
+                self._error = e
+        # Sense més frames ffmpeg pot acabar sense esperar close()
+        try:
+            self._process.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+
+    def write(self, frame: Image.Image):
+        """Afegeix un frame a la cua (bloqueja si l'encoder va endarrerit)."""
+        # Un frame duplicat (el mateix objecte) reutilitza els bytes de l'anterior
+        if frame is not self._last_frame:
+            self._last_frame = frame
+            self._last_data = (frame if frame.mode == 'RGB' else frame.convert('RGB')).tobytes()
+        self._queue.put(self._last_data)
+        self.frames += 1
+
+    def finish(self):
+        """Marca el final dels frames sense esperar ffmpeg (veure close())."""
+        if not self._finished:
+            self._finished = True
+            self._queue.put(None)
+
+    def wait(self) -> int:
+        """Espera que ffmpeg acabi (després de finish()) i en retorna el codi."""
+        return self._process.wait()
+
+    def close(self) -> bool:
+        """Tanca l'stdin, espera ffmpeg i retorna si ha acabat bé."""
+        self.finish()
+        self._thread.join()
+        returncode = self._process.wait()
+
+        self._stderr.seek(0)
+        self.stderr = self._stderr.read().decode(errors="replace")
+        self._stderr.close()
+        return returncode == 0 and self._error is None
+
+
+# ============================================================================
+# CODIFICACIÓ PER SEGMENTS
+# ============================================================================
+
+SEGMENT_SECONDS = 2.0
+
+
+def segment_encode_args(encode_args: list, segment_frames: int) -> list:
+    """
+    Paràmetres x264 d'un segment: els mateixos (preset, CRF) amb un GOP tancat
+    de la mida del segment; +faststart només s'aplica al fitxer concatenat.
+    """
+    args = list(encode_args or x264_args())
+    if "-movflags" in args:
+        i = args.index("-movflags")
+        del args[i:i + 2]
+    return args + ["-g", str(segment_frames), "-keyint_min", str(segment_frames)]
+
+
+def concat_segments(paths: list, output_path: Path, work_dir: Path) -> tuple:
+    """Uneix segments en ordre amb el demuxer concat, sense recodificar (+faststart). Retorna (ok, stderr)."""
+    list_path = Path(work_dir) / "segments.txt"
+    with open(list_path, "w", encoding="utf-8") as f:
+        for path in paths:
+            escaped = str(Path(path).resolve()).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    cmd = [
+        "ffmpeg", "-y",
+        "-f", "concat", "-safe", "0",
+        "-i", str(list_path),
+        "-c", "copy",
+        "-movflags", "+faststart",
+        str(output_path)
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    return result.returncode == 0, result.stderr if result.returncode != 0 else ""
+
+
+class SegmentedEncoder:
+    """
+    Codifica el vídeo en segments alineats amb el GOP, cadascun amb el seu
+    procés d'ffmpeg. Un segment es comença a codificar tan bon punt té tots els
+    frames, mentre es renderitzen els següents, i al final s'uneixen amb el
+    demuxer concat sense recodificar. Els frames arriben en streaming (write())
+    o com a PNG ja desats (add_png_frames()).
+    """
+
+    def __init__(
+        self,
+        output_path: Path,
+        width: int = VIDEO_WIDTH,
+        height: int = VIDEO_HEIGHT,
+        fps: int = FPS,
+        segment_frames: int = int(SEGMENT_SECONDS * FPS),
+        encode_args: list = None,
+        max_running: int = None,
+        queue_size: int = 8
+    ):
+        self.output_path = Path(output_path)
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.segment_frames = segment_frames
+        self.encode_args = encode_args
+        self.max_running = max_running or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.frames = 0
+        self.segments = []
+        self.stderr = ""
+        self._queued = 0  # Frames PNG ja assignats a un segment
+        self._work_dir = Path(tempfile.mkdtemp(prefix=f".{self.output_path.stem}.segments-",
+                                               dir=self.output_path.parent))
+
+    def _start_segment(self, start: int, frames: int) -> dict:
+        # Límit de processos d'ffmpeg alhora: s'espera el segment més antic
+        running = [seg for seg in self.segments if seg["returncode"] is None]
+        while len(running) >= self.max_running:
+            self._wait(running.pop(0))
+
+        segment = {
+            "index": len(self.segments),
+            "start": start,
+            "frames": frames,
+            "path": self._work_dir / f"segment_{len(self.segments):04d}.mp4",
+            "started": time.perf_counter(),
+            "finished": None,
+            "returncode": None,
+            "encoder": None,
+            "process": None,
+            "stderr": None,
+            "watcher": None,
+        }
+        self.segments.append(segment)
+        return segment
+
+    @staticmethod
+    def _watch(segment: dict, wait):
+        """Anota quan acaba el procés del segment (per al rendiment per segment)."""
+        def run():
+            wait()
+            segment["finished"] = time.perf_counter()
+        segment["watcher"] = threading.Thread(target=run, daemon=True)
+        segment["watcher"].start()
+
+    def _wait(self, segment: dict):
+        if segment["returncode"] is not None:
+            return
+        if segment["encoder"] is not None:
+            segment["encoder"].finish()
+            ok = segment["encoder"].close()
+            segment["returncode"] = 0 if ok else 1
+            if not ok:
+                self.stderr += segment["encoder"].stderr
+        else:
+            segment["returncode"] = segment["process"].wait()
+            segment["stderr"].seek(0)
+            if segment["returncode"] != 0:
+                self.stderr += segment["stderr"].read().decode(errors="replace")
+            segment["stderr"].close()
+        segment["watcher"].join()
+
+    def write(self, frame: Image.Image):
+        """Afegeix un frame (streaming); obre un segment nou cada `segment_frames`."""
+        current = self.segments[-1] if self.segments else None
+        if current is None or current["encoder"].frames >= self.segment_frames:
+            if current is not None:
+                current["encoder"].finish()
+            current = self._start_segment(self.frames, 0)
+            current["encoder"] = FFmpegStreamEncoder(
+                current["path"], self.width, self.height, self.fps, queue_size=self.queue_size,
+                encode_args=segment_encode_args(self.encode_args, self.segment_frames))
+            self._watch(current, current["encoder"].wait)
+        current["encoder"].write(frame)
+        current["frames"] += 1
+        self.frames += 1
+
+    def add_png_frames(self, frames_dir: Path, available: int, final: bool = False):
+        """
+        Els frames PNG [0, available) ja són a disc: comença a codificar els
+        segments complets (i la resta si `final`).
+        """
+        while available - self._queued >= self.segment_frames or (final and available > self._queued):
+            start = self._queued
+            count = min(self.segment_frames, available - start)
+            segment = self._start_segment(start, count)
+            cmd = [
+                "ffmpeg", "-y",
+                "-framerate", str(self.fps),
+                "-start_number", str(start),
+                "-i", str(Path(frames_dir) / "frame_%05d.png"),
+                "-frames:v", str(count),
+                *segment_encode_args(self.encode_args, self.segment_frames),
+                str(segment["path"])
+            ]
+            segment["stderr"] = tempfile.TemporaryFile()
+            segment["process"] = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                                  stderr=segment["stderr"])
+            self._watch(segment, segment["process"].wait)
+            self._queued += count
+            self.frames += count
+
+    def close(self) -> bool:
+        """Espera tots els segments, els concatena (-c copy, +faststart) i neteja."""
+        for segment in self.segments:
+            self._wait(segment)
+
+        ok = bool(self.segments) and all(seg["returncode"] == 0 for seg in self.segments)
+        if ok:
+            ok, stderr = concat_segments([seg["path"] for seg in self.segments], self.output_path, self._work_dir)
+            self.stderr += stderr
+
+        shutil.rmtree(self._work_dir, ignore_errors=True)
+        return ok
+
+    def stats(self) -> list:
+        """Temps i rendiment de codificació de cada segment."""
+        return [{
+            "index": seg["index"],
+            "start": seg["start"],
+            "frames": seg["frames"],
+            "seconds": seg["finished"] - seg["started"],
+            "fps": seg["frames"] / max(seg["finished"] - seg["started"], 1e-9),
+        } for seg in self.segments if seg["finished"] is not None]
+
+
+def _print_segment_stats(stats: list):
+    if not stats:
+        return
+    print(f"   Segments: {len(stats)}")
+    for seg in stats:
+        end = seg["start"] + seg["frames"] - 1
+        print(f"      #{seg['index']:<3} frames {seg['start']:>5}-{end:<5} "
+              f"{seg['seconds']:6.2f}s  {seg['fps']:6.1f} fps")
+
+
+def finish_segmented_video(encoder: SegmentedEncoder) -> Path:
+    """Espera i concatena els segments d'un render amb PNG (veure generate_all_frames)."""
+    print(f"🎥 Concatenant segments amb ffmpeg...")
+    ok = encoder.close()
+    _print_segment_stats(encoder.stats())
+    if not ok:
+        print(f"❌ Error ffmpeg: {encoder.stderr}")
+        return None
+
+    print(f"✅ Vídeo creat: {encoder.output_path}")
+    size_mb = encoder.output_path.stat().st_size / (1024 * 1024)
+    print(f"   Mida: {size_mb:.1f} MB")
+    return encoder.output_path
+
+
+def job_encoder(job: dict, output_path: Path):
+    """
+    Encoder d'un job: un sol ffmpeg o segments en paral·lel (`segment_frames`).
+    En el render per franges la cua es limita a 2 frames (cada frame sencer
+    és a la cua fins que ffmpeg el llegeix).
+    """
+    ctx = job_render_context(job)
+    fps = job.get("fps", FPS)
+    queue_size = 2 if job.get("tile_bytes") else 8
+    if job.get("segment_frames"):
+        return SegmentedEncoder(output_path, ctx.width, ctx.height, fps, job["segment_frames"],
+                                encode_args=job.get("encode_args"), queue_size=queue_size)
+    return FFmpegStreamEncoder(output_path, ctx.width, ctx.height, fps, queue_size=queue_size,
+                               encode_args=job.get("encode_args"))
+
+
+def _decoded_frames(path: Path, size: tuple):
+    """Frames RGB24 (bytes) d'un vídeo, descodificats amb ffmpeg."""
+    cmd = ["ffmpeg", "-v", "error", "-i", str(path), "-f", "rawvideo", "-pix_fmt", "rgb24", "-"]
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    frame_bytes = size[0] * size[1] * 3
+    try:
+        while True:
+            data = process.stdout.read(frame_bytes)
+            if len(data) < frame_bytes:
+                break
+            yield data
+    finally:
+        process.stdout.close()
+        process.wait()
+
+
+def _frame_timestamps(path: Path) -> tuple:
+    """(timebase, [(pts, durada)]) de cada frame del vídeo (via framemd5)."""
+    cmd = ["ffmpeg", "-v", "error", "-i", str(path), "-c", "copy", "-f", "framemd5", "-"]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    timebase = None
+    frames = []
+    for line in result.stdout.splitlines():
+        if line.startswith("#tb 0:"):
+            num, den = line.split(":", 1)[1].strip().split("/")
+            timebase = (int(num), int(den))
+        elif line and not line.startswith("#"):
+            parts = [p.strip() for p in line.split(",")]
+            frames.append((int(parts[2]), int(parts[3])))
+    frames.sort()
+    return timebase, frames
+
+
+def check_segments(job: dict, margin_db: float = 1.0) -> bool:
+    """
+    Codifica el job per segments i comprova les juntes: nombre de frames,
+    timestamps regulars (sense salts ni duplicats) i qualitat (PSNR respecte
+    del frame renderitzat) als frames de cada costat de cada junta, que no pot
+    quedar més de `margin_db` dB per sota de la resta del vídeo.
+    """
+    if shutil.which("ffmpeg") is None:
+        print("❌ ffmpeg no trobat")
+        return False
+
+    job = {**job, "segment_frames": job.get("segment_frames") or int(SEGMENT_SECONDS * job.get("fps", FPS))}
+    fps = job.get("fps", FPS)
+    segment_frames = job["segment_frames"]
+    total_frames = job["total_frames"]
+    ctx = job_render_context(job)
+
+    with tempfile.TemporaryDirectory(prefix=".check-segments-", dir=OUTPUT_DIR) as tmp:
+        output_path = Path(tmp) / "segments.mp4"
+        encoder = job_encoder(job, output_path)
+        for _, frame in iter_frames(job):
+            encoder.write(frame)
+        if not encoder.close():
+            print(f"❌ Error ffmpeg: {encoder.stderr}")
+            return False
+        _print_segment_stats(encoder.stats())
+
+        errors = []
+        timebase, stamps = _frame_timestamps(output_path)
+        if len(stamps) != total_frames:
+            errors.append(f"{len(stamps)} frames en lloc de {total_frames}")
+        elif timebase is not None:
+            step = timebase[1] / (timebase[0] * fps)
+            for i, (pts, duration) in enumerate(stamps):
+                if abs((pts - stamps[0][0]) - i * step) >= 1 or abs(duration - step) >= 1:
+                    errors.append(f"timestamp irregular al frame {i} (pts {pts}, durada {duration})")
+                    break
+
+        boundaries = {n for start in range(segment_frames, total_frames, segment_frames)
+                      for n in (start - 1, start)}
+        worst_boundary = worst_inside = float("inf")
+        renderer = FrameRenderer(ctx, {**job, "frame_cache": None})
+        size = (ctx.width, ctx.height)
+        for i, data in enumerate(_decoded_frames(output_path, size)):
+            if i >= total_frames:
+                break
+            value = _psnr(renderer.render(i), Image.frombytes('RGB', size, data))
+            if i in boundaries:
+                worst_boundary = min(worst_boundary, value)
+            else:
+                worst_inside = min(worst_inside, value)
+
+    print(f"   PSNR mínim: {worst_boundary:.1f} dB a les juntes, {worst_inside:.1f} dB a la resta")
+    if worst_boundary < worst_inside - margin_db:
+        errors.append(f"PSNR a les juntes {worst_boundary:.1f} dB, més de {margin_db:.1f} dB per sota de la resta")
+    if errors:
+        for error in errors:
+            print(f"   ❌ {error}")
+        print("❌ Codificació per segments amb artefactes a les juntes")
+        return False
+    print(f"✅ Segments de {segment_frames} frames sense salts ni artefactes a les juntes")
+    return True
+
+
+# ============================================================================
+# RENDER AMB TERMINI (qualitat adaptativa per fases)
+# ============================================================================
+
+DEADLINE_PHASES = ("gir", "assentament", "revelació")   # RouletteTimeline.phase
+DEADLINE_PROTECTED_PHASES = (2,)    # la revelació, on la mirada s'atura, sempre a qualitat alta
+DEADLINE_MARGIN = 0.1               # fracció del termini reservada per tancar l'encoder
+DEADLINE_UPGRADE_HEADROOM = 0.85    # només es puja de nivell si l'estimació queda per sota d'això
+DEADLINE_SMOOTHING = 0.3            # pes de cada frame nou a la mitjana exponencial del cost
+DEADLINE_SAMPLE_FRAMES = 2          # frames de mostra per fase abans de començar
+# Cost relatiu de cada nivell de QUALITY_LEVELS fins que se'n mesura algun frame
+QUALITY_COST_PRIOR = (1.0, 0.7, 0.5)
+
+
+def _with_preset(encode_args: list, preset: Optional[str]) -> list:
+    """Paràmetres de codificació amb un altre preset de x264 (None: els mateixos)."""
+    args = list(encode_args or x264_args())
+    if preset is not None and "-preset" in args:
+        args[args.index("-preset") + 1] = preset
+    return args
+
+
+def _encode_preset(encode_args: list) -> str:
+    args = list(encode_args or x264_args())
+    return args[args.index("-preset") + 1] if "-preset" in args else "?"
+
+
+class DeadlineScheduler:
+    """
+    Tria el nivell de QUALITY_LEVELS de cada fase de la línia de temps per
+    acabar abans de `deadline` segons. El render d'un frame costa segons per
+    unitat de RouletteTimeline.frame_costs() per fase i nivell (mitjana
+    exponencial) i la codificació `encode` segons. ffmpeg codifica en paral·lel
+    amb el render (fil de l'encoder), així que amb més d'un nucli un frame costa
+    el màxim dels dos, i amb un de sol la suma. Després de cada frame es torna
+    a estimar el que falta: si no hi cap, s'abaixa la fase on més s'estalvia
+    (res, si la codificació és el coll d'ampolla); si sobra marge, es torna a
+    pujar. Les fases protegides no baixen mai.
+    """
+
+    def __init__(self, deadline: float, phases, costs, protected: tuple = DEADLINE_PROTECTED_PHASES):
+        self.deadline = deadline
+        self.phases = np.asarray(phases)
+        self.costs = np.maximum(np.asarray(costs, dtype=np.float64), 1.0)
+        self.protected = protected
+        self.started = time.perf_counter()
+        self.levels = [0] * len(DEADLINE_PHASES)
+        self.rates = {}         # (fase, nivell) -> segons per unitat de cost
+        self.used = {}          # (fase, nivell) -> frames
+        self.changes = []       # (frame, fase, nivell anterior, nivell nou)
+        self.encode_args = None
+        self.encode = 0.0       # segons de codificació per frame
+        self.overlap = (os.cpu_count() or 1) > 1
+        self._remaining = [float(self.costs[self.phases == phase].sum()) for phase in range(len(DEADLINE_PHASES))]
+        self._frames_left = [int((self.phases == phase).sum()) for phase in range(len(DEADLINE_PHASES))]
+        self._frame = 0
+
+    def level(self, frame_num: int) -> int:
+        return self.levels[self.phases[frame_num]]
+
+    def record(self, frame_num: int, level: int, seconds: float, sample: bool = False):
+        """Temps de render d'un frame (sense codificar). Una mostra no es descompta del que falta."""
+        phase = int(self.phases[frame_num])
+        rate = seconds / self.costs[frame_num]
+        old = self.rates.get((phase, level))
+        self.rates[(phase, level)] = rate if old is None else old + (rate - old) * DEADLINE_SMOOTHING
+        if not sample:
+            self._remaining[phase] -= self.costs[frame_num]
+            self._frames_left[phase] -= 1
+            self.used[(phase, level)] = self.used.get((phase, level), 0) + 1
+            self._frame = frame_num + 1
+
+    def rate(self, phase: int, level: int) -> float:
+        """Cost mesurat o, si encara no n'hi ha, estimat des d'un altre nivell (de la mateixa fase si pot ser)."""
+        known = self.rates.get((phase, level))
+        if known is not None:
+            return known
+        measured = sorted(self.rates.items(), key=lambda item: item[0][0] != phase)
+        if not measured:
+            return 0.0
+        (_, other_level), rate = measured[0]
+        return rate * QUALITY_COST_PRIOR[level] / QUALITY_COST_PRIOR[other_level]
+
+    def estimate(self, levels: list = None) -> float:
+        """Segons que falten amb els nivells donats (per defecte, els actuals)."""
+        levels = levels or self.levels
+        total = 0.0
+        for phase, remaining in enumerate(self._remaining):
+            render = max(0.0, remaining) * self.rate(phase, levels[phase])
+            encode = self._frames_left[phase] * self.encode
+            total += max(render, encode) if self.overlap else render + encode
+        return total
+
+    def budget(self) -> float:
+        """Segons que queden per renderitzar (descomptat el marge per tancar l'encoder)."""
+        return self.deadline * (1 - DEADLINE_MARGIN) - (time.perf_counter() - self.started)
+
+    def fits(self) -> bool:
+        return self.estimate() <= self.budget()
+
+    def _set(self, phase: int, level: int):
+        self.changes.append((self._frame, phase, self.levels[phase], level))
+        self.levels[phase] = level
+
+    def replan(self):
+        """Ajusta els nivells de les fases que queden segons el temps disponible."""
+        budget = self.budget()
+        adjustable = [phase for phase in range(len(DEADLINE_PHASES))
+                      if phase not in self.protected and self._remaining[phase] > 0]
+
+        estimate = self.estimate()
+        while estimate > budget:
+            trials = []
+            for phase in adjustable:
+                if self.levels[phase] < len(QUALITY_LEVELS) - 1:
+                    trial = list(self.levels)
+                    trial[phase] += 1
+                    trials.append((self.estimate(trial), phase))
+            # Si la codificació és el coll d'ampolla, abaixar els efectes no estalvia res
+            if not trials or min(trials)[0] >= estimate:
+                break
+            estimate, phase = min(trials)
+            self._set(phase, self.levels[phase] + 1)
+
+        # Es puja primer la fase més degradada, amb marge per no oscil·lar
+        for phase in sorted(adjustable, key=lambda p: -self.levels[p]):
+            while self.levels[phase] > 0:
+                trial = list(self.levels)
+                trial[phase] -= 1
+                if self.estimate(trial) > budget * DEADLINE_UPGRADE_HEADROOM:
+                    break
+                self._set(phase, trial[phase])
+
+    def report(self) -> dict:
+        """Nivells usats per fase ({fase: {nivell: frames}}), preset i temps."""
+        phases = {}
+        for (phase, level), frames in sorted(self.used.items()):
+            phases.setdefault(DEADLINE_PHASES[phase], {})[QUALITY_LEVELS[level]["name"]] = frames
+        return {
+            "deadline": self.deadline,
+            "elapsed": time.perf_counter() - self.started,
+            "preset": _encode_preset(self.encode_args),
+            "phases": phases,
+            "changes": len(self.changes),
+        }
+
+
+def _encode_seconds(frames: list, size: tuple, fps: int, encode_args: list) -> float:
+    """Segons per frame que triga ffmpeg a codificar `frames` amb aquests paràmetres."""
+    with tempfile.TemporaryDirectory() as tmp:
+        encoder = FFmpegStreamEncoder(Path(tmp) / "mostra.mp4", size[0], size[1], fps, encode_args=encode_args)
+        start = time.perf_counter()
+        for frame in frames:
+            encoder.write(frame)
+        encoder.close()
+        return (time.perf_counter() - start) / max(1, len(frames))
+
+
+def deadline_scheduler(job: dict) -> DeadlineScheduler:
+    """
+    Planificador d'un job amb termini (`deadline`, segons). Abans de començar
+    renderitza uns quants frames de mostra de cada fase a qualitat alta (cada
+    un després del seu anterior, amb les caches com durant el render) i en
+    mesura la codificació. El preset de x264 és un per vídeo: es manté el del
+    job si, abaixant els efectes de les fases no protegides, el render hi cap;
+    si no, es prova el preset dels nivells següents.
+    """
+    ctx = job_render_context(job)
+    timeline = job_timeline(ctx, job)
+    scheduler = DeadlineScheduler(job["deadline"], timeline.phase, timeline.frame_costs())
+    prewarm_vinyl_labels(ctx, job)
+
+    samples = []
+    for phase in range(len(DEADLINE_PHASES)):
+        frames = np.flatnonzero(scheduler.phases == phase)
+        for k in range(min(DEADLINE_SAMPLE_FRAMES, len(frames))):
+            i = int(frames[len(frames) * (2 * k + 1) // (2 * DEADLINE_SAMPLE_FRAMES)])
+            if i > 0:
+                render_plan(ctx, plan_job_frame(ctx, i - 1, job), job)
+            start = time.perf_counter()
+            frame = render_plan(ctx, plan_job_frame(ctx, i, job), job)
+            samples.append((i, frame, time.perf_counter() - start))
+
+    presets = [None] + [level["preset"] for level in QUALITY_LEVELS[1:]]
+    for preset in presets:
+        scheduler.encode_args = _with_preset(job.get("encode_args"), preset)
+        scheduler.encode = _encode_seconds([frame for _, frame, _ in samples], (ctx.width, ctx.height),
+                                           job.get("fps", FPS), scheduler.encode_args)
+        scheduler.rates, scheduler.levels = {}, [0] * len(DEADLINE_PHASES)
+        for i, _, seconds in samples:
+            scheduler.record(i, 0, seconds, sample=True)
+        scheduler.replan()
+        if scheduler.fits():
+            break
+    scheduler.changes = []
+    return scheduler
+
+
+def iter_frames_deadline(job: dict, scheduler: DeadlineScheduler, worker_stats: dict = None):
+    """
+    Com iter_frames() en un sol procés, però cada frame es renderitza amb el
+    context del nivell de qualitat que toca a la seva fase. Només es mesura el
+    render: l'escriptura a l'encoder (el consumidor del generador) no hi compta.
+    """
+    base = job_render_context(job)
+    contexts = {}
+    renderer = FrameRenderer(base, job)
+    for i in range(job["total_frames"]):
+        level = scheduler.level(i)
+        if level not in contexts:
+            contexts[level] = get_render_context(scale=job.get("scale", 1.0),
+                                                 cheap_effects=job.get("cheap_effects", False), quality=level)
+        renderer.ctx = contexts[level]
+        start = time.perf_counter()
+        frame = renderer.render(i)
+        scheduler.record(i, level, time.perf_counter() - start)
+        yield i, frame
+        scheduler.replan()
+    if worker_stats is not None:
+        worker_stats[os.getpid()] = render_stats(base, job, renderer)
+
+
+def _print_deadline_stats(report: dict):
+    ok = report["elapsed"] <= report["deadline"]
+    print(f"   Termini: {report['deadline']:.1f}s, acabat en {report['elapsed']:.1f}s "
+          f"{'✅' if ok else '⚠️  fora de termini'} (preset x264: {report['preset']}, "
+          f"{report['changes']} canvis de nivell)")
+    for phase, levels in report["phases"].items():
+        used = ", ".join(f"{name} {frames}" for name, frames in levels.items())
+        print(f"      {phase:<12} {used}")
+
+
+# ============================================================================
+# SORTIDES MÚLTIPLES (un sol render, diversos formats)
+# ============================================================================
+
+# Formats addicionals al MP4 principal. width 0 = la del render; fps 0 = la del render
+OUTPUT_SINKS = {
+    "webm": {"ext": ".webm", "width": 720, "fps": 0, "crf": 34},
+    "gif": {"ext": ".gif", "width": 360, "fps": 12},
+    "webp": {"ext": ".webp", "width": 480, "fps": 15, "quality": 70},
+    "poster": {"ext": ".jpg", "width": 0, "at": 1.0, "quality": 90},   # at: posició a la línia de temps (0-1)
+}
+
+
+def parse_output_spec(spec: str) -> dict:
+    """'format[:clau=valor,...]' (p. ex. 'gif:width=480,fps=10') → paràmetres de la sortida."""
+    kind, _, params = spec.partition(":")
+    if kind not in OUTPUT_SINKS:
+        raise ValueError(f"Format desconegut: {kind} (disponibles: {', '.join(OUTPUT_SINKS)})")
+    sink = {"kind": kind, **OUTPUT_SINKS[kind]}
+    for item in filter(None, params.split(",")):
+        key, sep, value = item.partition("=")
+        if not sep or key not in sink or key in ("kind", "ext"):
+            raise ValueError(f"Paràmetre no vàlid per a {kind}: {item}")
+        try:
+            sink[key] = float(value) if key == "at" else int(value)
+        except ValueError:
+            raise ValueError(f"Valor no vàlid per a {kind}: {item}")
+        if sink[key] < 0 or (key == "at" and sink[key] > 1):
+            raise ValueError(f"Valor fora de rang per a {kind}: {item}")
+    return sink
+
+
+def sink_encode_args(sink: dict, width: int, frame_width: int) -> list:
+    """Paràmetres d'ffmpeg d'una sortida (l'escalat el fa ffmpeg, fora del fil de render)."""
+    filters = [] if width == frame_width else [f"scale={width}:-2:flags=lanczos"]
+    if sink["kind"] == "gif":
+        # Paleta pròpia del clip (palettegen necessita tots els frames abans d'escriure)
+        graph = ",".join(filters + ["split[a][b]"])
+        return ["-vf", f"{graph};[a]palettegen=stats_mode=diff[p];[b][p]paletteuse=dither=bayer:bayer_scale=5",
+                "-loop", "0"]
+
+    args = ["-vf", ",".join(filters)] if filters else []
+    if sink["kind"] == "webm":
+        return args + ["-c:v", "libvpx-vp9", "-b:v", "0", "-crf", str(sink["crf"]),
+                       "-row-mt", "1", "-deadline", "good", "-cpu-used", "4", "-pix_fmt", "yuv420p"]
+    return args + ["-c:v", "libwebp_anim", "-q:v", str(sink["quality"]), "-loop", "0", "-pix_fmt", "yuv420p"]
+
+
+class OutputSink:
+    """
+    Una sortida addicional alimentada amb els mateixos frames que el MP4
+    principal: un ffmpeg propi (resolució, fps delmats i qualitat propis) o,
+    per al pòster, un JPEG del frame de la posició demanada.
+    """
+
+    def __init__(self, sink: dict, path: Path, fps: int, total_frames: int, frame_size: tuple):
+        self.kind = sink["kind"]
+        self.path = path
+        self.source_fps = fps
+        self.frames = 0
+        self.seconds = 0.0          # temps del fil de render dedicat a aquesta sortida
+        self.close_seconds = 0.0    # espera al final, després de l'últim frame
+        self.ok = True
+
+        frame_width, frame_height = frame_size
+        width = min(sink["width"] or frame_width, frame_width)
+        self.width = width - width % 2
+        if self.kind == "poster":
+            self.quality = sink["quality"]
+            self.frame_index = int(round(sink["at"] * (total_frames - 1)))
+            self.encoder = None
+        else:
+            self.fps = min(sink["fps"] or fps, fps)
+            self.encoder = FFmpegStreamEncoder(path, frame_width, frame_height, self.fps, queue_size=4,
+                                               encode_args=sink_encode_args(sink, self.width, frame_width))
+
+    def wants(self, frame_num: int) -> bool:
+        """Si el frame entra a aquesta sortida (delmat per fps o frame del pòster)."""
+        if self.encoder is None:
+            return frame_num == self.frame_index
+        if frame_num == 0:
+            return True
+        return int(frame_num * self.fps / self.source_fps) != int((frame_num - 1) * self.fps / self.source_fps)
+
+    def write(self, frame_num: int, frame: Image.Image):
+        if not self.wants(frame_num):
+            return
+        started = time.perf_counter()
+        if self.encoder is not None:
+            self.encoder.write(frame)
+        else:
+            poster = frame if frame.mode == 'RGB' else frame.convert('RGB')
+            if poster.width != self.width:
+                height = int(round(poster.height * self.width / poster.width))
+                poster = poster.resize((self.width, height), Image.Resampling.LANCZOS)
+            poster.save(self.path, "JPEG", quality=self.quality, optimize=True, progressive=True)
+        self.frames += 1
+        self.seconds += time.perf_counter() - started
+
+    def close(self) -> bool:
+        started = time.perf_counter()
+        if self.encoder is not None:
+            self.ok = self.encoder.close()
+            if not self.ok:
+                print(f"❌ Error ffmpeg ({self.kind}): {self.encoder.stderr}")
+        else:
+            self.ok = self.path.exists()
+        self.close_seconds = time.perf_counter() - started
+        return self.ok
+
+
+def job_sinks(job: dict, output_path: Path) -> list:
+    """Sortides addicionals d'un job (`outputs`), amb noms derivats del MP4 principal."""
+    ctx = job_render_context(job)
+    sinks, used = [], set()
+    for sink in job.get("outputs") or []:
+        suffix = "_poster" if sink["kind"] == "poster" else ""
+        path = output_path.with_name(f"{output_path.stem}{suffix}{sink['ext']}")
+        n = 2
+        while path in used:
+            path = output_path.with_name(f"{output_path.stem}{suffix}_{n}{sink['ext']}")
+            n += 1
+        used.add(path)
+        sinks.append(OutputSink(sink, path, job.get("fps", FPS), job["total_frames"], (ctx.width, ctx.height)))
+    return sinks
+
+
+def _print_sink_stats(sinks: list):
+    if not sinks:
+        return
+    print("   Sortides addicionals (mateix render):")
+    for sink in sinks:
+        size = f"{sink.path.stat().st_size / (1024 * 1024):6.1f} MB" if sink.ok else "  error  "
+        print(f"      {sink.kind:<6} {size}  {sink.frames:>5} frames  "
+              f"render +{sink.seconds:5.2f}s  final +{sink.close_seconds:5.2f}s  {sink.path.name}")
+
+
+def stream_video(job: dict, output_name: str, workers: int = 1) -> Path:
+    """Renderitza i codifica alhora, sense passar per PNG a disc."""
+    output_path = OUTPUT_DIR / output_name
+    total_frames = job["total_frames"]
+    fps = job.get("fps", FPS)
+
+    if shutil.which("ffmpeg") is None:
+        print("❌ ffmpeg no trobat")
+        return None
+
+    print(f"🎥 Renderitzant i codificant amb ffmpeg (streaming)...")
+    if workers > 1:
+        print(f"   Workers: {workers}")
+
+    scheduler = None
+    if job.get("deadline"):
+        print(f"   Termini: {job['deadline']:g}s (qualitat adaptativa; la revelació sempre alta)")
+        scheduler = deadline_scheduler(job)
+        job = {**job, "encode_args": scheduler.encode_args}
+
+    encoder = job_encoder(job, output_path)
+    sinks = job_sinks(job, output_path)
+    worker_stats = {}
+    if scheduler is not None:
+        frames = iter_frames_deadline(job, scheduler, worker_stats)
+    else:
+        frames = iter_frames(job, workers, worker_stats)
+    for i, frame in frames:
+        with span("encode", frame=i):
+            encoder.write(frame)
+            for sink in sinks:
+                sink.write(i, frame)
+        if (i + 1) % fps == 0 or i == total_frames - 1:
+            _print_progress(i + 1, total_frames)
+
+    ok = encoder.close()
+    for sink in sinks:
+        sink.close()
+    _print_render_stats(_merge_stats(worker_stats))
+    if isinstance(encoder, SegmentedEncoder):
+        _print_segment_stats(encoder.stats())
+    _print_sink_stats(sinks)
+    if scheduler is not None:
+        _print_deadline_stats(scheduler.report())
+
+    if not ok:
+        print(f"❌ Error ffmpeg: {encoder.stderr}")
+        return None
+
+    print(f"✅ Vídeo creat: {output_path}")
+    size_mb = output_path.stat().st_size / (1024 * 1024)
+    print(f"   Mida: {size_mb:.1f} MB")
+    return output_path
+
+
+def render_promo(
+    featured_album_id: str,
+    session_info: dict,
+    output_name: str,
+    duration: float = 10.0,
+    workers: int = 1,
+    png_frames: bool = False,
+    frames_dir: Path = None,
+    options: dict = None
+) -> Path:
+    """
+    Renderitza un promo complet (streaming per defecte, PNG en mode depuració).
+    Els PNG del directori propi del job s'esborren quan el vídeo és a disc;
+    els d'un `frames_dir` explícit es conserven.
+    """
+    if png_frames:
+        options = options or {}
+        fps = options.get("fps", FPS)
+        segment_encoder = None
+        if options.get("segment_frames"):
+            width, height = frame_size(options.get("scale", 1.0))
+            segment_encoder = SegmentedEncoder(OUTPUT_DIR / output_name, width, height, fps,
+                                               options["segment_frames"], options.get("encode_args"))
+        job_dir = generate_all_frames(
+            featured_album_id=featured_album_id,
+            session_info=session_info,
+            duration=duration,
+            workers=workers,
+            frames_dir=frames_dir,
+            options=options,
+            segment_encoder=segment_encoder
+        )
+        if segment_encoder is not None:
+            video_path = finish_segmented_video(segment_encoder)
+        else:
+            video_path = create_video_from_frames(job_dir, output_name, fps=fps,
+                                                  encode_args=options.get("encode_args"))
+        if video_path is not None and frames_dir is None:
+            shutil.rmtree(job_dir, ignore_errors=True)
+        return video_path
+
+    job = prepare_render_job(featured_album_id, session_info, duration=duration, options=options)
+    return stream_video(job, output_name, workers=workers)
+
+
+# ============================================================================
+# MODE CAMPANYA (un vídeo per sessió a partir d'un manifest)
+# ============================================================================
+
+def default_output_name(album_id: str, date: str) -> str:
+    title = get_catalog().info(album_id).get("title", album_id)
+    slug = "".join(c if c.isalnum() else "_" for c in f"{title}_{date}".lower())
+    return f"{'_'.join(filter(None, slug.split('_')))}_ruleta.mp4"
+
+
+def draft_output_name(output_name: str) -> str:
+    """Nom de sortida d'un esborrany (no sobreescriu el render final)."""
+    path = Path(output_name)
+    return str(path.with_name(f"{path.stem}_draft{path.suffix}"))
+
+
+def load_manifest(path: Path) -> list:
+    """
+    Llegeix un manifest de jobs (JSON o CSV) amb camps album_id, date, time
+    i output_name (opcional). Accepta també les claus camelCase de l'app Next.js.
+    """
+    if path.suffix.lower() == ".csv":
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+    else:
+        with open(path, encoding="utf-8") as f:
+            rows = json.load(f)
+        if isinstance(rows, dict):
+            rows = rows.get("jobs") or rows.get("sessions") or []
+
+    entries = []
+    for n, row in enumerate(rows, start=1):
+        album_id = (row.get("album_id") or row.get("albumId") or "").strip()
+        if not album_id:
+            raise ValueError(f"{path}: l'entrada {n} no té album_id")
+        date = (row.get("date") or "").strip()
+        entries.append({
+            "album_id": album_id,
+            "date": date,
+            "time": (row.get("time") or "").strip(),
+            "output_name": (row.get("output_name") or row.get("outputName") or "").strip()
+                           or default_output_name(album_id, date),
+        })
+    return entries
+
+
+def run_batch_job(entry: dict, duration: float, workers: int, png_frames: bool, options: dict = None) -> dict:
+    """Executa un job del manifest i en retorna el resultat amb el temps."""
+    started = time.perf_counter()
+    if (options or {}).get("draft"):
+        entry = {**entry, "output_name": draft_output_name(entry["output_name"])}
+    result = {**entry, "ok": False, "path": None, "error": None}
+
+    try:
+        if entry["album_id"] not in available_covers(COVERS_DIR):
+            raise FileNotFoundError(f"No es troba la portada de {entry['album_id']}")
+
+        path = render_promo(
+            entry["album_id"],
+            {"date": entry["date"], "time": entry["time"]},
+            entry["output_name"],
+            duration=duration,
+            workers=workers,
+            png_frames=png_frames,
+            options=options
+        )
+        result["ok"] = path is not None
+        result["path"] = str(path) if path else None
+        if path is None:
+            result["error"] = "ffmpeg"
+    except Exception as e:
+        result["error"] = str(e)
+
+    result["seconds"] = time.perf_counter() - started
+    return result
+
+
+def run_batch(
+    manifest_path: Path,
+    duration: float = 10.0,
+    workers: int = 1,
+    jobs: int = 1,
+    png_frames: bool = False,
+    options: dict = None
+) -> list:
+    """
+    Renderitza tots els jobs d'un manifest en un sol procés (o en un pool de
+    `jobs` processos). Les caches i capes estàtiques es comparteixen entre jobs.
+    """
+    entries = load_manifest(manifest_path)
+    print(f"📋 Manifest: {manifest_path} ({len(entries)} jobs)")
+    started = time.perf_counter()
+
+    if jobs > 1:
+        # L'atles es construeix abans de crear el pool (els processos només el mapegen)
+        if (options or {}).get("cover_atlas"):
+            use_cover_atlas(options["cover_atlas"], build=True)
+        results = [None] * len(entries)
+        with ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=warm_render_worker,
+            initargs=(warm_album_ids([entry["album_id"] for entry in entries], options), options)
+        ) as pool:
+            futures = {
+                pool.submit(run_batch_job, entry, duration, 1, png_frames, options): n
+                for n, entry in enumerate(entries)
+            }
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+    else:
+        results = [run_batch_job(entry, duration, workers, png_frames, options) for entry in entries]
+
+    total = time.perf_counter() - started
+    print_batch_summary(results, total)
+
+    report_path = OUTPUT_DIR / f"batch_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump({"manifest": str(manifest_path), "seconds": total, "jobs": results},
+                  f, ensure_ascii=False, indent=2)
+    print(f"   Informe: {report_path}")
+
+    return results
+
+
+def print_batch_summary(results: list, total_seconds: float):
+    print("\n" + "=" * 60)
+    print("📊 RESUM DE LA CAMPANYA")
+    print("=" * 60)
+    for r in results:
+        status = "✅" if r["ok"] else "❌"
+        detail = r["path"] if r["ok"] else r["error"]
+        print(f"{status} {r['output_name']:<40} {r['seconds']:7.1f}s  {detail}")
+
+    ok = sum(1 for r in results if r["ok"])
+    print("-" * 60)
+    print(f"   {ok}/{len(results)} vídeos en {total_seconds:.1f}s")
+
+
+def add_render_args(parser: argparse.ArgumentParser):
+    """Opcions de render d'un vídeo (les comparteixen el generador i el dimoni)."""
+    parser.add_argument("--duration", type=float, default=10.0,
+                        help="Durada del vídeo en segons (per defecte: 10)")
+    parser.add_argument("--compositor", choices=COMPOSITORS, default="pil",
+                        help="Backend de composició: pil (referència) o numpy (buffer preassignat)")
+    parser.add_argument("--catalog", type=Path, default=os.environ.get("PROMO_CATALOG") or None,
+                        help="Catàleg d'àlbums exportat (JSON, NDJSON de Sanity o SQLite) en lloc de "
+                             "l'integrat (per defecte: $PROMO_CATALOG)")
+    parser.add_argument("--sequence-filter", metavar="CRITERIS",
+                        help="Tria els discos de la ruleta del catàleg: p. ex. 'genre' o 'decade' (els del "
+                             "destacat), 'genre,decade' o 'genre=jazz' (el gènere ve del catàleg exportat)")
+    parser.add_argument("--sequence-seed", type=int, default=SEQUENCE_SEED,
+                        help=f"Llavor del sorteig dels discos de la ruleta (per defecte: {SEQUENCE_SEED})")
+    parser.add_argument("--cover-atlas", nargs="?", type=Path, const=COVER_ATLAS_DIR,
+                        help="Llegeix les portades d'un atles descodificat i mapejat a memòria, compartit "
+                             f"entre processos (per defecte: {COVER_ATLAS_DIR})")
+    parser.add_argument("--frame-cache", nargs="?", type=Path, const=FRAME_CACHE_DIR,
+                        help=f"Reutilitza frames sense canvis d'un render anterior (per defecte: {FRAME_CACHE_DIR})")
+    parser.add_argument("--frame-cache-mb", type=int, default=FRAME_CACHE_MAX_BYTES // (1024 * 1024),
+                        help="Mida màxima de la cache de frames en MB")
+    parser.add_argument("--full-frames", action="store_true",
+                        help="Renderitza cada frame sencer (sense duplicats ni regions modificades)")
+    parser.add_argument("--scale", type=float, default=1.0,
+                        help="Escala de la sortida respecte de 1080x1920 (p. ex. 2 per a un màster 2160x3840)")
+    parser.add_argument("--tile-mb", type=int,
+                        help="Memòria màxima del render (MB): compon cada frame per franges horitzontals "
+                             "i hi ajusta les caches de portades i sprites")
+    parser.add_argument("--draft", nargs="?", type=float, const=0.5, metavar="ESCALA",
+                        help="Esborrany ràpid a aquesta escala (per defecte: 0.5), menys fps i "
+                             "efectes simplificats; mateixa línia de temps que el render final")
+    parser.add_argument("--draft-fps", type=int, default=15,
+                        help="Amb --draft: fotogrames per segon de l'esborrany (per defecte: 15)")
+    parser.add_argument("--full-effects", action="store_true",
+                        help="Amb --draft: manté els blurs i glows del render final")
+    parser.add_argument("--deadline", type=float, metavar="SEGONS",
+                        help="Temps màxim de render: abaixa els efectes (blurs, glows, ombres, escalat, "
+                             "preset de x264) de les fases que calgui per acabar a temps; la revelació "
+                             "es manté a qualitat alta")
+    parser.add_argument("--vinyl-rpm", type=float, default=VINYL_RPM, metavar="RPM",
+                        help="Velocitat de gir del vinil durant la revelació (per defecte: 33⅓; 0: quiet)")
+    parser.add_argument("--segments", nargs="?", type=float, const=SEGMENT_SECONDS, metavar="SEGONS",
+                        help=f"Codifica en segments d'aquesta durada (per defecte: {SEGMENT_SECONDS:g}s) "
+                             "en paral·lel amb el render i els concatena sense recodificar")
+    parser.add_argument("--output", action="append", default=[], metavar="FORMAT[:clau=valor,...]",
+                        help="Sortida addicional del mateix render (repetible): "
+                             + ", ".join(f"{kind} ({', '.join(f'{k}={v}' for k, v in sink.items() if k != 'ext')})"
+                                         for kind, sink in OUTPUT_SINKS.items()))
+
+
+def check_render_args(parser: argparse.ArgumentParser, args: argparse.Namespace):
+    """Valida les opcions d'add_render_args (surt amb parser.error si no ho són)."""
+    if args.draft is not None and not 0 < args.draft <= 1:
+        parser.error("--draft ha de ser una escala entre 0 i 1")
+    if args.scale <= 0:
+        parser.error("--scale ha de ser positiva")
+    if args.draft is not None and args.scale != 1.0:
+        parser.error("--draft i --scale no es poden combinar")
+    if args.tile_mb is not None:
+        try:
+            memory_budget(*frame_size(args.draft or args.scale), args.tile_mb * 1024 * 1024)
+        except ValueError as e:
+            parser.error(f"--tile-mb: {e}")
+    if args.tile_mb is not None and args.compositor != "pil":
+        parser.error("--tile-mb només funciona amb el compositor pil")
+    if args.draft_fps < 1:
+        parser.error("--draft-fps ha de ser positiu")
+    if args.sequence_filter is not None:
+        try:
+            parse_sequence_filter(args.sequence_filter)
+        except ValueError as e:
+            parser.error(f"--sequence-filter: {e}")
+    if args.deadline is not None and args.deadline <= 0:
+        parser.error("--deadline ha de ser positiu")
+    if args.vinyl_rpm < 0:
+        parser.error("--vinyl-rpm no pot ser negatiu")
+    if args.segments is not None and args.segments <= 0:
+        parser.error("--segments ha de ser una durada positiva")
+    for spec in args.output:
+        try:
+            parse_output_spec(spec)
+        except ValueError as e:
+            parser.error(f"--output: {e}")
+
+
+def parse_args(argv: list = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Generador de vídeos promocionals (ruleta)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processos per renderitzar frames en paral·lel (per defecte: 1)")
+    parser.add_argument("--png-frames", action="store_true",
+                        help="Mode depuració: desa els frames com a PNG i codifica després (s'esborren "
+                             "quan el vídeo és a disc; un render interromput es reprèn amb --resume)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Amb --png-frames: conserva els frames acabats d'un render interromput "
+                             "(segons el diari del directori de frames) i només renderitza la resta")
+    parser.add_argument("--manifest", type=Path,
+                        help="Manifest JSON/CSV de sessions (album_id, date, time, output_name)")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Amb --manifest: vídeos a renderitzar alhora (per defecte: 1)")
+    add_render_args(parser)
+    parser.add_argument("--trace", type=Path,
+                        help="Traça els trams del render: JSON de Chrome en aquest fitxer i taula resum")
+    args = parser.parse_args(argv)
+    check_render_args(parser, args)
+
+    if args.jobs > 1 and args.workers > 1:
+        parser.error("--jobs i --workers no es poden combinar")
+    if args.jobs > 1 and args.trace:
+        parser.error("--trace no es pot combinar amb --jobs")
+    if args.deadline is not None and (args.workers > 1 or args.png_frames):
+        parser.error("--deadline només funciona en streaming amb un sol procés (sense --workers "
+                     "ni --png-frames)")
+    if args.resume and not args.png_frames:
+        parser.error("--resume només funciona amb --png-frames")
+    if args.output and args.png_frames:
+        parser.error("--output només funciona en mode streaming (sense --png-frames)")
+    return args
+
+
+def render_options(args: argparse.Namespace) -> dict:
+    """Opcions de render (les que viatgen amb cada job) a partir dels arguments."""
+    options = {"compositor": args.compositor}
+    if args.full_frames:
+        options["incremental"] = False
+    if args.scale != 1.0:
+        options["scale"] = args.scale
+    if args.tile_mb is not None:
+        options["tile_bytes"] = args.tile_mb * 1024 * 1024
+    if args.draft is not None:
+        options.update({
+            "draft": True,
+            "scale": args.draft,
+            "fps": args.draft_fps,
+            "cheap_effects": not args.full_effects,
+            "encode_args": x264_args("ultrafast", 28),
+        })
+    if args.deadline is not None:
+        options["deadline"] = args.deadline
+    if args.vinyl_rpm != VINYL_RPM:
+        options["timeline"] = {"vinyl_rpm": args.vinyl_rpm}
+    if args.segments is not None:
+        options["segment_frames"] = max(1, int(round(args.segments * options.get("fps", FPS))))
+    if args.output:
+        options["outputs"] = [parse_output_spec(spec) for spec in args.output]
+    if args.catalog:
+        options["catalog"] = str(args.catalog)
+    if args.sequence_filter:
+        options["sequence_filter"] = parse_sequence_filter(args.sequence_filter)
+    if args.sequence_seed != SEQUENCE_SEED:
+        options["sequence_seed"] = args.sequence_seed
+    if args.cover_atlas:
+        options["cover_atlas"] = str(args.cover_atlas)
+    if args.frame_cache:
+        options["frame_cache"] = str(args.frame_cache)
+        options["frame_cache_max_bytes"] = args.frame_cache_mb * 1024 * 1024
+    return options
+
+
+def write_trace(tracer: Tracer, path: Path):
+    """Desa la traça en format Chrome i n'imprimeix l'agregat per tram."""
+    path = tracer.write_chrome_trace(path)
+    print("\n🔬 Trams del render:")
+    print(tracer.format_table())
+    print(f"   Traça: {path} (chrome://tracing o ui.perfetto.dev)")
+
+
 def main():
+    args = parse_args()
+    options = render_options(args)
+    if args.resume:
+        options["resume"] = True
+    if args.trace:
+        options["trace"] = True
+    tracer = Tracer() if args.trace else None
+    set_tracer(tracer)
+
     print("=" * 60)
     print("🎰 SOUND DELUXE - Generador de Vídeos RULETA v2")
     print("=" * 60)
 
+    if args.catalog:
+        try:
+            use_catalog(args.catalog)
+        except (OSError, ValueError) as e:
+            print(f"❌ Catàleg il·legible: {e}")
+            sys.exit(1)
+
     OUTPUT_DIR.mkdir(exist_ok=True)
 
-    featured_album = "NJZLoMez4714Sf01dGtBMx"
-    session = {
-        "date": "Divendres 17 Gener 2025",
-        "time": "19:30h"
-    }
+    if args.manifest:
+        run_batch(args.manifest, duration=args.duration, workers=args.workers,
+                  jobs=args.jobs, png_frames=args.png_frames, options=options)
+        if tracer is not None:
+            write_trace(tracer, args.trace)
+        return
 
-    album_info = ALBUMS_DATA.get(featured_album, {})
+    featured_album = FEATURED_ALBUM
+    session = FEATURED_SESSION
+
+    album_info = get_catalog().info(featured_album)
     print(f"\n📀 Àlbum destacat: {album_info.get('artist')} - {album_info.get('title')}")
 
     cover_path = COVERS_DIR / f"{featured_album}.jpg"
@@ -662,15 +4476,23 @@ def main():
         print(f"❌ No es troba la portada: {cover_path}")
         return
 
-    frames_dir = generate_all_frames(
-        featured_album_id=featured_album,
-        session_info=session,
-        duration=10.0
-    )
-
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     output_name = f"thriller_ruleta_{timestamp}.mp4"
-    video_path = create_video_from_frames(frames_dir, output_name)
+    if options.get("draft"):
+        output_name = draft_output_name(output_name)
+
+    video_path = render_promo(
+        featured_album,
+        session,
+        output_name,
+        duration=args.duration,
+        workers=args.workers,
+        png_frames=args.png_frames,
+        options=options
+    )
+
+    if tracer is not None:
+        write_trace(tracer, args.trace)
 
     if video_path:
         print("\n" + "=" * 60)
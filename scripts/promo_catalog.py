@@ -0,0 +1,296 @@
+"""
+Sound Deluxe - Catàleg d'àlbums dels vídeos promocionals
+========================================================
+Catàleg d'àlbums (l'integrat o un export de Sanity en JSON, NDJSON o SQLite)
+amb índexs per artista, gènere i dècada, i el sorteig amb llavor dels discos
+de la ruleta. El fa servir generate_promo_video.py.
+"""
+
+import contextlib
+import json
+import os
+import random
+import sqlite3
+import time
+from pathlib import Path
+from typing import Optional
+
+# Catàleg integrat (el real s'exporta de Sanity: veure use_catalog()). No té
+# gèneres: el filtre per gènere necessita un catàleg exportat
+ALBUMS_DATA = {
+    "GZA8SAwsKh0Q7JjyWiSjNC": {"artist": "Pink Floyd", "title": "The Dark Side of the Moon", "year": 1973},
+    "GZA8SAwsKh0Q7JjyWiSjtK": {"artist": "Miles Davis", "title": "Kind of Blue", "year": 1959},
+    "GZA8SAwsKh0Q7JjyWiSkPS": {"artist": "Marvin Gaye", "title": "What's Going On", "year": 1971},
+    "GZA8SAwsKh0Q7JjyWiSlNh": {"artist": "The Velvet Underground", "title": "The Velvet Underground & Nico", "year": 1967},
+    "GZA8SAwsKh0Q7JjyWiSldl": {"artist": "Led Zeppelin", "title": "Led Zeppelin IV", "year": 1971},
+    "GZA8SAwsKh0Q7JjyWiSniH": {"artist": "Miles Davis", "title": "Bitches Brew", "year": 1970},
+    "GZA8SAwsKh0Q7JjyWiSp0b": {"artist": "Guns N' Roses", "title": "Appetite for Destruction", "year": 1987},
+    "GZA8SAwsKh0Q7JjyWiSpup": {"artist": "The Smiths", "title": "The Queen is Dead", "year": 1986},
+    "NJZLoMez4714Sf01dGtBMx": {"artist": "Michael Jackson", "title": "Thriller", "year": 1982},
+    "NJZLoMez4714Sf01dGtDAF": {"artist": "John Coltrane", "title": "A Love Supreme", "year": 1965},
+    "NJZLoMez4714Sf01dGtDwd": {"artist": "Amy Winehouse", "title": "Back to Black", "year": 2006},
+    "NJZLoMez4714Sf01dGtEFz": {"artist": "Lauryn Hill", "title": "The Miseducation of Lauryn Hill", "year": 1998},
+    "NJZLoMez4714Sf01dGtFC3": {"artist": "Daft Punk", "title": "Random Access Memories", "year": 2013},
+    "NJZLoMez4714Sf01dGtFyR": {"artist": "The Clash", "title": "London Calling", "year": 1979},
+    "NJZLoMez4714Sf01dGtGHn": {"artist": "Bruce Springsteen", "title": "Born to Run", "year": 1975},
+    "g1ucGbtbcNDpm5pEnR5nd1": {"artist": "The Beatles", "title": "Abbey Road", "year": 1969},
+    "g1ucGbtbcNDpm5pEnR5ov1": {"artist": "The Beach Boys", "title": "Pet Sounds", "year": 1966},
+    "g1ucGbtbcNDpm5pEnR5pF1": {"artist": "Radiohead", "title": "OK Computer", "year": 1997},
+    "g1ucGbtbcNDpm5pEnR5pP1": {"artist": "U2", "title": "The Joshua Tree", "year": 1987},
+    "g1ucGbtbcNDpm5pEnR5po1": {"artist": "Joni Mitchell", "title": "Blue", "year": 1971},
+    "g1ucGbtbcNDpm5pEnR5qm1": {"artist": "Fleetwood Mac", "title": "Rumours", "year": 1977},
+}
+
+# Discos de la ruleta (el destacat inclòs); la seqüència es repeteix en bucle
+ROULETTE_ALBUMS = 21
+SEQUENCE_SEED = 42          # Reproducibilitat: mateixa llavor, mateixa ruleta
+SEQUENCE_FILTER_FIELDS = ("artist", "genre", "decade")
+
+
+def _catalog_key(value) -> Optional[str]:
+    """Clau d'índex d'un artista o gènere (sense majúscules ni espais sobrants)."""
+    if value is None:
+        return None
+    value = " ".join(str(value).split()).casefold()
+    return value or None
+
+
+def _decade_key(value) -> Optional[int]:
+    """Dècada d'un any (1973, "1973", "1970s" -> 1970), o None."""
+    try:
+        return int(str(value).strip().rstrip("sS")) // 10 * 10
+    except (TypeError, ValueError):
+        return None
+
+
+class AlbumCatalog:
+    """
+    Catàleg d'àlbums {id: {artist, title, year, genre}}. Cada índex (per
+    artista, gènere o dècada) es construeix la primera vegada que es filtra per ell.
+    """
+
+    def __init__(self, albums: dict, source: str = None):
+        self.albums = albums
+        self.source = source
+        self._indexes = {}
+
+    def __len__(self) -> int:
+        return len(self.albums)
+
+    def __contains__(self, album_id) -> bool:
+        return album_id in self.albums
+
+    def ids(self) -> list:
+        return list(self.albums)
+
+    def info(self, album_id: str) -> dict:
+        """Dades de l'àlbum ({} si no hi és)."""
+        return self.albums.get(album_id, {})
+
+    def key(self, album_id: str, field: str):
+        """Clau d'índex de l'àlbum per a `field` (artist, genre o decade)."""
+        info = self.info(album_id)
+        if field == "decade":
+            return _decade_key(info.get("year"))
+        return _catalog_key(info.get(field))
+
+    def index(self, field: str) -> dict:
+        """{clau: [ids en ordre del catàleg]} per a `field` (es construeix en el primer ús)."""
+        index = self._indexes.get(field)
+        if index is None:
+            source, key = ("year", _decade_key) if field == "decade" else (field, _catalog_key)
+            index = {}
+            for album_id, info in self.albums.items():
+                value = info.get(source)
+                if value is not None:
+                    value = key(value)
+                    if value is not None:
+                        index.setdefault(value, []).append(album_id)
+            self._indexes[field] = index
+        return index
+
+    def matching(self, featured_album_id: str, sequence_filter: dict) -> list:
+        """
+        Àlbums que compleixen tots els criteris del filtre (veure
+        parse_sequence_filter()), en ordre del catàleg. Un criteri sense valor
+        vol dir "el mateix que el destacat".
+        """
+        selected = None
+        for field, value in sequence_filter.items():
+            if value is None:
+                value = self.key(featured_album_id, field)
+            else:
+                value = _decade_key(value) if field == "decade" else _catalog_key(value)
+            ids = self.index(field).get(value, [])
+            if selected is None:
+                selected = ids
+            else:
+                ids = set(ids)
+                selected = [album_id for album_id in selected if album_id in ids]
+        return list(self.albums) if selected is None else selected
+
+
+def load_catalog(path: Path) -> AlbumCatalog:
+    """
+    Carrega un catàleg exportat: JSON ({id: dades}, una llista d'objectes amb
+    `_id` o `id`, o la resposta d'una consulta a Sanity amb `result`), NDJSON
+    (`sanity dataset export`: només els documents `album` publicats) o SQLite
+    (taula `albums` amb columnes id, artist, title, year, genre). Un fitxer
+    il·legible dona ValueError (o OSError si no es pot obrir).
+    """
+    path = Path(path)
+    if path.suffix.lower() in (".sqlite", ".sqlite3", ".db"):
+        try:
+            with contextlib.closing(sqlite3.connect(f"file:{path}?mode=ro", uri=True)) as db:
+                db.row_factory = sqlite3.Row
+                records = [dict(row) for row in db.execute("SELECT * FROM albums")]
+        except sqlite3.Error as e:
+            raise ValueError(f"{path}: {e}") from e
+    elif path.suffix.lower() == ".ndjson":
+        records = []
+        with open(path, encoding="utf-8") as f:
+            for line_num, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if not isinstance(record, dict) or record.get("_type") != "album":
+                    continue
+                if not isinstance(record.get("_id"), str):
+                    print(f"   ⚠️  {path}:{line_num}: àlbum sense _id, s'omet")
+                    continue
+                if not record["_id"].startswith("drafts."):
+                    records.append(record)
+    else:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict) and "result" in data:
+            data = data["result"]
+        if isinstance(data, dict):
+            return AlbumCatalog(data, source=str(path))
+        records = data
+
+    albums = {}
+    for record in records:
+        album_id = record.get("_id") or record.get("id") if isinstance(record, dict) else None
+        if not album_id:
+            print(f"   ⚠️  {path}: registre sense id, s'omet: {str(record)[:80]}")
+            continue
+        albums[str(album_id)] = record
+    return AlbumCatalog(albums, source=str(path))
+
+
+_catalog = None
+_catalog_signature = None
+
+
+def get_catalog() -> AlbumCatalog:
+    """
+    Catàleg del procés: el de use_catalog(), el de PROMO_CATALOG o, si no
+    n'hi ha cap, el catàleg integrat (ALBUMS_DATA).
+    """
+    if _catalog is None:
+        return use_catalog(os.environ.get("PROMO_CATALOG") or None)
+    return _catalog
+
+
+def use_catalog(path: Path = None) -> AlbumCatalog:
+    """
+    Fa servir el catàleg exportat a `path` (None: l'integrat). Només es torna a
+    llegir si el fitxer ha canviat, de manera que un procés de llarga durada
+    (dimoni, workers) veu les actualitzacions setmanals sense reiniciar-se.
+    """
+    global _catalog, _catalog_signature
+    if path is None:
+        if _catalog is None or _catalog.source is not None:
+            _catalog, _catalog_signature = AlbumCatalog(ALBUMS_DATA), None
+        return _catalog
+
+    path = Path(path)
+    try:
+        st = path.stat()
+    except OSError:
+        raise FileNotFoundError(f"No es troba el catàleg: {path}") from None
+    signature = [str(path), st.st_mtime_ns, st.st_size]
+    if _catalog is None or _catalog_signature != signature:
+        start = time.perf_counter()
+        _catalog = load_catalog(path)
+        _catalog_signature = signature
+        print(f"📚 Catàleg: {path} ({len(_catalog)} àlbums, {(time.perf_counter() - start) * 1000:.0f} ms)")
+    return _catalog
+
+
+_available_covers = {}
+
+
+def available_covers(covers_dir: Path) -> frozenset:
+    """
+    Àlbums amb portada (JPEG) al directori, amb un sol recorregut. El resultat
+    es reutilitza mentre el directori no canviï (mtime).
+    """
+    covers_dir = Path(covers_dir)
+    try:
+        mtime = covers_dir.stat().st_mtime_ns
+    except OSError:
+        return frozenset()
+    cached = _available_covers.get(str(covers_dir))
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with os.scandir(covers_dir) as entries:
+        ids = frozenset(entry.name[:-4] for entry in entries if entry.name.endswith(".jpg") and entry.is_file())
+    _available_covers[str(covers_dir)] = (mtime, ids)
+    return ids
+
+
+def parse_sequence_filter(spec: str) -> dict:
+    """
+    Filtre de la ruleta: criteris separats per comes, cadascun `camp` (el
+    mateix valor que el destacat) o `camp=valor`. Camps: artist, genre, decade.
+    "genre,decade" -> {"genre": None, "decade": None}; "genre=jazz" -> {"genre": "jazz"}.
+    """
+    sequence_filter = {}
+    for part in spec.split(","):
+        field, _, value = part.partition("=")
+        field = field.strip()
+        if field not in SEQUENCE_FILTER_FIELDS:
+            raise ValueError(f"camp desconegut '{field}' (vàlids: {', '.join(SEQUENCE_FILTER_FIELDS)})")
+        if value.strip() and field == "decade" and _decade_key(value) is None:
+            raise ValueError(f"dècada no vàlida '{value.strip()}'")
+        sequence_filter[field] = value.strip() or None
+    return sequence_filter
+
+
+def build_album_sequence(
+    featured_album_id: str,
+    covers_dir: Path,
+    featured_index: int = 14,
+    sequence_filter: dict = None,
+    seed: int = SEQUENCE_SEED,
+    size: int = ROULETTE_ALBUMS
+) -> list:
+    """
+    Seqüència d'àlbums de la ruleta amb el destacat a la posició `featured_index`:
+    fins a `size` - 1 àlbums amb portada a `covers_dir` triats a l'atzar (amb
+    llavor) entre els que compleixen el filtre. Si el filtre en deixa massa
+    pocs, es completa amb la resta del catàleg.
+    """
+    catalog = get_catalog()
+    covers = available_covers(covers_dir)
+    rng = random.Random(seed)
+    count = size - 1
+
+    def sample(ids: list, k: int) -> list:
+        pool = [aid for aid in ids if aid in covers and aid != featured_album_id]
+        if len(pool) <= k:
+            # Un catàleg petit es barreja sencer (mateixa ruleta que sempre)
+            rng.shuffle(pool)
+            return pool
+        return rng.sample(pool, k)
+
+    others = sample(catalog.matching(featured_album_id, sequence_filter) if sequence_filter else catalog.ids(),
+                    count)
+    if sequence_filter and len(others) < count:
+        chosen = set(others)
+        others += sample([aid for aid in catalog.ids() if aid not in chosen], count - len(others))
+
+    # La seqüència comença amb alguns àlbums i ACABA amb el destacat
+    return others[:featured_index] + [featured_album_id] + others[featured_index:]
@@ -0,0 +1,24 @@
+"""
+Sound Deluxe - Rutes i escriptura de fitxers dels vídeos promocionals
+=====================================================================
+Directoris del projecte i escriptura atòmica, compartits pel generador i els
+scripts que no necessiten el renderitzador (p. ex. sync_album_covers.py).
+"""
+
+import os
+import threading
+from pathlib import Path
+
+BASE_DIR = Path(__file__).parent.parent
+COVERS_DIR = BASE_DIR / "album-covers"
+
+
+def write_atomic(path: Path, data: bytes):
+    """Escriu un fitxer sencer o no el toca (temporal al mateix directori + rename)."""
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}")
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
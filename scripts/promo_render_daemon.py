@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Sound Deluxe - Dimoni de render dels vídeos promocionals
+========================================================
+API HTTP local que encua jobs de generate_promo_video.py i els executa en un
+pool persistent de workers, amb les caches calentes entre jobs.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+
+import generate_promo_video as gpv
+from promo_catalog import use_catalog
+
+DAEMON_HOST = "127.0.0.1"
+DAEMON_PORT = 8765
+
+# Opcions de render que un job pot demanar (la resta les fixa el dimoni en arrencar)
+DAEMON_JOB_FLAGS = ("--duration", "--compositor", "--scale", "--tile-mb", "--draft",
+                    "--draft-fps", "--full-effects", "--full-frames", "--segments", "--output",
+                    "--vinyl-rpm", "--sequence-filter", "--sequence-seed", "--deadline")
+
+_progress_queue = None      # als workers del dimoni: esdeveniments cap al procés principal
+_current_job_id = None
+
+
+def _report_progress(event: str, value):
+    if _progress_queue is not None:
+        _progress_queue.put((_current_job_id, event, value))
+
+
+def _warm_daemon_worker(progress_queue, album_sequence: list, options: dict = None):
+    global _progress_queue
+    _progress_queue = progress_queue
+    gpv.set_progress_hook(lambda done, total: _report_progress("progress", (done, total)))
+    gpv.warm_render_worker(album_sequence, options)
+
+
+def _run_daemon_job(job_id: str, entry: dict, duration: float, options: dict) -> dict:
+    """Executa un job del dimoni en un worker (amb les caches del worker ja calentes)."""
+    global _current_job_id
+    _current_job_id = job_id
+    _report_progress("started", os.getpid())
+    try:
+        return gpv.run_batch_job(entry, duration, 1, False, options)
+    finally:
+        _current_job_id = None
+
+
+def daemon_job_argv(request: dict) -> list:
+    """Flags de línia d'ordres equivalents a les opcions d'un job de l'API."""
+    argv = []
+    for key, value in (request.get("options") or {}).items():
+        flag = "--" + key.replace("_", "-")
+        if flag not in DAEMON_JOB_FLAGS:
+            raise ValueError(f"Opció no permesa: {key}")
+        if value is True:
+            argv.append(flag)
+        elif isinstance(value, list):
+            for item in value:
+                argv += [flag, str(item)]
+        elif value is not False and value is not None:
+            argv += [flag, str(value)]
+    return argv
+
+
+class RenderDaemon:
+    """
+    Cua de jobs de render servida per un pool persistent de `concurrency`
+    processos. Els workers no es tornen a crear entre jobs: logotip, capes
+    estàtiques, sprites i portades descodificades continuen calents. La cua és
+    del dimoni (el pool només rep un job quan té un worker lliure), de manera
+    que un job encara no començat es pot cancel·lar.
+    """
+
+    def __init__(self, concurrency: int = 1, base_argv: list = None):
+        self.concurrency = concurrency
+        self.base_argv = list(base_argv or [])
+        self.jobs = OrderedDict()
+        self.started = time.time()
+        self._lock = threading.RLock()
+        self._pending = deque()     # (job_id, entry, durada, opcions) a l'espera
+        self._futures = {}          # job_id -> (future, pool que l'executa)
+        self._worker_jobs = {}      # pid -> jobs executats (el primer és en fred)
+
+        self._events = multiprocessing.Queue()
+        self.options = gpv.render_options(parse_args(self.base_argv))
+        if self.options.get("cover_atlas"):
+            gpv.use_cover_atlas(self.options["cover_atlas"], build=True)
+        self._pool = self._new_pool()
+        threading.Thread(target=self._pump_events, daemon=True).start()
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.concurrency,
+            initializer=_warm_daemon_worker,
+            initargs=(self._events, gpv.warm_album_ids(options=self.options), self.options)
+        )
+
+    def submit(self, request: dict) -> dict:
+        """
+        Valida i encua un job. Llença ValueError si la petició no és vàlida i
+        FileExistsError si un altre job a la cua o en marxa escriu la mateixa sortida.
+        """
+        album_id = request.get("album_id")
+        # El catàleg es torna a llegir si l'exportació ha canviat des de l'últim job
+        catalog = use_catalog(self.options.get("catalog"))
+        if album_id not in catalog:
+            raise ValueError(f"Àlbum desconegut: {album_id}")
+        if not request.get("date") or not request.get("time"):
+            raise ValueError("Cal 'date' i 'time'")
+        output_name = request.get("output_name") or gpv.default_output_name(album_id, request["date"])
+        if Path(output_name).name != output_name or not output_name.endswith(".mp4"):
+            raise ValueError(f"Nom de sortida no vàlid: {output_name}")
+
+        try:
+            args = parse_args(self.base_argv + daemon_job_argv(request))
+        except SystemExit:
+            raise ValueError("Opcions de render no vàlides")
+        options = gpv.render_options(args)
+
+        job_id = f"{time.strftime('%Y%m%d%H%M%S')}-{len(self.jobs) + 1:04d}"
+        entry = {"album_id": album_id, "date": request["date"], "time": request["time"],
+                 "output_name": output_name}
+        record = {
+            "id": job_id, **entry, "options": request.get("options") or {},
+            "status": "queued", "progress": {"done": 0, "total": int(args.duration * options.get("fps", gpv.FPS))},
+            "created": time.time(), "started": None, "finished": None,
+            "worker": None, "warm": None, "timings": {}, "path": None, "error": None,
+        }
+        with self._lock:
+            for other in self.jobs.values():
+                if other["output_name"] == output_name and other["status"] in ("queued", "running"):
+                    raise FileExistsError(f"El job {other['id']} ja genera {output_name}")
+            self.jobs[job_id] = record
+            self._pending.append((job_id, entry, args.duration, options))
+            self._dispatch()
+        print(f"📥 Job {job_id}: {catalog.info(album_id).get('title', album_id)} → {output_name}")
+        return self.status(job_id)
+
+    def _dispatch(self):
+        """Passa jobs de la cua al pool mentre hi hagi workers lliures."""
+        with self._lock:
+            while self._pending and len(self._futures) < self.concurrency:
+                job_id, entry, duration, options = self._pending.popleft()
+                pool = self._pool
+                future = pool.submit(_run_daemon_job, job_id, entry, duration, options)
+                self._futures[job_id] = (future, pool)
+                future.add_done_callback(lambda f, job_id=job_id: self._finish(job_id, f))
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel·la un job encara a la cua."""
+        with self._lock:
+            for pending in self._pending:
+                if pending[0] == job_id:
+                    self._pending.remove(pending)
+                    self.jobs[job_id].update(status="cancelled", finished=time.time())
+                    return True
+        return False
+
+    def _pump_events(self):
+        """Aplica als jobs els esdeveniments (inici, progrés) que envien els workers."""
+        while True:
+            job_id, event, value = self._events.get()
+            with self._lock:
+                record = self.jobs.get(job_id)
+                if record is None:
+                    continue
+                if event == "started" and record["status"] == "queued":
+                    runs = self._worker_jobs.get(value, 0)
+                    self._worker_jobs[value] = runs + 1
+                    record.update(status="running", started=time.time(), worker=value, warm=runs > 0)
+                elif event == "progress":
+                    record["progress"] = {"done": value[0], "total": value[1]}
+
+    def _finish(self, job_id: str, future):
+        with self._lock:
+            record = self.jobs[job_id]
+            record["finished"] = time.time()
+            _, pool = self._futures.pop(job_id)
+            error = future.exception()
+            if error is not None:
+                # Un worker mort deixa el pool inservible: se'n crea un de nou
+                record.update(status="failed", error=str(error) or type(error).__name__)
+                if isinstance(error, BrokenProcessPool) and pool is self._pool:
+                    self._pool = self._new_pool()
+                self._dispatch()
+                return
+            result = future.result()
+            record.update(status="done" if result["ok"] else "failed",
+                          path=result["path"], error=result["error"])
+            total = record["finished"] - record["created"]
+            record["timings"] = {"queued": max(0.0, total - result["seconds"]),
+                                 "render": result["seconds"], "total": total}
+            self._dispatch()
+        status = "✅" if result["ok"] else "❌"
+        print(f"{status} Job {job_id}: {result['path'] or result['error']} ({result['seconds']:.1f}s)")
+
+    def status(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            record = self.jobs.get(job_id)
+            return None if record is None else json.loads(json.dumps(record))
+
+    def summary(self) -> dict:
+        with self._lock:
+            counts = {}
+            for record in self.jobs.values():
+                counts[record["status"]] = counts.get(record["status"], 0) + 1
+        return {"ok": True, "workers": self.concurrency, "uptime": time.time() - self.started, "jobs": counts}
+
+    def close(self):
+        with self._lock:
+            self._pending.clear()
+        self._pool.shutdown(wait=True)
+
+
+class _DaemonHandler(BaseHTTPRequestHandler):
+    """
+    API JSON del dimoni:
+      POST   /jobs        {album_id, date, time, output_name?, options?} → 202
+                          (409 si la sortida ja la genera un altre job)
+      GET    /jobs        tots els jobs
+      GET    /jobs/<id>   estat, progrés i temps d'un job
+      DELETE /jobs/<id>   cancel·la un job a la cua
+      GET    /health
+    """
+
+    daemon: RenderDaemon = None
+    token: Optional[str] = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status: int, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorized(self) -> bool:
+        if self.token and self.headers.get("Authorization") != f"Bearer {self.token}":
+            self._reply(401, {"error": "No autoritzat"})
+            return False
+        return True
+
+    def _job_id(self) -> Optional[str]:
+        parts = self.path.split("?")[0].strip("/").split("/")
+        return parts[1] if len(parts) == 2 and parts[0] == "jobs" else None
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        path = self.path.split("?")[0].rstrip("/")
+        if path == "/health":
+            self._reply(200, self.daemon.summary())
+        elif path == "/jobs":
+            self._reply(200, [self.daemon.status(job_id) for job_id in list(self.daemon.jobs)])
+        elif self._job_id():
+            record = self.daemon.status(self._job_id())
+            self._reply(200 if record else 404, record or {"error": "Job desconegut"})
+        else:
+            self._reply(404, {"error": "Ruta desconeguda"})
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        if self.path.split("?")[0].rstrip("/") != "/jobs":
+            self._reply(404, {"error": "Ruta desconeguda"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            request = json.loads(self.rfile.read(length) or b"{}")
+            if not isinstance(request, dict):
+                raise ValueError("Cal un objecte JSON")
+            self._reply(202, self.daemon.submit(request))
+        except FileExistsError as e:
+            self._reply(409, {"error": str(e)})
+        except ValueError as e:
+            self._reply(400, {"error": str(e)})
+
+    def do_DELETE(self):
+        if not self._authorized():
+            return
+        job_id = self._job_id()
+        if job_id is None or self.daemon.status(job_id) is None:
+            self._reply(404, {"error": "Job desconegut"})
+        elif self.daemon.cancel(job_id):
+            self._reply(200, self.daemon.status(job_id))
+        else:
+            self._reply(409, {"error": "El job ja s'està executant o ha acabat"})
+
+
+def daemon_server(daemon: RenderDaemon, host: str = DAEMON_HOST, port: int = DAEMON_PORT,
+                  token: str = None) -> ThreadingHTTPServer:
+    """Servidor HTTP de l'API d'un dimoni (amb `token`, cal 'Authorization: Bearer <token>')."""
+    handler = type("DaemonHandler", (_DaemonHandler,), {"daemon": daemon, "token": token})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def serve(host: str = DAEMON_HOST, port: int = DAEMON_PORT, concurrency: int = 1, base_argv: list = None):
+    """Arrenca el dimoni de render i n'atén l'API fins a Ctrl+C."""
+    daemon = RenderDaemon(concurrency, base_argv)
+    server = daemon_server(daemon, host, port, os.environ.get("PROMO_DAEMON_TOKEN"))
+    # SIGTERM (systemd, docker stop) atura el servidor com Ctrl+C; shutdown() no es pot
+    # cridar des del fil de serve_forever
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    print(f"🛰️  Dimoni de render a http://{host}:{server.server_port} ({concurrency} jobs alhora)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("\n🛑 Aturant el dimoni...")
+        server.server_close()
+        daemon.close()
+
+
+def parse_args(argv: list = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Dimoni de render de vídeos promocionals (API HTTP local)")
+    parser.add_argument("--host", default=DAEMON_HOST,
+                        help=f"Adreça on escolta (per defecte: {DAEMON_HOST})")
+    parser.add_argument("--port", type=int, default=DAEMON_PORT,
+                        help=f"Port on escolta (per defecte: {DAEMON_PORT})")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Vídeos a renderitzar alhora (per defecte: 1)")
+    gpv.add_render_args(parser)
+    args = parser.parse_args(argv)
+    gpv.check_render_args(parser, args)
+    if args.jobs < 1:
+        parser.error("--jobs ha de ser positiu")
+    return args
+
+
+def main():
+    args = parse_args()
+
+    print("=" * 60)
+    print("🛰️  SOUND DELUXE - Dimoni de render de vídeos")
+    print("=" * 60)
+
+    if args.catalog:
+        try:
+            use_catalog(args.catalog)
+        except (OSError, ValueError) as e:
+            print(f"❌ Catàleg il·legible: {e}")
+            sys.exit(1)
+
+    gpv.OUTPUT_DIR.mkdir(exist_ok=True)
+    # Les opcions de render de la línia d'ordres són les de base de cada job
+    serve(args.host, args.port, concurrency=args.jobs, base_argv=sys.argv[1:])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+Sound Deluxe - Sincronització de portades
+=========================================
+Descarrega en paral·lel a album-covers/<id>.jpg les portades del catàleg que
+falten o han canviat, amb peticions condicionals (ETag / Last-Modified) i
+reintents dels errors transitoris. Per defecte pregunta a Sanity la imatge de
+cada àlbum, com download-album-covers.ts.
+"""
+
+import argparse
+import email.utils
+import http.client
+import io
+import json
+import os
+import sys
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+from PIL import Image
+
+from promo_catalog import get_catalog, use_catalog
+from promo_paths import BASE_DIR, COVERS_DIR, write_atomic
+
+COVER_SYNC_CONCURRENCY = 8
+COVER_SYNC_TIMEOUT = 30.0
+COVER_SYNC_REDIRECTS = 5
+COVER_SYNC_RETRIES = 3              # Reintents d'una petició amb error transitori
+COVER_SYNC_BACKOFF = 0.5            # Espera abans del primer reintent (es dobla a cada un)
+COVER_SYNC_RETRY_STATUS = (429, 500, 502, 503, 504)
+COVER_SYNC_STATE = ".sync.json"     # ETag / Last-Modified de cada portada descarregada
+SANITY_API_VERSION = "2025-12-23"
+HTTP_USER_AGENT = "SoundDeluxe/1.0.0 (contact@soundeluxe.es)"
+
+
+class HTTPPool:
+    """
+    Client HTTP bloquejant amb connexions persistents (keep-alive) reutilitzades
+    per host, segur entre fils: n'hi ha tantes d'obertes com peticions alhora.
+    """
+
+    def __init__(self, timeout: float = COVER_SYNC_TIMEOUT, retries: int = COVER_SYNC_RETRIES):
+        self.timeout = timeout
+        self.retries = retries
+        self._idle = {}     # (scheme, netloc) -> [connexió lliure]
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.requests = 0
+        self.retried = 0
+
+    def _connection(self, key: tuple) -> tuple:
+        """(connexió, reutilitzada) per a un host."""
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+            self.opened += 1
+        scheme, netloc = key
+        if scheme == "https":
+            return http.client.HTTPSConnection(netloc, timeout=self.timeout), False
+        return http.client.HTTPConnection(netloc, timeout=self.timeout), False
+
+    def _send(self, url: str, headers: dict) -> tuple:
+        parts = urllib.parse.urlsplit(url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError(f"URL no suportada: {url}")
+        key = (parts.scheme, parts.netloc)
+        target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        while True:
+            conn, reused = self._connection(key)
+            try:
+                conn.request("GET", target, headers={"User-Agent": HTTP_USER_AGENT, **headers})
+                response = conn.getresponse()
+                body = response.read()
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                if reused:
+                    continue    # el servidor havia tancat la connexió inactiva: una de nova
+                raise
+            if response.will_close:
+                conn.close()
+            else:
+                with self._lock:
+                    self._idle.setdefault(key, []).append(conn)
+            return response.status, response.headers, body
+
+    def _get(self, url: str, headers: dict) -> tuple:
+        """GET bloquejant que segueix redireccions: (url final, estat, capçaleres, cos)."""
+        for _ in range(COVER_SYNC_REDIRECTS + 1):
+            status, response_headers, body = self._send(url, headers)
+            location = response_headers.get("Location")
+            if status not in (301, 302, 303, 307, 308) or not location:
+                return url, status, response_headers, body
+            url = urllib.parse.urljoin(url, location)
+        raise http.client.HTTPException(f"Massa redireccions: {url}")
+
+    def get(self, url: str, headers: dict = None) -> tuple:
+        """
+        GET (url final, estat, capçaleres, cos). Els errors de xarxa i les
+        respostes 429/5xx es reintenten fins a `retries` cops amb espera
+        exponencial; esgotats, es llença l'error o es retorna la resposta.
+        """
+        for attempt in range(self.retries + 1):
+            with self._lock:
+                self.requests += 1
+            try:
+                response = self._get(url, headers or {})
+            except (OSError, http.client.HTTPException):
+                if attempt == self.retries:
+                    raise
+            else:
+                if response[1] not in COVER_SYNC_RETRY_STATUS or attempt == self.retries:
+                    return response
+            with self._lock:
+                self.retried += 1
+            time.sleep(COVER_SYNC_BACKOFF * 2 ** attempt)
+
+    def close(self):
+        with self._lock:
+            for conns in self._idle.values():
+                for conn in conns:
+                    conn.close()
+            self._idle.clear()
+
+
+def _env(name: str) -> Optional[str]:
+    """Variable d'entorn, o del .env.local / .env del projecte (com els scripts TS)."""
+    if os.environ.get(name):
+        return os.environ[name]
+    for env_file in (BASE_DIR / ".env.local", BASE_DIR / ".env"):
+        try:
+            lines = env_file.read_text(encoding="utf-8").splitlines()
+        except OSError:
+            continue
+        for line in lines:
+            key, sep, value = line.strip().partition("=")
+            if sep and key.strip() == name:
+                return value.strip().strip('"').strip("'")
+    return None
+
+
+def _sanity_cover_urls(pool: HTTPPool, album_ids: list) -> dict:
+    """URL de la imatge de portada de cada àlbum segons Sanity (una sola consulta)."""
+    project_id = _env("NEXT_PUBLIC_SANITY_PROJECT_ID")
+    dataset = _env("NEXT_PUBLIC_SANITY_DATASET")
+    if not project_id or not dataset:
+        raise RuntimeError("Cal NEXT_PUBLIC_SANITY_PROJECT_ID i NEXT_PUBLIC_SANITY_DATASET, o bé --covers-url")
+
+    query = urllib.parse.urlencode({
+        "query": '*[_type == "album" && _id in $ids]{_id, "url": coverImage.asset->url}',
+        "$ids": json.dumps(album_ids),
+    })
+    headers = {}
+    token = _env("SANITY_API_TOKEN")
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    url = f"https://{project_id}.api.sanity.io/v{SANITY_API_VERSION}/data/query/{dataset}?{query}"
+    _, status, _, body = pool.get(url, headers)
+    if status != 200:
+        raise RuntimeError(f"Consulta a Sanity fallida ({status})")
+
+    urls = {}
+    for album in json.loads(body)["result"]:
+        if album.get("url"):
+            url = album["url"]
+            # El CDN d'imatges de Sanity converteix el format al vol
+            if not url.lower().endswith((".jpg", ".jpeg")):
+                url += "?fm=jpg&q=90"
+            urls[album["_id"]] = url
+    return urls
+
+
+def _sync_cover(pool: HTTPPool, album_id: str, url: str, covers_dir: Path, state: dict) -> str:
+    """Descarrega una portada si falta o ha canviat (petició condicional). Retorna el resultat."""
+    path = covers_dir / f"{album_id}.jpg"
+    entry = state.get(album_id) or {}
+    headers = {}
+    # Si l'origen ha canviat d'URL (imatge nova a Sanity), es descarrega sense condicions
+    if path.exists() and entry.get("url", url) == url:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        elif not entry.get("etag"):
+            # Sense validadors (p. ex. portada d'abans de sincronitzar): la data del fitxer
+            headers["If-Modified-Since"] = email.utils.formatdate(path.stat().st_mtime, usegmt=True)
+
+    try:
+        _, status, response_headers, body = pool.get(url, headers)
+    except (OSError, http.client.HTTPException, ValueError) as e:
+        print(f"   ⚠️  {album_id}: {e}")
+        return "failed"
+
+    validators = {"url": url, "etag": response_headers.get("ETag"),
+                  "last_modified": response_headers.get("Last-Modified")}
+    if status == 304:
+        state[album_id] = {k: v or entry.get(k) for k, v in validators.items()}
+        return "unchanged"
+    if status != 200:
+        print(f"   ⚠️  {album_id}: HTTP {status}")
+        return "failed"
+
+    try:
+        with Image.open(io.BytesIO(body)) as img:
+            img.verify()
+    except Exception:
+        print(f"   ⚠️  {album_id}: la resposta no és una imatge")
+        return "failed"
+
+    existed = path.exists()
+    try:
+        write_atomic(path, body)
+    except OSError as e:
+        print(f"   ⚠️  {album_id}: no s'ha pogut desar ({e})")
+        return "failed"
+    state[album_id] = validators
+    return "updated" if existed else "downloaded"
+
+
+def _sync_covers(album_ids: list, covers_dir: Path, base_url: Optional[str], concurrency: int) -> dict:
+    state_path = covers_dir / COVER_SYNC_STATE
+    try:
+        state = json.loads(state_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        state = {}
+
+    pool = HTTPPool()
+    try:
+        if base_url:
+            urls = {album_id: f"{base_url.rstrip('/')}/{album_id}.jpg" for album_id in album_ids}
+        else:
+            urls = _sanity_cover_urls(pool, album_ids)
+        # Cada fil fa una descàrrega alhora: `concurrency` limita també les connexions obertes
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="http") as executor:
+            results = list(executor.map(
+                lambda album_id: _sync_cover(pool, album_id, urls[album_id], covers_dir, state),
+                [album_id for album_id in album_ids if album_id in urls]
+            ))
+    finally:
+        pool.close()
+
+    write_atomic(state_path, json.dumps(state, indent=2, sort_keys=True).encode())
+    stats = {key: results.count(key) for key in ("downloaded", "updated", "unchanged", "failed")}
+    stats["no_cover"] = [album_id for album_id in album_ids if album_id not in urls]
+    stats.update(requests=pool.requests, retries=pool.retried, connections=pool.opened)
+    return stats
+
+
+def sync_covers(
+    album_ids: list = None,
+    covers_dir: Path = None,
+    base_url: str = None,
+    concurrency: int = COVER_SYNC_CONCURRENCY
+) -> dict:
+    """
+    Descarrega en paral·lel les portades que falten o han canviat a
+    album-covers/<id>.jpg. Per defecte pregunta a Sanity la imatge de cada
+    àlbum; amb `base_url` les demana a `<base_url>/<id>.jpg` (un CDN o un
+    servidor local).
+    """
+    album_ids = list(album_ids or get_catalog().ids())
+    covers_dir = Path(covers_dir or COVERS_DIR)
+    covers_dir.mkdir(parents=True, exist_ok=True)
+
+    print(f"\n🔄 Sincronitzant {len(album_ids)} portades ({concurrency} alhora)...")
+    start = time.time()
+    stats = _sync_covers(album_ids, covers_dir, base_url, concurrency)
+    print(f"   {stats['downloaded']} noves, {stats['updated']} actualitzades, "
+          f"{stats['unchanged']} sense canvis, {stats['failed']} errors "
+          f"({time.time() - start:.1f}s, {stats['requests']} peticions, {stats['retries']} reintents, "
+          f"{stats['connections']} connexions)")
+    for album_id in stats["no_cover"]:
+        print(f"   ⚠️  {album_id}: sense portada a l'origen")
+    return stats
+
+
+def main(argv: list = None):
+    parser = argparse.ArgumentParser(description="Sincronitza les portades del catàleg a album-covers/")
+    parser.add_argument("--covers-url", default=os.environ.get("PROMO_COVERS_URL"),
+                        help="Descarrega <URL>/<id>.jpg en lloc de consultar Sanity "
+                             "(per defecte: $PROMO_COVERS_URL)")
+    parser.add_argument("--concurrency", type=int, default=COVER_SYNC_CONCURRENCY,
+                        help=f"Descàrregues alhora (per defecte: {COVER_SYNC_CONCURRENCY})")
+    parser.add_argument("--covers-dir", type=Path, default=COVERS_DIR,
+                        help=f"Directori de les portades (per defecte: {COVERS_DIR})")
+    parser.add_argument("--catalog", type=Path, default=os.environ.get("PROMO_CATALOG") or None,
+                        help="Catàleg d'àlbums exportat (JSON, NDJSON de Sanity o SQLite) en lloc de "
+                             "l'integrat (per defecte: $PROMO_CATALOG)")
+    parser.add_argument("album_ids", nargs="*", metavar="ID",
+                        help="Sincronitza només aquests àlbums (per defecte: tot el catàleg)")
+    args = parser.parse_args(argv)
+    if args.concurrency < 1:
+        parser.error("--concurrency ha de ser positiu")
+
+    if args.catalog:
+        try:
+            use_catalog(args.catalog)
+        except (OSError, ValueError) as e:
+            print(f"❌ Catàleg il·legible: {e}")
+            sys.exit(1)
+
+    try:
+        stats = sync_covers(args.album_ids, args.covers_dir, args.covers_url, args.concurrency)
+    except (RuntimeError, OSError, http.client.HTTPException) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    sys.exit(1 if stats["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Configuració comuna dels tests del generador de vídeos promocionals: els
+scripts s'importen com a mòduls i es renderitza amb portades sintètiques
+(les del benchmark), sense dependre de album-covers/ ni del logotip.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+if str(SCRIPTS_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+import benchmark_promo_video as bench  # noqa: E402
+import generate_promo_video as gpv  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def synthetic_covers(tmp_path_factory) -> Path:
+    """Una portada sintètica (amb llavor) per a cada àlbum del catàleg integrat."""
+    covers_dir = tmp_path_factory.mktemp("covers")
+    bench.make_synthetic_covers(covers_dir, seed=1234, size=320)
+    return covers_dir
+
+
+@pytest.fixture
+def promo(synthetic_covers, tmp_path, monkeypatch):
+    """
+    El mòdul del generador amb les portades sintètiques, la sortida en un
+    directori temporal i les caches de procés buides.
+    """
+    monkeypatch.setattr(gpv, "COVERS_DIR", synthetic_covers)
+    monkeypatch.setattr(gpv, "OUTPUT_DIR", tmp_path)
+    monkeypatch.setattr(gpv, "FRAMES_DIR", tmp_path / "frames")
+    monkeypatch.setattr(gpv, "LOGO_PATH", tmp_path / "sense-logotip.png")
+    monkeypatch.setattr(gpv, "_default_cover_cache", None)
+    monkeypatch.setattr(gpv, "_render_contexts", {})
+    monkeypatch.setattr(gpv, "_frame_renderer", None)
+    return gpv
+
+
+@pytest.fixture
+def make_job(promo):
+    """Job d'un clip curt del disc destacat del benchmark, amb opcions de render."""
+    def make(duration: float = 1.0, **options) -> dict:
+        return promo.prepare_render_job(bench.FEATURED_ALBUM, bench.SESSION, duration=duration, options=options)
+    return make
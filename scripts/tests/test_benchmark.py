@@ -0,0 +1,78 @@
+"""
+Benchmark: comparació amb la línia base. Només GATED_METRICS i el pic de RSS
+poden fer fallar el benchmark; els trams són informatius.
+"""
+
+import json
+import sys
+
+import pytest
+
+import benchmark_promo_video as bench
+
+
+def results(scale: float = 1.0, rss: float = 100.0) -> dict:
+    """Resultats sintètics amb totes les mètriques comparables multiplicades per `scale`."""
+    summary = {"p50": 10.0 * scale, "p95": 20.0 * scale}
+    return {
+        "config": {"frames": 30},
+        "frame": dict(summary),
+        "phases": {phase: dict(summary) for phase in bench.PHASES},
+        "stages": {stage: dict(summary) for stage in bench.STAGES},
+        "peak_rss_mb": rss,
+    }
+
+
+def regressions(rows: list) -> list:
+    return [row[0] for row in rows if row[4]]
+
+
+def test_within_threshold_passes():
+    rows = bench.compare(results(1.1), results(), threshold=0.15)
+    names = [row[0] for row in rows]
+    assert names == list(bench.GATED_METRICS) + [f"{stage}.p50" for stage in bench.STAGES] + ["peak_rss_mb"]
+    assert rows[0][1:4] == (10.0, 11.0, pytest.approx(0.1))
+    assert regressions(rows) == []
+
+
+def test_only_gated_metrics_regress():
+    current = results()
+    for stage in bench.STAGES:
+        current["stages"][stage]["p50"] = 100.0
+    assert regressions(bench.compare(current, results(), threshold=0.15)) == []
+
+    current["phases"]["reveal"]["p50"] = 11.6     # +16%
+    current["frame"]["p95"] = 25.0               # +25%
+    assert regressions(bench.compare(current, results(), threshold=0.15)) == ["frame.p95", "reveal.p50"]
+    assert regressions(bench.compare(current, results(), threshold=0.2)) == ["frame.p95"]
+
+
+def test_faster_and_rss_growth():
+    assert regressions(bench.compare(results(0.5), results(), threshold=0.15)) == []
+    assert regressions(bench.compare(results(rss=130.0), results(), threshold=0.15)) == ["peak_rss_mb"]
+
+
+def test_missing_metrics_are_skipped():
+    baseline = results()
+    del baseline["phases"]["settle"]
+    baseline["stages"]["encode"]["p50"] = 0.0
+    del baseline["peak_rss_mb"]
+    names = [row[0] for row in bench.compare(results(2.0), baseline, threshold=0.15)]
+    assert "settle.p50" not in names and "encode.p50" not in names and "peak_rss_mb" not in names
+    assert "frame.p50" in names
+
+
+@pytest.mark.parametrize("scale, code", [(1.0, None), (1.5, 1)])
+def test_main_exit_code(tmp_path, monkeypatch, capsys, scale, code):
+    baseline = tmp_path / "base.json"
+    baseline.write_text(json.dumps(results()), encoding="utf-8")
+    monkeypatch.setattr(bench, "run_benchmark", lambda **kwargs: results(scale))
+    monkeypatch.setattr(bench, "print_results", lambda results: None)
+    monkeypatch.setattr(sys, "argv", ["benchmark_promo_video.py", "--baseline", str(baseline)])
+    if code is None:
+        bench.main()
+        assert "Sense regressions" in capsys.readouterr().out
+    else:
+        with pytest.raises(SystemExit) as exit_info:
+            bench.main()
+        assert exit_info.value.code == code
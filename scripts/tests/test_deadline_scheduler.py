@@ -0,0 +1,80 @@
+"""
+Render amb termini: el planificador abaixa la qualitat de les fases no
+protegides quan no hi cap, la torna a pujar quan sobra marge i no toca res si
+el coll d'ampolla és la codificació.
+"""
+
+import pytest
+
+import generate_promo_video as gpv
+
+# 10 frames per fase (gir, assentament, revelació), tots amb cost 1
+PHASES = [0] * 10 + [1] * 10 + [2] * 10
+
+
+def scheduler(deadline: float, seconds: float = 0.1, encode: float = 0.0, overlap: bool = True):
+    """Planificador amb una mostra a qualitat alta de cada fase (`seconds` per frame)."""
+    sched = gpv.DeadlineScheduler(deadline, PHASES, [1.0] * len(PHASES))
+    sched.encode, sched.overlap = encode, overlap
+    for frame in (0, 10, 20):
+        sched.record(frame, 0, seconds, sample=True)
+    return sched
+
+
+def test_unmeasured_levels_use_the_cost_prior():
+    sched = scheduler(10.0)
+    assert sched.rate(0, 2) == pytest.approx(0.1 * gpv.QUALITY_COST_PRIOR[2])
+    assert sched.estimate() == pytest.approx(3.0)
+    assert sched.estimate([2, 1, 0]) == pytest.approx(0.5 + 0.7 + 1.0)
+
+
+def test_over_budget_steps_down_only_unprotected_phases():
+    sched = scheduler(2.0)              # 1.8 s de pressupost per a 3 s estimats
+    sched.replan()
+    # Tot al mínim continua sense cabre, però la revelació no baixa mai
+    assert sched.levels == [2, 2, 0]
+    assert {(phase, new) for _, phase, _, new in sched.changes} == {(0, 1), (1, 1), (0, 2), (1, 2)}
+    assert not sched.fits()
+
+
+def test_steps_down_just_enough():
+    sched = scheduler(2.9)              # 2.61 s: amb una fase a nivell mitjà (2.7 s) no n'hi ha prou
+    sched.replan()
+    assert sorted(sched.levels[:2]) == [1, 1] and sched.levels[2] == 0
+    assert sched.fits()
+
+
+def test_slack_upgrades_with_headroom():
+    sched = scheduler(2.0)
+    sched.replan()
+    assert sched.levels == [2, 2, 0]
+
+    # Hi cap (2.0 s) però pujar una fase (2.2 s) supera el 85% del pressupost: no es toca
+    sched.deadline = 2.1 / gpv.DEADLINE_UPGRADE_HEADROOM / (1 - gpv.DEADLINE_MARGIN)
+    sched.replan()
+    assert sched.levels == [2, 2, 0]
+
+    sched.deadline = 10.0
+    sched.replan()
+    assert sched.levels == [0, 0, 0]
+
+
+def test_encode_bottleneck_keeps_quality():
+    # Amb més d'un nucli ffmpeg codifica en paral·lel: 0.2 s/frame pesen més que 0.1 s de render
+    sched = scheduler(2.0, encode=0.2, overlap=True)
+    sched.replan()
+    assert sched.levels == [0, 0, 0] and sched.changes == []
+
+    # Amb un sol nucli els temps se sumen i abaixar els efectes sí que estalvia
+    sched = scheduler(5.0, encode=0.1, overlap=False)
+    sched.replan()
+    assert sched.levels[0] > 0 and sched.levels[2] == 0
+
+
+def test_finished_phases_are_left_alone():
+    sched = scheduler(1.5)
+    for frame in range(10):
+        sched.record(frame, 0, 0.1)
+    sched.replan()
+    assert sched.levels[0] == 0 and sched.levels[1] == 2
+    assert sched.report()["phases"] == {"gir": {"alta": 10}}
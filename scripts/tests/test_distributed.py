@@ -0,0 +1,140 @@
+"""
+Cua distribuïda: un chunk d'un node mort o que falla es torna a repartir
+(intent n+1) i, esgotats els intents, el job es dona per perdut.
+"""
+
+import contextlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+import benchmark_promo_video as bench
+import distributed_promo_video as dist
+
+# Node en un procés a part amb les mateixes portades sintètiques que el test
+NODE_SCRIPT = """
+import sys
+from pathlib import Path
+sys.path.insert(0, {scripts!r})
+import generate_promo_video as gpv
+gpv.COVERS_DIR = Path({covers!r})
+gpv.LOGO_PATH = Path({logo!r})
+import distributed_promo_video as dist
+dist.DISTRIBUTED_POLL_SECONDS = 0.2
+dist.run_render_node(Path({queue!r}), idle_seconds={idle!r})
+"""
+
+
+def spawn_node(promo, queue_dir, idle=None) -> subprocess.Popen:
+    script = NODE_SCRIPT.format(scripts=str(Path(dist.__file__).parent), covers=str(promo.COVERS_DIR),
+                                logo=str(promo.LOGO_PATH), queue=str(queue_dir), idle=idle)
+    return subprocess.Popen([sys.executable, "-c", script],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_for(condition, timeout: float):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        result = condition()
+        if result:
+            return result
+        time.sleep(0.05)
+    raise TimeoutError
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="cal ffmpeg")
+def test_killed_node_chunk_is_retried(promo, make_job, tmp_path):
+    job = make_job(duration=1.0, scale=0.5)
+    job_dir = dist.publish_distributed_job(tmp_path / "queue", job, chunk_frames=10, lease_seconds=3.0)
+    names = [dist._chunk_name(start, end) for start, end in dist._read_job_spec(job_dir)["chunks"]]
+
+    # El primer node mor just després de reclamar el seu primer chunk
+    first = spawn_node(promo, tmp_path / "queue")
+    try:
+        lease = wait_for(lambda: next((job_dir / "leases").glob("*.1"), None), timeout=60)
+    finally:
+        first.kill()
+        first.wait()
+    killed = lease.stem
+    assert not (job_dir / "done" / f"{killed}.mp4").exists()
+
+    second = spawn_node(promo, tmp_path / "queue", idle=5.0)
+    assert second.wait(timeout=300) == 0
+
+    for name in names:
+        assert (job_dir / "done" / f"{name}.mp4").exists()
+    info = json.loads((job_dir / "done" / f"{killed}.json").read_text(encoding="utf-8"))
+    assert info["attempt"] == 2
+    ok, stderr = promo.concat_segments([job_dir / "done" / f"{name}.mp4" for name in names],
+                                       tmp_path / "promo.mp4", job_dir)
+    assert ok, stderr
+
+
+def test_failing_chunk_is_given_up(make_job, tmp_path, monkeypatch):
+    job = make_job(duration=1.0)
+    job_dir = dist.publish_distributed_job(tmp_path / "queue", job, chunk_frames=30, lease_seconds=60.0)
+    name = dist._chunk_name(0, 30)
+
+    def broken_chunk(*args, **kwargs):
+        raise RuntimeError("error ffmpeg: simulat")
+
+    monkeypatch.setattr(dist, "render_chunk", broken_chunk)
+    # Cada passada gasta un intent (sense esperar que caduqui el lease) fins a esgotar-los
+    for _ in range(dist.LEASE_MAX_ATTEMPTS + 2):
+        assert dist.work_on_job(job_dir, "test") == 0
+
+    assert len(list((job_dir / "leases").iterdir())) == dist.LEASE_MAX_ATTEMPTS
+    assert dist._chunk_exhausted(job_dir, name, 60.0)
+    assert dist._lease_error(job_dir / "leases" / f"{name}.{dist.LEASE_MAX_ATTEMPTS}") == "error ffmpeg: simulat"
+
+
+def test_node_walks_only_job_directories(make_job, tmp_path, monkeypatch):
+    queue_dir = tmp_path / "queue"
+    job_dir = dist.publish_distributed_job(queue_dir, make_job(), chunk_frames=30)
+    (queue_dir / "README.txt").write_text("no és un job", encoding="utf-8")
+    seen = []
+    monkeypatch.setattr(dist, "work_on_job", lambda job_dir, owner: seen.append(job_dir) or 0)
+    monkeypatch.setattr(dist, "DISTRIBUTED_POLL_SECONDS", 0.01)
+    assert dist.run_render_node(queue_dir, idle_seconds=0.05) == 0
+    assert seen and set(seen) == {job_dir}
+
+
+def test_stale_jobs_are_swept(make_job, tmp_path):
+    queue_dir = tmp_path / "queue"
+    stale = dist.publish_distributed_job(queue_dir, make_job(), chunk_frames=10, lease_seconds=60.0)
+    stale = stale.rename(queue_dir / "20250101_000000_mort")
+    assert dist.claim_chunk(stale, dist._chunk_name(0, 10), "mort", 60.0)
+    # Coordinador i node morts fa més de JOB_STALE_LEASES leases
+    old = time.time() - dist.JOB_STALE_LEASES * 60.0 - 5
+    for path in [stale, stale / "job.json", *(stale / "leases").iterdir()]:
+        os.utime(path, (old, old))
+    live = dist.publish_distributed_job(queue_dir, make_job(), chunk_frames=10, lease_seconds=60.0)
+
+    assert dist.sweep_stale_jobs(queue_dir) == [stale]
+    assert not stale.exists() and live.exists()
+    # Un lease renovat (un node que encara treballa) manté viu el job
+    assert dist.claim_chunk(live, dist._chunk_name(0, 10), "viu", 60.0)
+    os.utime(live / "job.json", (old, old))
+    os.utime(live, (old, old))
+    assert dist.sweep_stale_jobs(queue_dir) == []
+
+
+@pytest.mark.parametrize("error", [RuntimeError("error ffmpeg: simulat"), KeyboardInterrupt()])
+def test_coordinator_removes_its_job_dir(promo, tmp_path, monkeypatch, error):
+    def broken_chunk(*args, **kwargs):
+        raise error
+
+    monkeypatch.setattr(dist, "render_chunk", broken_chunk)
+    monkeypatch.setattr(dist, "DISTRIBUTED_POLL_SECONDS", 0.01)
+    queue_dir = tmp_path / "queue"
+    expected = pytest.raises(KeyboardInterrupt) if isinstance(error, KeyboardInterrupt) else contextlib.nullcontext()
+    with expected:
+        assert dist.render_distributed(bench.FEATURED_ALBUM, bench.SESSION, "promo.mp4", queue_dir,
+                                       duration=1.0, options={"scale": 0.5}) is None
+    assert list(queue_dir.iterdir()) == []
@@ -0,0 +1,82 @@
+"""
+Sortides addicionals d'un render (WebM, GIF, WebP i pòster): especificació,
+noms, delmat de fps per sortida i fitxers finals.
+"""
+
+import shutil
+
+import pytest
+from PIL import Image
+
+import benchmark_promo_video as bench
+import generate_promo_video as gpv
+
+
+class RecordingEncoder:
+    """Substitut d'FFmpegStreamEncoder: anota la configuració i els frames rebuts."""
+
+    def __init__(self, output_path, width, height, fps, queue_size=8, encode_args=None):
+        self.output_path, self.size, self.fps, self.encode_args = output_path, (width, height), fps, encode_args
+        self.written = []
+
+    def write(self, frame):
+        self.written.append(frame.getpixel((0, 0))[0])
+
+    def close(self) -> bool:
+        return True
+
+
+def test_output_spec_overrides_and_errors():
+    assert gpv.parse_output_spec("gif") == {"kind": "gif", **gpv.OUTPUT_SINKS["gif"]}
+    assert gpv.parse_output_spec("gif:width=480,fps=10") == {**gpv.parse_output_spec("gif"), "width": 480, "fps": 10}
+    poster = gpv.parse_output_spec("poster:at=0.25,quality=80")
+    assert (poster["at"], poster["quality"], poster["ext"]) == (0.25, 80, ".jpg")
+    for spec in ("mov", "gif:crf=30", "gif:ext=.png", "gif:width", "gif:fps=deu", "webm:crf=-1", "poster:at=1.5"):
+        with pytest.raises(ValueError):
+            gpv.parse_output_spec(spec)
+
+
+def test_one_render_fans_out_to_every_sink(make_job, tmp_path, monkeypatch):
+    monkeypatch.setattr(gpv, "FFmpegStreamEncoder", RecordingEncoder)
+    specs = ["webm", "gif", "gif:fps=5", "webp", "poster:at=0.5,width=270"]
+    job = make_job(scale=0.5, outputs=[gpv.parse_output_spec(spec) for spec in specs])
+    sinks = gpv.job_sinks(job, tmp_path / "promo.mp4")
+    assert [sink.path.name for sink in sinks] == \
+        ["promo.webm", "promo.gif", "promo_2.gif", "promo.webp", "promo_poster.jpg"]
+
+    # Frames de prova: el canal vermell és el número de frame
+    for i in range(job["total_frames"]):
+        frame = Image.new("RGB", (540, 960), (i * 8, 0, 0))
+        for sink in sinks:
+            sink.write(i, frame)
+    assert all(sink.close() for sink in sinks)
+
+    webm, gif, gif5, webp, poster = sinks
+    # 1 s a 30 fps: cada sortida rep un frame per cada un dels seus
+    assert [len(sink.encoder.written) for sink in (webm, gif, gif5, webp)] == [30, 12, 5, 15]
+    assert gif5.encoder.written == [0, 6 * 8, 12 * 8, 18 * 8, 24 * 8]
+    assert all(sink.encoder.size == (540, 960) for sink in (webm, gif, gif5, webp))
+    # L'escalat el fa cada ffmpeg; el WebM (720) no amplia el render de 540
+    assert "scale=" not in " ".join(webm.encoder.encode_args)
+    assert "scale=360:-2" in gif.encoder.encode_args[1] and "palettegen" in gif.encoder.encode_args[1]
+    assert "libwebp_anim" in webp.encoder.encode_args
+
+    with Image.open(poster.path) as img:
+        assert img.size == (270, 480)
+        assert abs(img.getpixel((135, 240))[0] - 14 * 8) <= 4   # frame round(0.5 * 29)
+    assert poster.frames == 1
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="cal ffmpeg")
+def test_streamed_render_writes_all_outputs(promo):
+    specs = ["webm:width=270", "gif:width=180,fps=10", "webp:width=180", "poster"]
+    path = promo.render_promo(bench.FEATURED_ALBUM, bench.SESSION, "promo.mp4", duration=1.0,
+                              options={"scale": 0.5, "outputs": [promo.parse_output_spec(s) for s in specs]})
+    assert path is not None and path.exists()
+    assert path.with_suffix(".webm").stat().st_size > 0
+    with Image.open(path.with_suffix(".gif")) as gif:
+        assert gif.n_frames == 10 and gif.width == 180
+    with Image.open(path.with_suffix(".webp")) as webp:
+        assert webp.n_frames == 15 and webp.width == 180
+    with Image.open(path.with_name("promo_poster.jpg")) as poster:
+        assert poster.size == (540, 960)
@@ -0,0 +1,95 @@
+"""
+Catàlegs exportats (JSON, NDJSON de Sanity i SQLite), registres defectuosos i
+la cache de portades disponibles per directori.
+"""
+
+import json
+import os
+import sqlite3
+
+import pytest
+
+import promo_catalog as catalog
+
+ALBUMS = [
+    {"_id": "a1", "artist": "Miles Davis", "title": "Kind of Blue", "year": 1959, "genre": "jazz"},
+    {"_id": "a2", "artist": "John Coltrane", "title": "A Love Supreme", "year": 1965, "genre": "jazz"},
+    {"_id": "a3", "artist": "The Clash", "title": "London Calling", "year": 1979, "genre": "rock"},
+]
+
+
+def test_json_catalog_formats(tmp_path):
+    by_id = tmp_path / "by_id.json"
+    by_id.write_text(json.dumps({album["_id"]: album for album in ALBUMS}), encoding="utf-8")
+    query = tmp_path / "query.json"
+    query.write_text(json.dumps({"result": [{**ALBUMS[0]}, {"id": "a9", "title": "Sense _id"}]}), encoding="utf-8")
+
+    loaded = catalog.load_catalog(by_id)
+    assert loaded.ids() == ["a1", "a2", "a3"] and loaded.source == str(by_id)
+    assert loaded.matching("a1", {"genre": None}) == ["a1", "a2"]
+    assert catalog.load_catalog(query).ids() == ["a1", "a9"]
+
+
+def test_json_records_without_id_are_skipped(tmp_path, capsys):
+    path = tmp_path / "albums.json"
+    path.write_text(json.dumps([ALBUMS[0], {"title": "Sense id"}, "no és un objecte"]), encoding="utf-8")
+    assert catalog.load_catalog(path).ids() == ["a1"]
+    assert capsys.readouterr().out.count("sense id") == 2
+
+
+def test_ndjson_keeps_published_albums(tmp_path, capsys):
+    lines = [
+        ALBUMS[0],
+        {**ALBUMS[1], "_id": "drafts.a2"},
+        {"_id": "s1", "_type": "session"},
+        {"_type": "album", "title": "Sense _id"},
+        ALBUMS[2],
+    ]
+    path = tmp_path / "export.ndjson"
+    path.write_text("\n".join(json.dumps({"_type": "album", **line}) for line in lines) + "\n\n", encoding="utf-8")
+    # La sessió duu _type propi: no és un àlbum
+    assert catalog.load_catalog(path).ids() == ["a1", "a3"]
+    assert f"{path}:4" in capsys.readouterr().out
+
+
+def test_sqlite_catalog(tmp_path):
+    path = tmp_path / "albums.sqlite"
+    with sqlite3.connect(path) as db:
+        db.execute("CREATE TABLE albums (id TEXT, artist TEXT, title TEXT, year INTEGER, genre TEXT)")
+        db.executemany("INSERT INTO albums VALUES (?, ?, ?, ?, ?)",
+                       [(a["_id"], a["artist"], a["title"], a["year"], a["genre"]) for a in ALBUMS])
+    db.close()
+    loaded = catalog.load_catalog(path)
+    assert loaded.ids() == ["a1", "a2", "a3"]
+    assert loaded.info("a3")["title"] == "London Calling"
+    assert loaded.matching("a1", {"decade": "1970s"}) == ["a3"]
+
+    empty = tmp_path / "empty.db"
+    sqlite3.connect(empty).close()
+    with pytest.raises(ValueError):
+        catalog.load_catalog(empty)
+
+
+def test_available_covers_rescans_only_when_the_directory_changes(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog, "_available_covers", {})
+    for name in ("a1.jpg", "a2.jpg", "notes.txt"):
+        (tmp_path / name).write_bytes(b"")
+    scans = []
+    scandir = os.scandir
+
+    def counting_scandir(path):
+        scans.append(path)
+        return scandir(path)
+
+    monkeypatch.setattr(os, "scandir", counting_scandir)
+    assert catalog.available_covers(tmp_path) == {"a1", "a2"}
+    assert catalog.available_covers(tmp_path) == {"a1", "a2"}
+    assert len(scans) == 1
+
+    (tmp_path / "a3.jpg").write_bytes(b"")
+    # mtime explícit: el canvi no depèn de la resolució del rellotge del sistema de fitxers
+    mtime = tmp_path.stat().st_mtime_ns + 1_000_000
+    os.utime(tmp_path, ns=(mtime, mtime))
+    assert catalog.available_covers(tmp_path) == {"a1", "a2", "a3"}
+    assert len(scans) == 2
+    assert catalog.available_covers(tmp_path / "missing") == frozenset()
@@ -0,0 +1,206 @@
+"""
+Equivalència dels camins ràpids del generador amb el render de referència
+(compositor PIL, frame sencer) i represa de renders, en clips curts amb
+portades sintètiques.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import benchmark_promo_video as bench
+import generate_promo_video as gpv
+
+
+def test_numpy_compositor_matches_pil(promo, make_job):
+    assert promo.check_compositors(make_job(), step=3)
+
+
+@pytest.mark.parametrize("compositor", gpv.COMPOSITORS)
+def test_incremental_render_matches_full(promo, make_job, compositor):
+    assert promo.check_incremental(make_job(compositor=compositor))
+
+
+def test_unchanged_frames_are_duplicates_with_any_compositor(promo, make_job):
+    # Amb el vinil quiet, al final de la revelació hi ha frames on no canvia cap element
+    duplicates = {}
+    for compositor in gpv.COMPOSITORS:
+        job = make_job(duration=10.0, compositor=compositor, timeline={"vinyl_rpm": 0})
+        renderer = promo.FrameRenderer(promo.job_render_context(job), job)
+        for i in range(job["total_frames"] - 20, job["total_frames"]):
+            renderer.render(i)
+        duplicates[compositor] = renderer.stats()["duplicates"]
+    assert duplicates["numpy"] == duplicates["pil"] > 0
+
+
+def test_spinning_label_recomposites_only_its_box(promo, make_job):
+    # Amb el vinil aturat al final només gira l'etiqueta: no hi ha duplicats, però
+    # la resta del frame es reaprofita amb qualsevol compositor
+    for compositor in gpv.COMPOSITORS:
+        job = make_job(duration=10.0, compositor=compositor, frame_cache=None)
+        ctx = promo.job_render_context(job)
+        renderer = promo.FrameRenderer(ctx, job)
+        tail = range(job["total_frames"] - 20, job["total_frames"])
+        for i in tail:
+            assert renderer.render(i).tobytes() == promo.render_frame(ctx, i, job).tobytes(), (compositor, i)
+        assert renderer.stats() == {"duplicates": 0, "partial": len(tail) - 1, "full": 1}
+
+        previous, plan = (promo.plan_job_frame(ctx, i, job) for i in tail[-2:])
+        label = promo.vinyl_label_box(plan["vinyl"])
+        rects = promo.dirty_rects(previous, plan, ctx)
+        assert label in rects and sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in rects) < 0.1 * ctx.width * ctx.height
+
+
+# Render d'un clip en un procés nou: creixement del pic de memòria (VmHWM) durant els frames.
+# No es fa servir ru_maxrss perquè hereta el pic del procés pare (pytest) a través del fork.
+PEAK_RSS_SCRIPT = """
+import json, re, sys
+from pathlib import Path
+sys.path.insert(0, {scripts!r})
+import benchmark_promo_video as bench
+import generate_promo_video as gpv
+gpv.COVERS_DIR = Path({covers!r})
+gpv.LOGO_PATH = Path({logo!r})
+job = gpv.prepare_render_job(bench.FEATURED_ALBUM, bench.SESSION, duration=3.0, options={options!r})
+renderer = gpv.FrameRenderer(gpv.job_render_context(job), job)
+def peak():
+    return int(re.search(r"VmHWM:\\s+(\\d+) kB", Path("/proc/self/status").read_text()).group(1)) * 1024
+before = peak()
+for i in range(job["total_frames"]):
+    renderer.render(i)
+print(json.dumps(peak() - before))
+"""
+
+
+def render_peak_growth(promo, options: dict) -> int:
+    script = PEAK_RSS_SCRIPT.format(scripts=str(Path(gpv.__file__).parent), covers=str(promo.COVERS_DIR),
+                                    logo=str(promo.LOGO_PATH), options=options)
+    # Sense huge pages: numpy les demana per als arrays grans i el pic dependria de les que el kernel tingui lliures
+    env = {**os.environ, "NUMPY_MADVISE_HUGEPAGE": "0"}
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True,
+                            env=env).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+@pytest.mark.skipif(not Path("/proc/self/status").exists(), reason="cal /proc (Linux)")
+def test_tiled_render_stays_within_memory_budget(promo, make_job):
+    budget = 32 * 1024 * 1024
+    options = {"scale": 0.5, "tile_bytes": budget}
+    # Sense límit, les caches de portades i sprites creixen molt per sobre del pressupost
+    assert render_peak_growth(promo, {"scale": 0.5}) > 2 * budget
+    assert render_peak_growth(promo, options) <= budget
+    assert promo.check_tiled(make_job(**options), step=3)
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="cal ffmpeg")
+def test_segment_joins_are_seamless(promo, make_job):
+    assert promo.check_segments(make_job(segment_frames=10))
+
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="cal ffmpeg")
+def test_interrupted_png_render_resumes_missing_frames(promo, monkeypatch):
+    rendered = []
+    render = promo.FrameRenderer.render
+
+    def interrupted_render(self, frame_num):
+        if len(rendered) == stop_after:
+            raise KeyboardInterrupt
+        rendered.append(frame_num)
+        return render(self, frame_num)
+
+    monkeypatch.setattr(promo.FrameRenderer, "render", interrupted_render)
+    stop_after = 12
+    # Com main(): cada execució té un nom de sortida diferent (amb l'hora)
+    with pytest.raises(KeyboardInterrupt):
+        promo.render_promo(bench.FEATURED_ALBUM, bench.SESSION, "promo_1.mp4", duration=1.0,
+                           png_frames=True, options={"scale": 0.5})
+    frames_dir, = promo.FRAMES_DIR.iterdir()
+    assert len(list(frames_dir.glob("frame_*.png"))) == stop_after
+
+    # Un PNG tallat (mida diferent de la del diari) es torna a renderitzar
+    damaged = frames_dir / "frame_00005.png"
+    damaged.write_bytes(damaged.read_bytes()[:100])
+
+    rendered.clear()
+    stop_after = None
+    path = promo.render_promo(bench.FEATURED_ALBUM, bench.SESSION, "promo_2.mp4", duration=1.0,
+                              png_frames=True, options={"scale": 0.5, "resume": True})
+    assert rendered == [5] + list(range(12, 30))
+    assert path is not None and path.exists()
+    # Amb el vídeo a disc, el directori de frames del job ja no hi és
+    assert not frames_dir.exists()
+
+
+class RecordingSegmentEncoder:
+    """Anota els frames que li arriben i quants PNG hi havia a disc en aquell moment."""
+
+    def __init__(self):
+        self.calls = []
+
+    def add_png_frames(self, frames_dir, available, final=False):
+        on_disk = len(list(frames_dir.glob("frame_*.png")))
+        assert all((frames_dir / f"frame_{i:05d}.png").exists() for i in range(available))
+        self.calls.append((available, final, on_disk))
+
+
+def test_parallel_png_render_hands_segments_over_as_frames_complete(promo, tmp_path):
+    encoder = RecordingSegmentEncoder()
+    promo.generate_all_frames(bench.FEATURED_ALBUM, bench.SESSION, duration=1.0, workers=2,
+                              frames_dir=tmp_path / "frames", options={"scale": 0.5},
+                              segment_encoder=encoder)
+    partial = [available for available, final, on_disk in encoder.calls if not final and on_disk < 30]
+    # L'encoder rep prefixos creixents mentre el pool encara renderitza, no només al final
+    assert partial and partial == sorted(partial) and partial[-1] > 0
+    assert encoder.calls[-1][:2] == (30, True)
+
+
+def test_frame_cache_rewrite_keeps_byte_count(promo, make_job, tmp_path):
+    job = {**make_job(), "frame_cache": None}
+    ctx = promo.job_render_context(job)
+    frames = [promo.render_frame(ctx, i, job) for i in (0, 15)]
+
+    cache = promo.FrameCache(tmp_path / "cache")
+    for _ in range(5):
+        cache.put("a" * 16, frames[0])
+    cache.put("b" * 16, frames[1])
+    # Reescriure una clau no suma la seva mida un altre cop: el compte és el del disc
+    on_disk = sum(f.stat().st_size for f in (tmp_path / "cache").glob("*/*.png"))
+    assert cache.stats()["writes"] == 6
+    assert cache._bytes == on_disk == promo.FrameCache(tmp_path / "cache")._bytes
+
+
+def test_bold_faces_are_opt_in(monkeypatch):
+    monkeypatch.delenv("PROMO_BOLD_FONTS", raising=False)
+    regular = gpv.FontRegistry().resolve(bold=False)
+    bold = gpv.FontRegistry(bold_faces=True).resolve(bold=True)
+    if regular is None or bold == regular:
+        pytest.skip("cal una font regular i una de negreta diferents")
+
+    # Per defecte el títol en negreta fa servir la cara regular (com abans del registre)
+    assert gpv.FontRegistry().resolve(bold=True) == regular
+    assert gpv.FontRegistry().font(40, bold=True).path == regular[0]
+    monkeypatch.setenv("PROMO_BOLD_FONTS", "1")
+    assert gpv.FontRegistry().resolve(bold=True) == bold
+
+
+def psnr(a, b) -> float:
+    mse = np.mean((np.asarray(a, dtype=np.float64) - np.asarray(b, dtype=np.float64)) ** 2)
+    return 99.0 if mse == 0 else 10 * np.log10(255 ** 2 / mse)
+
+
+def test_cover_size_buckets_match_exact_sizes(promo, make_job):
+    # Les mides de la cache de portades per defecte contra les exactes (sense arrodonir)
+    job = make_job(duration=2.0)
+    spin_frames = int(job["total_frames"] * promo.TimelineParams().spin_end)
+    frames = range(0, spin_frames, 3)
+    cached = [promo.render_frame(promo.job_render_context(job), i, job) for i in frames]
+    exact_ctx = promo.RenderContext(covers=promo.CoverCache(size_step=1))
+    for i, frame in zip(frames, cached):
+        assert psnr(frame, promo.render_frame(exact_ctx, i, job)) >= 50, f"frame {i}"
@@ -0,0 +1,125 @@
+"""
+API del dimoni de render amb un render simulat: autenticació, opcions
+permeses, conflicte de sortides (409) i progrés dels jobs.
+"""
+
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+import benchmark_promo_video as bench
+import promo_render_daemon as daemon_mod
+
+TOKEN = "secret"
+
+
+@pytest.fixture
+def api(promo, tmp_path, monkeypatch):
+    """Dimoni amb un worker i render_promo simulat: informa de progrés i espera el fitxer `release`."""
+    release = tmp_path / "release"
+
+    def fake_render_promo(album_id, session_info, output_name, duration=10.0, workers=1,
+                          png_frames=False, options=None):
+        total = int(duration * promo.FPS)
+        promo._print_progress(total // 2, total)
+        deadline = time.time() + 30
+        while not release.exists() and time.time() < deadline:
+            time.sleep(0.02)
+        promo._print_progress(total, total)
+        path = promo.OUTPUT_DIR / output_name
+        path.write_bytes(b"mp4")
+        return path
+
+    # Els workers es creen amb fork: hereten els mòduls ja modificats
+    monkeypatch.setattr(promo, "render_promo", fake_render_promo)
+    monkeypatch.setattr(promo, "warm_render_worker", lambda album_sequence, options=None: None)
+    monkeypatch.setattr(promo, "warm_album_ids", lambda featured_ids=None, options=None: [])
+
+    daemon = daemon_mod.RenderDaemon(concurrency=1)
+    server = daemon_mod.daemon_server(daemon, "127.0.0.1", 0, TOKEN)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def call(method: str, path: str, payload: dict = None, token: str = TOKEN) -> tuple:
+        request = urllib.request.Request(f"http://127.0.0.1:{server.server_port}{path}", method=method,
+                                         data=json.dumps(payload).encode() if payload is not None else None)
+        if token:
+            request.add_header("Authorization", f"Bearer {token}")
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    call.release = release
+    yield call
+    release.touch()
+    server.shutdown()
+    server.server_close()
+    daemon.close()
+
+
+def job(**fields) -> dict:
+    return {"album_id": bench.FEATURED_ALBUM, "date": "Dijous 1 Gener 2026", "time": "20:00h",
+            "output_name": "promo.mp4", "options": {"duration": 1}, **fields}
+
+
+def wait_for_job(api, job_id: str, condition, timeout: float = 30) -> dict:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status, record = api("GET", f"/jobs/{job_id}")
+        assert status == 200
+        if condition(record):
+            return record
+        time.sleep(0.05)
+    raise TimeoutError(record)
+
+
+def test_requests_need_the_bearer_token(api):
+    assert api("GET", "/health", token=None)[0] == 401
+    assert api("GET", "/health", token="wrong")[0] == 401
+    assert api("POST", "/jobs", job(), token=None)[0] == 401
+    status, health = api("GET", "/health")
+    assert status == 200 and health["jobs"] == {}
+
+
+def test_only_whitelisted_options_are_accepted(api):
+    status, reply = api("POST", "/jobs", job(options={"output_dir": "/tmp"}))
+    assert status == 400 and "output_dir" in reply["error"]
+    # Una opció permesa amb un valor que el parser rebutja també és un 400
+    assert api("POST", "/jobs", job(options={"compositor": "opengl"}))[0] == 400
+    with pytest.raises(ValueError):
+        daemon_mod.daemon_job_argv({"options": {"catalog": "/tmp/catalog.json"}})
+    assert daemon_mod.daemon_job_argv({"options": {"duration": 2, "full_frames": True, "draft": False}}) == \
+        ["--duration", "2", "--full-frames"]
+    assert api("GET", "/jobs")[1] == []
+
+
+def test_duplicate_output_name_is_a_conflict(api):
+    status, first = api("POST", "/jobs", job())
+    assert status == 202
+    status, reply = api("POST", "/jobs", job())
+    assert status == 409 and first["id"] in reply["error"]
+    assert api("POST", "/jobs", job(output_name="other.mp4"))[0] == 202
+
+    api.release.touch()
+    wait_for_job(api, first["id"], lambda record: record["status"] == "done")
+    # Acabat el job, la mateixa sortida es pot tornar a demanar
+    assert api("POST", "/jobs", job())[0] == 202
+
+
+def test_job_reports_progress_until_done(api):
+    status, record = api("POST", "/jobs", job())
+    assert status == 202 and record["status"] == "queued" and record["progress"] == {"done": 0, "total": 30}
+
+    running = wait_for_job(api, record["id"], lambda r: r["progress"]["done"] == 15)
+    assert running["status"] == "running" and running["warm"] is False and running["worker"]
+
+    api.release.touch()
+    done = wait_for_job(api, record["id"], lambda r: r["status"] == "done")
+    assert done["progress"] == {"done": 30, "total": 30}
+    assert done["path"].endswith("promo.mp4") and done["error"] is None
+    assert set(done["timings"]) == {"queued", "render", "total"}
@@ -0,0 +1,135 @@
+"""
+Sincronització de portades contra un servidor HTTP local: descàrrega (200),
+revalidació condicional (304), reintents dels errors transitoris i escriptura
+atòmica.
+"""
+
+import io
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from PIL import Image
+
+import sync_album_covers as sync
+
+
+def jpeg(color) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 32), color).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+class CoverServer(ThreadingHTTPServer):
+    """Serveix /<id>.jpg amb ETag; `failures[id]` respostes 503 abans de la bona."""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), CoverHandler)
+        self.covers = {}
+        self.failures = {}
+        self.log = []   # (id, estat, If-None-Match)
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class CoverHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        album_id = self.path.strip("/").removesuffix(".jpg")
+        server = self.server
+        with server.lock:
+            failing = server.failures.get(album_id, 0)
+            if failing:
+                server.failures[album_id] = failing - 1
+        body = server.covers.get(album_id)
+        etag = f'"{hash(body) & 0xffffffff:x}"'
+        if failing:
+            status = 503
+        elif body is None:
+            status = 404
+        elif self.headers.get("If-None-Match") == etag:
+            status = 304
+        else:
+            status = 200
+        with server.lock:
+            server.log.append((album_id, status, self.headers.get("If-None-Match")))
+
+        self.send_response(status)
+        if status in (200, 304):
+            self.send_header("ETag", etag)
+        payload = body if status == 200 else b""
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(sync, "COVER_SYNC_BACKOFF", 0)
+    server = CoverServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def statuses(server, album_id) -> list:
+    return [status for logged_id, status, _ in server.log if logged_id == album_id]
+
+
+def test_sync_downloads_then_revalidates(server, tmp_path):
+    server.covers = {"a": jpeg("red"), "b": jpeg("blue")}
+    stats = sync.sync_covers(["a", "b", "c"], tmp_path, server.url, concurrency=2)
+    assert (stats["downloaded"], stats["failed"]) == (2, 1)
+    assert (tmp_path / "a.jpg").read_bytes() == server.covers["a"]
+    state = json.loads((tmp_path / sync.COVER_SYNC_STATE).read_text(encoding="utf-8"))
+    assert state["a"]["etag"] and "c" not in state
+
+    # Segona passada: peticions condicionals, només es torna a baixar la que ha canviat
+    server.covers["b"] = jpeg("green")
+    server.log.clear()
+    stats = sync.sync_covers(["a", "b"], tmp_path, server.url, concurrency=2)
+    assert (stats["unchanged"], stats["updated"]) == (1, 1)
+    assert statuses(server, "a") == [304] and statuses(server, "b") == [200]
+    assert all(etag == state[album_id]["etag"] for album_id, _, etag in server.log)
+    assert (tmp_path / "b.jpg").read_bytes() == server.covers["b"]
+
+
+def test_transient_errors_are_retried(server, tmp_path):
+    server.covers = {"flaky": jpeg("red"), "down": jpeg("blue")}
+    server.failures = {"flaky": 2, "down": sync.COVER_SYNC_RETRIES + 1}
+    stats = sync.sync_covers(["flaky", "down"], tmp_path, server.url, concurrency=2)
+    assert statuses(server, "flaky") == [503, 503, 200]
+    assert statuses(server, "down") == [503] * (sync.COVER_SYNC_RETRIES + 1)
+    assert (stats["downloaded"], stats["failed"], stats["retries"]) == (1, 1, 2 + sync.COVER_SYNC_RETRIES)
+    assert (tmp_path / "flaky.jpg").exists() and not (tmp_path / "down.jpg").exists()
+
+
+def test_failed_write_keeps_previous_cover(server, tmp_path, monkeypatch):
+    old = jpeg("red")
+    (tmp_path / "a.jpg").write_bytes(old)
+    server.covers = {"a": jpeg("blue")}
+    replace = os.replace
+
+    def broken_replace(src, dst):
+        if str(dst).endswith(".jpg"):
+            raise OSError("disc ple")
+        replace(src, dst)
+
+    monkeypatch.setattr(os, "replace", broken_replace)
+    stats = sync.sync_covers(["a"], tmp_path, server.url)
+    assert stats["failed"] == 1
+    # La portada anterior queda intacta i no hi queden temporals a mig escriure
+    assert (tmp_path / "a.jpg").read_bytes() == old
+    assert sorted(p.name for p in tmp_path.iterdir()) == [sync.COVER_SYNC_STATE, "a.jpg"]
+    assert "a" not in json.loads((tmp_path / sync.COVER_SYNC_STATE).read_text(encoding="utf-8"))